@@ -0,0 +1,9 @@
+"""
+Benchmark scripts for the listings app.
+
+Each script runs against a throwaway test database and a temporary photo
+blob store, so it never touches db.sqlite3 or media/. Run from the project
+root, for example:
+
+    python -m benchmarks.photo_revalidation
+"""
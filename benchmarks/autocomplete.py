@@ -0,0 +1,133 @@
+"""
+Benchmark: address autocomplete from a LIKE scan and from the in-memory index.
+
+Fills the Listing table with synthetic visible listings on a few thousand
+made-up streets, then times one suggestion request for a few typed
+prefixes, as an ``icontains`` query against SQLite and through
+``listings.autocomplete.AddressIndex``. Also times a full index build and
+a one-row patch, and reports the index's memory estimate.
+
+    python -m benchmarks.autocomplete [--listings 10000 100000]
+"""
+import argparse
+import random
+from decimal import Decimal
+
+from benchmarks.harness import benchmark_database, print_table, timed
+
+LIMIT = 8
+
+SYLLABLES = ['al', 'bel', 'cor', 'dun', 'el', 'fair', 'gar', 'den', 'hill', 'ing', 'lo', 'mar',
+             'ple', 'ton', 'view', 'wood', 'ash', 'brook', 'crest', 'dale']
+SUFFIXES = ['St', 'Ave', 'Blvd', 'Ct', 'Dr', 'Ln', 'Rd', 'Way', 'Pl', 'Cir']
+
+QUERIES = [
+    ('house number', '42'),
+    ('one word', 'gar'),
+    ('number + street', None),
+    ('typo', 'gardn'),
+    ('no match', 'zzzz'),
+]
+
+
+def street_names(rng, count=3000):
+    names = set()
+    while len(names) < count:
+        name = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randrange(2, 4)))
+        names.add(name.capitalize())
+    return sorted(names)
+
+
+def fill_listings(count, user, neighborhood, property_type, seed=1):
+    """bulk_create ``count`` visible listings with synthetic street addresses."""
+    from django.db import transaction
+    from listings.models import Listing
+
+    rng = random.Random(seed)
+    streets = street_names(random.Random(0))
+    batch = []
+    for i in range(count):
+        batch.append(Listing(
+            address=f'{rng.randrange(1, 10000)} {rng.choice(streets)} {rng.choice(SUFFIXES)}',
+            price=Decimal(rng.randrange(100, 900) * 1000),
+            created_by=user,
+            neighborhood=neighborhood,
+            property_type=property_type,
+        ))
+        if len(batch) == 10000 or i == count - 1:
+            # One transaction per batch; in autocommit SQLite syncs every row.
+            with transaction.atomic():
+                Listing.objects.bulk_create(batch)
+            batch = []
+
+
+def like_suggestions(text):
+    """Every typed word as an icontains filter, as a LIKE-based endpoint would."""
+    from listings.models import Listing
+
+    queryset = Listing.objects.filter(is_visible=True)
+    for word in text.split():
+        queryset = queryset.filter(address__icontains=word)
+    return list(queryset.order_by('address').values_list('listing_id', 'address')[:LIMIT])
+
+
+def run(counts):
+    with benchmark_database(on_disk=True) as connection:
+        from django.contrib.auth import get_user_model
+        from listings import autocomplete
+        from listings.models import Listing, Neighborhood, PropertyType
+
+        user = get_user_model().objects.create_user(
+            email='bench@example.com', password='x', firstname='Bench', lastname='User'
+        )
+        neighborhood = Neighborhood.objects.create(name='Benchmark')
+        property_type = PropertyType.objects.create(name='House')
+
+        filled = 0
+        for count in sorted(counts):
+            fill_listings(count - filled, user, neighborhood, property_type, seed=count)
+            filled = count
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            index = autocomplete.AddressIndex.load()
+            # A house number and street prefix that exist.
+            number, street = Listing.objects.order_by('pk').values_list('address', flat=True)[0].split()[:2]
+            rows = []
+            for label, text in QUERIES:
+                text = text or f'{number} {street[:3].lower()}'
+                found = len(index.complete(text, LIMIT))
+                rows.append([
+                    label,
+                    repr(text),
+                    str(found),
+                    f'{timed(lambda: like_suggestions(text), repeat=5) * 1000:.2f}',
+                    f'{timed(lambda: index.complete(text, LIMIT), repeat=50) * 1000:.3f}',
+                ])
+            print(f'\n{count:,} visible listings\n')
+            print_table(['query', 'text', 'found', 'LIKE ms', 'index ms'], rows)
+
+            listing = Listing.objects.order_by('?').first()
+            stats = index.stats()
+            print()
+            print_table(
+                ['full build ms', 'one-row patch ms', 'words', 'trie nodes', 'approx MB'],
+                [[
+                    f'{timed(autocomplete.AddressIndex.load, repeat=3) * 1000:.1f}',
+                    f'{timed(lambda: index.replace(listing.pk, listing.address), repeat=10) * 1000:.3f}',
+                    f"{stats['words']:,}",
+                    f"{stats['trie_nodes']:,}",
+                    f"{stats['approx_bytes'] / 2 ** 20:.1f}",
+                ]],
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--listings', type=int, nargs='+', default=[10_000, 100_000])
+    args = parser.parse_args()
+    run(args.listings)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Shared setup and reporting helpers for the benchmark scripts.
+"""
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import django
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    """Configure Django with the project settings."""
+    if str(PROJECT_ROOT) not in sys.path:
+        sys.path.insert(0, str(PROJECT_ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'realestate_portal.settings')
+    django.setup()
+
+
+@contextlib.contextmanager
+def benchmark_database(on_disk=False):
+    """
+    Create a test database (and temporary blob store) for the duration of
+    the block and destroy it afterwards.
+
+    ``on_disk`` uses a temporary SQLite file instead of the shared in-memory
+    database, for benchmarks that need real file locking between connections.
+    """
+    setup_django()
+    from django.db import connection
+    from django.test.utils import (
+        override_settings, setup_test_environment, teardown_test_environment,
+    )
+
+    work_dir = tempfile.mkdtemp(prefix='listings-bench-')
+    if on_disk:
+        connection.settings_dict['TEST']['NAME'] = os.path.join(work_dir, 'bench.sqlite3')
+    blob_settings = override_settings(PHOTO_BLOB_STORAGE={
+        'BACKEND': 'listings.blob_storage.FileSystemBlobStorage',
+        'OPTIONS': {'location': os.path.join(work_dir, 'photo_blobs')},
+    })
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    blob_settings.enable()
+    try:
+        yield connection
+    finally:
+        blob_settings.disable()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def timed(func, repeat=5):
+    """Run ``func`` ``repeat`` times and return the best wall time in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def print_table(headers, rows):
+    """Print rows as a plain-text table with right-aligned numeric columns."""
+    rows = [[str(cell) for cell in row] for row in rows]
+    widths = [max(len(str(h)), *(len(r[i]) for r in rows)) for i, h in enumerate(headers)]
+    print('  '.join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    print('  '.join('-' * w for w in widths))
+    for row in rows:
+        print('  '.join(
+            cell.rjust(w) if cell.replace('.', '', 1).replace(',', '').lstrip('-').isdigit() else cell.ljust(w)
+            for cell, w in zip(row, widths)
+        ))
@@ -0,0 +1,181 @@
+"""
+Benchmark: wall time and peak RSS of the image_utils decode/resize pipeline.
+
+Compares the previous implementation (full-resolution decode, single-stage
+LANCZOS) with the current draft-mode, two-stage pipeline for each output
+the site produces from a 12-megapixel phone photo. Every measurement runs
+in a fresh process, and peak RSS is the rise in the process's high-water
+mark (Linux /proc VmHWM, reset before the run) while the code executes.
+
+    python -m benchmarks.image_pipeline [--image PATH] [--repeat 5]
+"""
+import argparse
+import multiprocessing
+import time
+from io import BytesIO
+
+from benchmarks.harness import print_table
+
+
+def _proc_status_mb(field):
+    """Return a /proc/self/status memory field in MB, or None off Linux."""
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """Reset VmHWM to the current RSS (Linux 4.0+); False if unsupported."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as fh:
+            fh.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def make_phone_photo(width=4000, height=3000):
+    """Return a 12 MP JPEG with photo-like detail and an EXIF orientation tag."""
+    from PIL import Image
+
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 24)
+    image = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    exif = Image.Exif()
+    exif[0x0112] = 1
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=92, exif=exif)
+    return output.getvalue()
+
+
+# The implementation before draft decoding, kept here as the baseline.
+
+def _old_flatten(image):
+    from PIL import Image
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        background.paste(image, mask=image.split()[-1] if image.mode in ('RGBA', 'LA') else None)
+        return background
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def old_thumbnail(data):
+    from PIL import Image
+
+    image = _old_flatten(Image.open(BytesIO(data)))
+    image.thumbnail((300, 300), Image.Resampling.LANCZOS)
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=85, optimize=True)
+    return output.getvalue()
+
+
+def old_compress(data):
+    from PIL import Image
+
+    image = _old_flatten(Image.open(BytesIO(data)))
+    if image.size[0] > 1920 or image.size[1] > 1920:
+        image.thumbnail((1920, 1920), Image.Resampling.LANCZOS)
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=85, optimize=True)
+    return output.getvalue()
+
+
+def old_rendition(data, width=640):
+    from PIL import Image
+
+    image = _old_flatten(Image.open(BytesIO(data)))
+    if image.width > width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.Resampling.LANCZOS)
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=85, optimize=True)
+    return output.getvalue()
+
+
+def new_output(kind, profile):
+    from listings import image_utils
+
+    if kind == 'thumbnail':
+        return lambda data: image_utils.generate_thumbnail(data, profile=profile)
+    if kind == 'compress':
+        return lambda data: image_utils.compress_image(data, profile=profile)
+    return lambda data: image_utils.generate_rendition(data, 640, profile=profile)
+
+
+OLD_OUTPUTS = {'thumbnail': old_thumbnail, 'compress': old_compress, 'rendition 640w': old_rendition}
+
+
+def _measure(args):
+    """Child-process body: return (best seconds, peak RSS rise in MB or None)."""
+    implementation, kind, profile, data, repeat = args
+    if implementation == 'old':
+        func = OLD_OUTPUTS[kind]
+    else:
+        func = new_output(kind.split()[0], profile)
+
+    # Warm up imports and codec tables on a tiny image, so the memory
+    # reading covers one cold run on the real photo and nothing cached by it.
+    func(make_phone_photo(64, 48))
+    can_reset = _reset_peak_rss()
+    before_mb = _proc_status_mb('VmRSS')
+    func(data)
+    peak_mb = _proc_status_mb('VmHWM')
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    if not can_reset or before_mb is None or peak_mb is None:
+        return best, None
+    return best, peak_mb - before_mb
+
+
+def run(image_path, repeat):
+    data = open(image_path, 'rb').read() if image_path else make_phone_photo()
+    ctx = multiprocessing.get_context('spawn')
+
+    def measure(implementation, kind=None, profile=None):
+        with ctx.Pool(1) as pool:
+            return pool.apply(_measure, ((implementation, kind, profile, data, repeat),))
+
+    rows = []
+    for kind in OLD_OUTPUTS:
+        scenarios = [('old', None)] + [('new', p) for p in ('quality', 'balanced', 'speed')]
+        old_seconds = None
+        for implementation, profile in scenarios:
+            seconds, peak_mb = measure(implementation, kind, profile)
+            old_seconds = old_seconds or seconds
+            rows.append([
+                kind,
+                implementation if profile is None else f'new ({profile})',
+                f'{seconds * 1000:.1f}',
+                f'{old_seconds / seconds:.1f}x',
+                f'{peak_mb:.1f}' if peak_mb is not None else 'n/a',
+            ])
+
+    print(f'{len(data) / 1_000_000:.1f} MB JPEG, best of {repeat}; '
+          f'peak RSS is the rise above the process RSS before the run\n')
+    print_table(['output', 'implementation', 'ms', 'speedup', 'peak RSS MB'], rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--image', help='JPEG to use instead of a generated 12 MP photo')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.image, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
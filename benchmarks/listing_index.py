@@ -0,0 +1,152 @@
+"""
+Benchmark: listings grid pages from the ORM and from the in-memory index.
+
+Fills the Listing table with synthetic visible listings, then times one
+grid page (count plus twelve hydrated listings) for a few filter and sort
+combinations, as ``all_listings`` runs it against SQLite and through
+``listings.listing_index`` with each available backend. Also times a full
+index build and a one-row patch.
+
+    python -m benchmarks.listing_index [--listings 10000 100000]
+"""
+import argparse
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from benchmarks.harness import benchmark_database, print_table, timed
+
+PER_PAGE = 12
+
+
+def fill_listings(count, user, neighborhoods, property_types, statuses, seed=1):
+    """bulk_create ``count`` visible listings, then assign their price buckets."""
+    from django.db import transaction
+    from listings.models import Listing, assign_pricebuckets
+
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+    batch = []
+    for i in range(count):
+        batch.append(Listing(
+            address=f'{i} Benchmark St',
+            price=Decimal(rng.randrange(100, 900) * 1000),
+            created_by=user,
+            neighborhood=rng.choice(neighborhoods),
+            property_type=rng.choice(property_types),
+            status_id=rng.choice(statuses),
+            bedrooms=rng.randrange(1, 6),
+            listed_date=start + timedelta(minutes=rng.randrange(2 * 365 * 1440)),
+        ))
+        if len(batch) == 10000 or i == count - 1:
+            # One transaction per batch; in autocommit SQLite syncs every row.
+            with transaction.atomic():
+                Listing.objects.bulk_create(batch)
+            batch = []
+    with transaction.atomic():
+        assign_pricebuckets()
+
+
+def grid_queryset():
+    """The all_listings base queryset."""
+    from listings.models import Listing
+
+    return Listing.objects.select_related(
+        'status_id', 'neighborhood', 'property_type', 'primary_photo'
+    ).defer('primary_photo__image_data', 'primary_photo__thumbnail_data').filter(is_visible=True)
+
+
+def orm_page(price_sort, page, filters):
+    from listings import pagination
+
+    queryset = grid_queryset().filter(**{f'{name}_id': value for name, value in filters.items()})
+    queryset = queryset.order_by(*pagination.ordering(price_sort))
+    offset = (page - 1) * PER_PAGE
+    return queryset.count(), [listing.pk for listing in queryset[offset:offset + PER_PAGE]]
+
+
+def index_page(index, price_sort, page, filters):
+    from listings.listing_index import IndexedListings
+
+    listings = IndexedListings(index.query(price_sort, **filters), grid_queryset())
+    offset = (page - 1) * PER_PAGE
+    return len(listings), [listing.pk for listing in listings[offset:offset + PER_PAGE]]
+
+
+def run(counts):
+    with benchmark_database(on_disk=True) as connection:
+        from django.contrib.auth import get_user_model
+        from listings import listing_index
+        from listings.models import Listing, Neighborhood, Pricebucket, PropertyType, Status
+
+        user = get_user_model().objects.create_user(
+            email='bench@example.com', password='x', firstname='Bench', lastname='User'
+        )
+        neighborhoods = [Neighborhood.objects.create(name=f'Neighborhood {i}') for i in range(40)]
+        property_types = [PropertyType.objects.create(name=f'Type {i}') for i in range(6)]
+        statuses = [Status.objects.create(name=name) for name in ('Active', 'Pending', 'Sold')]
+        buckets = [Pricebucket.objects.create(range=f'${i * 100},000 - ${i * 100 + 100},000') for i in range(1, 9)]
+        backends = [False] + ([True] if listing_index.numpy is not None else [])
+
+        scenarios = [
+            ('newest, page 1', '', 1, {}),
+            ('newest, page 200', '', 200, {}),
+            ('neighborhood, price asc, page 3', 'low-high', 3, {'neighborhood': neighborhoods[3].pk}),
+            ('type + range, price desc', 'high-low', 1, {
+                'property_type': property_types[2].pk, 'pricebucket': buckets[4].pk,
+            }),
+        ]
+
+        filled = 0
+        for count in sorted(counts):
+            fill_listings(count - filled, user, neighborhoods, property_types, statuses, seed=count)
+            filled = count
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            indexes = {use_numpy: listing_index.ListingIndex.load(use_numpy) for use_numpy in backends}
+            for index in indexes.values():
+                for price_sort in ('', 'low-high', 'high-low'):
+                    index.order(price_sort)
+
+            rows = []
+            for label, price_sort, page, filters in scenarios:
+                expected = orm_page(price_sort, page, filters)
+                row = [label, f'{timed(lambda: orm_page(price_sort, page, filters), repeat=10) * 1000:.2f}']
+                for use_numpy, index in indexes.items():
+                    assert index_page(index, price_sort, page, filters) == expected, label
+                    row.append(f'{timed(lambda: index.query(price_sort, **filters), repeat=50) * 1000:.3f}')
+                    row.append(
+                        f'{timed(lambda: index_page(index, price_sort, page, filters), repeat=10) * 1000:.2f}'
+                    )
+                rows.append(row)
+
+            headers = ['page', 'ORM ms']
+            for use_numpy in backends:
+                name = 'numpy' if use_numpy else 'python'
+                headers += [f'{name} query ms', f'{name} page ms']
+            print(f'\n{count:,} visible listings\n')
+            print_table(headers, rows)
+
+            listing = Listing.objects.order_by('?').first()
+            row = next(listing_index._visible_rows(pk=listing.pk))
+            maintenance = []
+            for use_numpy, index in indexes.items():
+                maintenance.append([
+                    'numpy' if use_numpy else 'python',
+                    f'{timed(lambda: listing_index.ListingIndex.load(use_numpy), repeat=3) * 1000:.1f}',
+                    f'{timed(lambda: index.replace(listing.pk, row), repeat=10) * 1000:.2f}',
+                ])
+            print()
+            print_table(['backend', 'full build ms', 'one-row patch ms'], maintenance)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--listings', type=int, nargs='+', default=[10_000, 100_000])
+    args = parser.parse_args()
+    run(args.listings)
+
+
+if __name__ == '__main__':
+    main()
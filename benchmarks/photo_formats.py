@@ -0,0 +1,83 @@
+"""
+Report: encoded size of each negotiated photo format.
+
+Encodes every image in listings/fixtures/images/ the way the photo endpoints
+do (full-size image, 300px thumbnail and one srcset width) as JPEG, WebP and
+AVIF, and prints per-image and total byte sizes relative to JPEG. The
+"image as served" row keeps the original upload wherever the re-encode is
+not smaller, as listing_photo does.
+
+    python -m benchmarks.photo_formats [--images DIR] [--width 640]
+"""
+import argparse
+from pathlib import Path
+
+from benchmarks.harness import PROJECT_ROOT, print_table, timed
+
+DEFAULT_IMAGE_DIR = PROJECT_ROOT / 'listings' / 'fixtures' / 'images'
+
+
+def run(image_dir, width):
+    from listings.image_utils import (
+        convert_image, format_supported, generate_rendition, generate_thumbnail,
+    )
+
+    formats = [f for f in ('JPEG', 'WEBP', 'AVIF') if format_supported(f)]
+    paths = sorted(
+        p for p in Path(image_dir).iterdir()
+        if p.suffix.lower() in ('.jpg', '.jpeg', '.png', '.gif')
+    )
+    if not paths:
+        print(f'No images found in {image_dir}')
+        return
+
+    outputs = {
+        'image': lambda data, fmt: convert_image(data, fmt),
+        'thumbnail': lambda data, fmt: generate_thumbnail(data, format=fmt),
+        f'{width}w': lambda data, fmt: generate_rendition(data, width, format=fmt),
+    }
+    totals = {(kind, fmt): 0 for kind in list(outputs) + ['image as served'] for fmt in formats}
+    encode_seconds = {fmt: 0.0 for fmt in formats}
+    rows = []
+
+    for path in paths:
+        data = path.read_bytes()
+        sizes = []
+        for fmt in formats:
+            size = len(convert_image(data, fmt))
+            totals[('image', fmt)] += size
+            totals[('image as served', fmt)] += min(size, len(data)) if fmt != 'JPEG' else len(data)
+            sizes.append(f'{size:,}')
+            encode_seconds[fmt] += timed(lambda: convert_image(data, fmt), repeat=1)
+            for kind, encode in outputs.items():
+                if kind != 'image':
+                    totals[(kind, fmt)] += len(encode(data, fmt))
+        rows.append([path.name, f'{len(data):,}'] + sizes)
+
+    print(f'{len(paths)} images from {image_dir}\n')
+    print('Full-size image, bytes per format:')
+    print_table(['image', 'original'] + formats, rows)
+
+    print('\nTotals by output:')
+    summary = []
+    for kind in list(outputs) + ['image as served']:
+        jpeg = totals[(kind, 'JPEG')]
+        summary.append([kind] + [
+            f'{totals[(kind, fmt)]:,} ({totals[(kind, fmt)] / jpeg:.0%})' for fmt in formats
+        ])
+    summary.append(['encode ms/image'] + [
+        f'{encode_seconds[fmt] / len(paths) * 1000:.1f}' for fmt in formats
+    ])
+    print_table(['output'] + formats, summary)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--images', default=str(DEFAULT_IMAGE_DIR))
+    parser.add_argument('--width', type=int, default=640)
+    args = parser.parse_args()
+    run(args.images, args.width)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark: database bytes read per photo request.
+
+Compares the old serving path (every request loaded the whole Photo row,
+image and thumbnail blobs included) with the current views, for a first
+fetch and for a browser/CDN revalidation that carries If-None-Match.
+
+    python -m benchmarks.photo_revalidation [--photos 50] [--image-kb 200]
+"""
+import argparse
+import os
+
+from benchmarks.harness import benchmark_database, print_table, timed
+
+
+def db_bytes_read(connection, captured_queries):
+    """Re-run captured SELECTs and total the size of every value they return."""
+    total = 0
+    with connection.cursor() as cursor:
+        for query in captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            cursor.execute(sql)
+            for row in cursor.fetchall():
+                for value in row:
+                    if value is None:
+                        continue
+                    total += len(value) if isinstance(value, (bytes, memoryview, str)) else 8
+    return total
+
+
+def run(photo_count, image_kb):
+    with benchmark_database() as connection:
+        from django.contrib.auth import get_user_model
+        from django.test import Client
+        from django.test.utils import CaptureQueriesContext
+        from django.urls import reverse
+        from listings.models import Listing, Neighborhood, Photo, PropertyType
+
+        user = get_user_model().objects.create_user(email='bench@example.com', password='x')
+        listing = Listing.objects.create(
+            address='1 Bench St', price=100000, created_by=user,
+            neighborhood=Neighborhood.objects.create(name='Bench'),
+            property_type=PropertyType.objects.create(name='House'),
+        )
+
+        migrated, legacy = [], []
+        for i in range(photo_count):
+            image = b'\xff\xd8\xff' + os.urandom(image_kb * 1024)
+            thumbnail = b'\xff\xd8\xff' + os.urandom(16 * 1024)
+            photo = Photo(listing=listing, photo_display_order=i)
+            photo.store_image(image)
+            photo.store_thumbnail(thumbnail)
+            photo.save()
+            migrated.append(photo)
+            legacy.append(Photo.objects.create(
+                listing=listing, image_data=image, thumbnail_data=thumbnail,
+            ))
+
+        client = Client()
+
+        def measure(label, photos, request):
+            statuses = set()
+            with CaptureQueriesContext(connection) as ctx:
+                for photo in photos:
+                    response = request(photo)
+                    statuses.add(getattr(response, 'status_code', 200))
+            total_bytes = db_bytes_read(connection, ctx.captured_queries)
+            elapsed = timed(lambda: [request(photo) for photo in photos], repeat=3)
+            return [
+                label,
+                '/'.join(str(s) for s in sorted(statuses)),
+                f'{total_bytes / len(photos):,.0f}',
+                f'{elapsed / len(photos) * 1000:.3f}',
+            ]
+
+        def old_view(photo):
+            # What listing_photo did before: load the full row, blobs included.
+            return Photo.objects.get(pk=photo.pk)
+
+        def get(photo, **headers):
+            return client.get(reverse('listing_photo', args=[photo.pk]), **headers)
+
+        for photo in migrated + legacy:
+            photo.etag = get(photo)['ETag']
+
+        def revalidate(photo):
+            return get(photo, HTTP_IF_NONE_MATCH=photo.etag)
+
+        rows = [
+            measure('old view (row with blobs)', legacy, old_view),
+            measure('blob store, first fetch', migrated, get),
+            measure('blob store, revalidation', migrated, revalidate),
+            measure('legacy row, first fetch', legacy, get),
+            measure('legacy row, revalidation', legacy, revalidate),
+        ]
+
+    print(f'{photo_count} photos, {image_kb} KB images, 16 KB thumbnails\n')
+    print_table(['scenario', 'status', 'DB bytes/request', 'ms/request'], rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--photos', type=int, default=50)
+    parser.add_argument('--image-kb', type=int, default=200)
+    args = parser.parse_args()
+    run(args.photos, args.image_kb)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark: listing-query latency while searches are being logged.
+
+Reader threads run the listings-page query while writer threads record
+searches, against an on-disk SQLite database so the threads really contend
+for its lock. Compares writing every SearchLog row as it happens with the
+buffered writer in ``listings.search_logging``.
+
+    python -m benchmarks.search_log_contention [--seconds 3] [--readers 4] [--writers 4]
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from benchmarks.harness import benchmark_database, print_table
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_mode(mode, seconds, readers, writers, max_size, max_age):
+    from django.db import OperationalError, connection
+    from listings.models import Listing, Neighborhood, SearchLog
+    from listings.search_logging import SearchLogBuffer, write_search_logs
+
+    SearchLog.objects.all().delete()
+    neighborhood = Neighborhood.objects.first()
+    buffer = SearchLogBuffer(max_size, max_age) if mode == 'buffered' else None
+    stop = threading.Event()
+    read_times, write_times = [], []
+    errors = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+
+    def reader():
+        samples, failed = [], 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                list(Listing.objects.filter(is_visible=True, neighborhood=neighborhood)
+                     .order_by('-listed_date', '-listing_id')[:12])
+            except OperationalError:
+                failed += 1
+            samples.append(time.perf_counter() - start)
+        connection.close()
+        with lock:
+            read_times.extend(samples)
+            errors['read'] += failed
+
+    def writer():
+        samples, failed = [], 0
+        while not stop.is_set():
+            log = SearchLog(neighborhood=neighborhood)
+            start = time.perf_counter()
+            try:
+                if buffer is None:
+                    write_search_logs([log])
+                else:
+                    buffer.add(log)
+            except OperationalError:
+                failed += 1
+            samples.append(time.perf_counter() - start)
+            # Searches arrive with some gap between them.
+            time.sleep(0.001)
+        connection.close()
+        with lock:
+            write_times.extend(samples)
+            errors['write'] += failed
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    if buffer is not None:
+        buffer.close()
+
+    return [
+        mode,
+        f"{len(read_times) / seconds:,.0f}",
+        f"{statistics.median(read_times) * 1000:.2f}",
+        f"{percentile(read_times, 0.99) * 1000:.2f}",
+        f"{percentile(write_times, 0.99) * 1000:.2f}",
+        f"{SearchLog.objects.count():,}",
+        errors['read'] + errors['write'],
+    ]
+
+
+def run(seconds, readers, writers, listing_count, max_size, max_age):
+    with benchmark_database(on_disk=True):
+        from django.contrib.auth import get_user_model
+        from listings.models import Listing, Neighborhood, PropertyType
+
+        user = get_user_model().objects.create_user(email='bench@example.com', password='x')
+        neighborhood = Neighborhood.objects.create(name='Bench')
+        property_type = PropertyType.objects.create(name='House')
+        Listing.objects.bulk_create(
+            Listing(address=f'{i} Bench St', price=100000 + i, created_by=user,
+                    neighborhood=neighborhood, property_type=property_type)
+            for i in range(listing_count)
+        )
+
+        rows = [
+            run_mode(mode, seconds, readers, writers, max_size, max_age)
+            for mode in ('write-through', 'buffered')
+        ]
+
+    print(f"{readers} readers, {writers} writers, {seconds}s per mode, "
+          f"buffer MAX_SIZE={max_size} MAX_AGE_SECONDS={max_age}")
+    print_table(
+        ['mode', 'reads/s', 'read p50 ms', 'read p99 ms', 'write p99 ms', 'logs written', 'lock errors'],
+        rows,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--listings', type=int, default=2000)
+    parser.add_argument('--max-size', type=int, default=100)
+    parser.add_argument('--max-age', type=float, default=1.0)
+    args = parser.parse_args()
+    run(args.seconds, args.readers, args.writers, args.listings, args.max_size, args.max_age)
+
+
+if __name__ == '__main__':
+    main()
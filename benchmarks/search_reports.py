@@ -0,0 +1,116 @@
+"""
+Benchmark: search report aggregation strategies over a large search log.
+
+Fills the log with synthetic searches spread over a year, rebuilds the
+daily rollup, then times one month's report with the previous three
+GROUP BY queries and with ``listings.reports.search_report``'s ``union``
+and ``scan`` strategies, reading the raw log and the rollup.
+
+    python -m benchmarks.search_reports [--rows 1000000] [--granularity week]
+"""
+import argparse
+import random
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from benchmarks.harness import benchmark_database, print_table, timed
+
+
+def fill_search_log(connection, rows, dimension_ids, seed=1):
+    """Insert ``rows`` synthetic searches spread over 2025, one executemany per batch."""
+    from django.db import transaction
+
+    rng = random.Random(seed)
+    year_start = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+    def pick(ids, used):
+        # Most searches leave a filter unset, and a few values are popular.
+        if rng.random() >= used:
+            return None
+        return rng.choices(ids, weights=[1 / (rank + 1) for rank in range(len(ids))])[0]
+
+    batch = []
+    with connection.cursor() as cursor:
+        for i in range(rows):
+            batch.append((
+                *(pick(ids, used) for ids, used in zip(dimension_ids, (0.5, 0.6, 0.3))),
+                (year_start + timedelta(seconds=rng.randrange(365 * 86400))).isoformat(sep=' '),
+            ))
+            if len(batch) == 50000 or i == rows - 1:
+                # One transaction per batch; in autocommit SQLite syncs every row.
+                with transaction.atomic():
+                    cursor.executemany(
+                        'INSERT INTO "Search_Log" ("Property_Type_ID", "Neighborhood_ID", "Pricebucket_ID", "Timestamp") '
+                        'VALUES (%s, %s, %s, %s)',
+                        batch,
+                    )
+                batch = []
+
+
+def three_queries(start_day, end_day):
+    """The report as generate_report used to build it: one GROUP BY per section."""
+    from django.db.models import Count
+    from listings import reports
+
+    logs = reports.search_logs_between(*reports.datetime_range(start_day, end_day))
+    return {
+        section: list(
+            logs.filter(**{f'{fk}__isnull': False})
+            .values(f'{fk}__{name}')
+            .annotate(search_count=Count('search_log_id'))
+            .order_by('-search_count')
+        )
+        for section, (fk, name, _) in reports.DIMENSIONS.items()
+    }
+
+
+def run(row_count, granularity):
+    with benchmark_database(on_disk=True) as connection:
+        from listings import reports
+        from listings.models import Neighborhood, Pricebucket, PropertyType
+        from listings.search_logging import rebuild_search_rollups
+
+        dimension_ids = (
+            [PropertyType.objects.create(name=f'Type {i}').pk for i in range(6)],
+            [Neighborhood.objects.create(name=f'Neighborhood {i}').pk for i in range(40)],
+            [Pricebucket.objects.create(range=f'${i * 50},000 - ${i * 50 + 50},000').pk for i in range(1, 16)],
+        )
+        fill_search_log(connection, row_count, dimension_ids)
+        rollup_rows = rebuild_search_rollups()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        start_day, end_day = date(2025, 3, 1), date(2025, 4, 1)
+        reference = reports.search_report(start_day, end_day, granularity, 'log', 'union')
+        scenarios = [('three GROUP BY queries', 'log', lambda: three_queries(start_day, end_day))]
+        for source in reports.SOURCES:
+            for strategy in reports.STRATEGIES:
+                scenarios.append((
+                    f'{strategy}',
+                    source,
+                    lambda source=source, strategy=strategy: reports.search_report(
+                        start_day, end_day, granularity, source, strategy
+                    ),
+                ))
+
+        rows = []
+        for label, source, func in scenarios:
+            if label != 'three GROUP BY queries':
+                assert func() == reference, f'{label} on {source} disagrees with union on log'
+            repeat = 3 if source == 'log' else 20
+            rows.append([label, source, f'{timed(func, repeat=repeat) * 1000:.1f}'])
+
+    print(f'{row_count:,} searches over 2025, {rollup_rows:,} rollup rows; '
+          f'report for March 2025, granularity {granularity or "none"}\n')
+    print_table(['strategy', 'source', 'ms/report'], rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--granularity', choices=['day', 'week'], default=None)
+    args = parser.parse_args()
+    run(args.rows, args.granularity)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,8 +4,10 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 from .models import (
     User, Status, PropertyType, Neighborhood, Pricebucket,
-    Listing, Photo, SearchLog, OmahaResource, OmahaLocation
+    Listing, Photo, SearchLog, OmahaResource, OmahaLocation, ImageJob
 )
+from . import listing_search
+from .jobs import retry_jobs
 
 
 @admin.register(User)
@@ -57,8 +59,9 @@ class NeighborhoodAdmin(admin.ModelAdmin):
 
 @admin.register(Pricebucket)
 class PricebucketAdmin(admin.ModelAdmin):
-    list_display = ['range']
+    list_display = ['range', 'min_price', 'max_price']
     search_fields = ['range']
+    readonly_fields = ['min_price', 'max_price']
 
 
 @admin.register(Listing)
@@ -71,8 +74,11 @@ class ListingAdmin(admin.ModelAdmin):
         'property_type', 'neighborhood', 'status', 'is_visible',
         'is_featured', 'status_id', 'listed_date'
     ]
+    # Searched through the Listing_FTS index; see get_search_results().
     search_fields = ['address', 'description']
-    readonly_fields = ['listed_date']
+    # pricebucket is derived from price in Listing.save(), primary_photo
+    # from the listing's photos.
+    readonly_fields = ['listed_date', 'pricebucket', 'primary_photo']
     fieldsets = (
         ('Basic Information', {
             'fields': ('address', 'price', 'description', 'created_by')
@@ -87,10 +93,15 @@ class ListingAdmin(admin.ModelAdmin):
             'fields': ('status', 'status_id', 'is_visible', 'is_featured')
         }),
         ('Metadata', {
-            'fields': ('listed_date',)
+            'fields': ('listed_date', 'primary_photo')
         }),
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        return listing_search.search(queryset, search_term), False
+
 
 @admin.register(Photo)
 class PhotoAdmin(admin.ModelAdmin):
@@ -99,13 +110,40 @@ class PhotoAdmin(admin.ModelAdmin):
     search_fields = ['listing__address']
 
 
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ['image_job_id', 'photo', 'kind', 'status', 'attempts', 'run_after', 'updated_date']
+    list_filter = ['status', 'kind']
+    readonly_fields = ['created_date', 'updated_date', 'last_error']
+    actions = ['retry_selected']
+
+    @admin.action(description='Retry selected jobs')
+    def retry_selected(self, request, queryset):
+        count = retry_jobs(queryset)
+        self.message_user(request, f"{count} job(s) queued for retry.")
+
+
 @admin.register(SearchLog)
 class SearchLogAdmin(admin.ModelAdmin):
+    """
+    Read-only: the search reports count SearchLogDailyRollup, which is only
+    kept in step by ``write_search_logs``, so rows added, edited or deleted
+    here would make the reports drift from the log.
+    """
     list_display = ['search_log_id', 'property_type', 'neighborhood', 'pricebucket', 'timestamp']
     list_filter = ['property_type', 'neighborhood', 'pricebucket', 'timestamp']
     readonly_fields = ['timestamp']
     date_hierarchy = 'timestamp'
 
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(OmahaResource)
 class OmahaResourceAdmin(admin.ModelAdmin):
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class ListingsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'listings'
+
+    def ready(self):
+        # Connect the save/delete signals that invalidate the lookup caches,
+        # the facet counts, the AJAX fragment cache, the in-memory listing
+        # index and the address autocomplete, the post_migrate check of the
+        # full-text search triggers, and the folding of search rollups when a
+        # lookup row is deleted.
+        from . import (  # noqa: F401
+            autocomplete, facets, fragment_cache, listing_index, listing_search, lookups, search_logging,
+        )
@@ -0,0 +1,387 @@
+"""
+In-process address autocomplete for the listings search box.
+
+``/listings/autocomplete/?q=...`` suggests visible listings as the user
+types a street address. A ``LIKE '%...%'`` scan per keystroke would read
+every Listing row, so suggestions come from an ``AddressIndex`` held in
+memory instead:
+
+* a character trie over the distinct address words, so a typed prefix
+  expands to the words it starts in a few dict lookups;
+* posting sets from each word to the listings that contain it;
+* a trigram index over the same words, used when the prefixes alone find
+  too few listings, so "gardn" or "grden" still suggest "Garden St".
+
+Every typed word must match a word of the address, as a prefix or, in the
+second pass, as a close spelling. Addresses starting with the whole typed
+text rank first, then shorter addresses. House numbers only match exactly
+or as a prefix.
+
+Memory is bounded by ``MAX_LISTINGS``: the newest visible listings are
+indexed, and a listing added to a full index evicts the oldest one.
+``stats()`` reports sizes and an estimate of the bytes held.
+
+The index is updated in place, under a lock. A Listing save or delete
+reloads that one row after the transaction commits. Other processes find
+out through a version counter in the cache (``versioning.VersionCounter``),
+and rebuild from the database on their next query. Code that changes
+addresses or visibility with ``QuerySet.update()`` must call
+``bump_version()``.
+
+An index older than ``MAX_AGE`` seconds is rebuilt by a background thread
+while requests keep using it, and swapped in when it is ready.
+Suggestions are checked against the database by primary key before they
+are returned, so a stale index can miss a listing but never suggests one
+that has since been hidden or deleted.
+
+Configure with ``settings.LISTING_AUTOCOMPLETE``::
+
+    LISTING_AUTOCOMPLETE = {
+        'CACHE': 'default',     # alias in settings.CACHES for the version counter
+        'MAX_LISTINGS': 100000,
+        'MAX_AGE': 300,         # seconds before a process rebuilds its index regardless
+        'LIMIT': 8,             # suggestions returned when the request asks for none
+    }
+"""
+import heapq
+import re
+import sys
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .versioning import ProcessSnapshot, VersionCounter
+
+DEFAULTS = {
+    'CACHE': 'default',
+    'MAX_LISTINGS': 100000,
+    'MAX_AGE': 300,
+    'LIMIT': 8,
+}
+
+# Most suggestions one request may ask for.
+MAX_LIMIT = 20
+
+# Longest typed text that is used; the rest is ignored.
+MAX_QUERY_LENGTH = 100
+
+# Address words are indexed up to this many characters.
+MAX_WORD_LENGTH = 32
+
+# Words one typed prefix may expand to, shortest first.
+MAX_EXPANSIONS = 50
+
+# Listings ranked for one request; short prefixes match more than this.
+MAX_CANDIDATES = 2000
+
+# Share of a typed word's trigrams an address word must contain to count
+# as a close spelling, and how many such words are tried.
+MIN_SIMILARITY = 0.5
+MAX_CORRECTIONS = 8
+
+# Key marking the end of a word in a trie node; every other key is one
+# character long.
+END = ''
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'LISTING_AUTOCOMPLETE', {})}
+
+
+def _cache():
+    return caches[_config()['CACHE']]
+
+
+def normalize(text):
+    """Return ``text`` lowercased, without accents, as single-spaced words."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.findall(r'\w+', text.lower()))
+
+
+def trigrams(word):
+    """Return the trigrams of ``word``, padded at the start only."""
+    padded = '  ' + word
+    return {padded[i:i + 3] for i in range(len(word))}
+
+
+class AddressIndex:
+    """Prefix trie and trigram index over the addresses of some listings."""
+
+    def __init__(self, max_listings=None):
+        self.max_listings = _config()['MAX_LISTINGS'] if max_listings is None else max_listings
+        # listing_id -> (address, normalized address, words), oldest listing
+        # first
+        self.entries = {}
+        # word -> set of listing ids
+        self.postings = {}
+        # trigram -> set of words
+        self.trigram_words = {}
+        self.trie = {}
+        self.nodes = 0
+        self.evicted = 0
+
+    @classmethod
+    def load(cls, max_listings=None):
+        """Build an index of the newest visible listings in the database."""
+        from .models import Listing
+
+        index = cls(max_listings)
+        rows = Listing.objects.filter(is_visible=True).order_by('-listed_date', '-listing_id')
+        rows = list(rows.values_list('listing_id', 'address')[:index.max_listings])
+        # Oldest first, so listings added later evict from the front.
+        for listing_id, address in reversed(rows):
+            index.add(listing_id, address)
+        return index
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, listing_id, address):
+        """
+        Index one listing, evicting the oldest if the index is full. A
+        listing already held is re-indexed and keeps its place.
+        """
+        entry = self.entries.get(listing_id)
+        if entry is not None:
+            self._unindex(listing_id, entry[2])
+        elif not self.max_listings:
+            return
+        elif len(self.entries) >= self.max_listings:
+            self.remove(next(iter(self.entries)))
+            self.evicted += 1
+        normalized = normalize(address)
+        words = tuple(dict.fromkeys(word[:MAX_WORD_LENGTH] for word in normalized.split()))
+        self.entries[listing_id] = (address, normalized, words)
+        for word in words:
+            postings = self.postings.get(word)
+            if postings is None:
+                postings = self.postings[word] = set()
+                self._add_word(word)
+            postings.add(listing_id)
+
+    def remove(self, listing_id):
+        """Drop one listing; a no-op if it isn't indexed."""
+        entry = self.entries.pop(listing_id, None)
+        if entry is not None:
+            self._unindex(listing_id, entry[2])
+
+    def _unindex(self, listing_id, words):
+        for word in words:
+            postings = self.postings[word]
+            postings.discard(listing_id)
+            if not postings:
+                del self.postings[word]
+                self._remove_word(word)
+
+    def replace(self, listing_id, address):
+        """Re-index one listing, or drop it if ``address`` is None; return the index."""
+        if address is None:
+            self.remove(listing_id)
+        else:
+            self.add(listing_id, address)
+        return self
+
+    def _add_word(self, word):
+        node = self.trie
+        for char in word:
+            child = node.get(char)
+            if child is None:
+                child = node[char] = {}
+                self.nodes += 1
+            node = child
+        node[END] = word
+        if not word.isdigit():
+            for trigram in trigrams(word):
+                self.trigram_words.setdefault(trigram, set()).add(word)
+
+    def _remove_word(self, word):
+        path = [self.trie]
+        for char in word:
+            path.append(path[-1][char])
+        del path[-1][END]
+        # Prune the nodes no other word runs through, deepest first.
+        for depth in range(len(word), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][word[depth - 1]]
+            self.nodes -= 1
+        if not word.isdigit():
+            for trigram in trigrams(word):
+                words = self.trigram_words[trigram]
+                words.discard(word)
+                if not words:
+                    del self.trigram_words[trigram]
+
+    def expand(self, prefix, limit=MAX_EXPANSIONS):
+        """Return up to ``limit`` indexed words starting with ``prefix``, shortest first."""
+        node = self.trie
+        for char in prefix[:MAX_WORD_LENGTH]:
+            node = node.get(char)
+            if node is None:
+                return []
+        found = []
+        level = [node]
+        while level:
+            next_level = []
+            for node in level:
+                for key, child in node.items():
+                    if key == END:
+                        found.append(child)
+                        if len(found) >= limit:
+                            return found
+                    else:
+                        next_level.append(child)
+            level = next_level
+        return found
+
+    def corrections(self, word):
+        """Return up to ``MAX_CORRECTIONS`` indexed words spelled like ``word``."""
+        if len(word) < 3 or word.isdigit():
+            return []
+        wanted = trigrams(word)
+        shared = {}
+        for trigram in wanted:
+            for candidate in self.trigram_words.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        needed = MIN_SIMILARITY * len(wanted)
+        close = [
+            (-count, abs(len(candidate) - len(word)), candidate)
+            for candidate, count in shared.items()
+            if count >= needed and len(candidate) >= len(word) - 1
+        ]
+        return [candidate for _, _, candidate in heapq.nsmallest(MAX_CORRECTIONS, close)]
+
+    def _candidates(self, words):
+        ids = set()
+        for word in words:
+            ids.update(self.postings[word])
+            if len(ids) >= MAX_CANDIDATES:
+                break
+        return ids
+
+    def complete(self, text, limit=None):
+        """Return up to ``limit`` ``(listing_id, address)`` suggestions for ``text``."""
+        limit = _config()['LIMIT'] if limit is None else limit
+        typed = normalize(text[:MAX_QUERY_LENGTH])
+        words = typed.split()
+        if not words or limit <= 0:
+            return []
+        # The longest word is usually the most selective; the others are
+        # checked against each candidate's own words.
+        driver = max(words, key=len)
+
+        def rank(listing_id):
+            _, normalized, _ = self.entries[listing_id]
+            return (not normalized.startswith(typed), len(normalized), normalized, listing_id)
+
+        def matches(listing_id, alternatives):
+            address_words = self.entries[listing_id][2]
+            return all(
+                any(word.startswith(typed_word) or word in alternatives.get(typed_word, ())
+                    for word in address_words)
+                for typed_word in words
+            )
+
+        exact = self._candidates(self.expand(driver))
+        if len(words) > 1:
+            exact = [listing_id for listing_id in exact if matches(listing_id, {})]
+        found = heapq.nsmallest(limit, exact, key=rank)
+
+        if len(found) < limit:
+            alternatives = {word: set(self.corrections(word)) for word in words}
+            if any(alternatives.values()):
+                seen = set(exact)
+                fuzzy = [
+                    listing_id
+                    for listing_id in self._candidates(self.expand(driver) + sorted(alternatives[driver]))
+                    if listing_id not in seen and matches(listing_id, alternatives)
+                ]
+                found += heapq.nsmallest(limit - len(found), fuzzy, key=rank)
+
+        return [(listing_id, self.entries[listing_id][0]) for listing_id in found]
+
+    def stats(self):
+        """Return the index's sizes, with an estimate of the bytes it holds."""
+        size = sys.getsizeof
+        nbytes = size(self.entries) + size(self.postings) + size(self.trigram_words)
+        for address, normalized, words in self.entries.values():
+            nbytes += size(address) + size(normalized) + size(words)
+        for word, postings in self.postings.items():
+            nbytes += size(word) + size(postings)
+        for trigram, words in self.trigram_words.items():
+            nbytes += size(trigram) + size(words)
+        stack = [self.trie]
+        while stack:
+            node = stack.pop()
+            nbytes += size(node)
+            stack.extend(child for key, child in node.items() if key != END)
+        return {
+            'listings': len(self.entries),
+            'max_listings': self.max_listings,
+            'evicted': self.evicted,
+            'words': len(self.postings),
+            'trie_nodes': self.nodes,
+            'trigrams': len(self.trigram_words),
+            'approx_bytes': nbytes,
+        }
+
+
+counter = VersionCounter('listings:autocomplete:version', _cache)
+snapshot = ProcessSnapshot(counter, AddressIndex.load, refresh_in_background=True)
+
+
+def current_version():
+    """Return the shared version the index must be built at."""
+    return counter.current()
+
+
+def bump_version():
+    """Make every process rebuild its index; return the new version or None."""
+    return counter.bump()
+
+
+def complete(text, limit=None):
+    """Return up to ``limit`` ``(listing_id, address)`` suggestions for ``text``."""
+    from .models import Listing
+
+    index = snapshot.get(max_age=_config()['MAX_AGE'])
+    # Saves patch the index in place under this lock.
+    with snapshot.lock:
+        suggestions = index.complete(text, limit)
+    if not suggestions:
+        return []
+    # Another process may have hidden, deleted or readdressed these since
+    # this index was built.
+    current = dict(
+        Listing.objects.filter(pk__in=[listing_id for listing_id, _ in suggestions], is_visible=True)
+        .order_by().values_list('listing_id', 'address')
+    )
+    return [(listing_id, current[listing_id]) for listing_id, _ in suggestions if listing_id in current]
+
+
+def stats():
+    """Return this process's index sizes; builds the index if needed."""
+    index = snapshot.get(max_age=_config()['MAX_AGE'])
+    with snapshot.lock:
+        return {**index.stats(), 'version': snapshot.version}
+
+
+def clear():
+    """Drop this process's index; the next query rebuilds it."""
+    snapshot.clear()
+
+
+def _visible_address(listing_id):
+    from .models import Listing
+
+    return Listing.objects.filter(pk=listing_id, is_visible=True).values_list('address', flat=True).first()
+
+
+snapshot.patch_on_change(
+    'listings.Listing',
+    load=_visible_address,
+    change=lambda index, listing_id, address: index.replace(listing_id, address),
+    dispatch_uid='autocomplete',
+)
@@ -0,0 +1,216 @@
+"""
+Content-addressed blob storage for photo bytes.
+
+Photo rows keep a SHA-256 digest and a byte size; the bytes themselves live
+in a pluggable backend configured through ``settings.PHOTO_BLOB_STORAGE``::
+
+    PHOTO_BLOB_STORAGE = {
+        'BACKEND': 'listings.blob_storage.FileSystemBlobStorage',
+        'OPTIONS': {'location': BASE_DIR / 'media' / 'photo_blobs'},
+    }
+
+Identical bytes always map to the same digest, so saving the same image
+twice stores it once.
+"""
+import hashlib
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+# Bytes read at a time when streaming a file into the store.
+CHUNK_SIZE = 64 * 1024
+
+
+def _iter_chunks(fileobj):
+    if hasattr(fileobj, 'chunks'):
+        # Django UploadedFile: rewinds and reads in chunks.
+        yield from fileobj.chunks(CHUNK_SIZE)
+        return
+    while chunk := fileobj.read(CHUNK_SIZE):
+        yield chunk
+
+
+def _copy_hashed(fileobj, target):
+    """Copy ``fileobj`` into ``target`` and return its ``(digest, size)``."""
+    sha = hashlib.sha256()
+    size = 0
+    for chunk in _iter_chunks(fileobj):
+        sha.update(chunk)
+        target.write(chunk)
+        size += len(chunk)
+    return sha.hexdigest(), size
+
+
+class BlobNotFound(Exception):
+    """Raised when a digest is not present in the blob store."""
+
+
+class BlobStorage:
+    """
+    Base class for blob storage backends.
+
+    Subclasses implement ``_write``, ``open``, ``exists`` and ``delete``;
+    ``save`` takes care of hashing.
+    """
+
+    def save(self, data):
+        """
+        Store ``data`` and return a ``(digest, size)`` tuple.
+
+        ``data`` is bytes or a binary file object; files (including Django
+        uploads) are streamed through ``save_file``. Saving bytes that are
+        already stored is a no-op.
+        """
+        if hasattr(data, 'read'):
+            return self.save_file(data)
+        data = bytes(data)
+        digest = hashlib.sha256(data).hexdigest()
+        if not self.exists(digest):
+            self._write(digest, data)
+        return digest, len(data)
+
+    def save_file(self, fileobj):
+        """
+        Store the contents of a binary file object and return ``(digest, size)``.
+
+        The file is hashed while it is copied in ``CHUNK_SIZE`` pieces. This
+        default spools to a temporary file and passes the bytes to
+        ``_write``; backends that can write incrementally override it so the
+        file is never held in memory whole.
+        """
+        with tempfile.TemporaryFile() as spool:
+            digest, size = _copy_hashed(fileobj, spool)
+            if not self.exists(digest):
+                spool.seek(0)
+                self._write(digest, spool.read())
+        return digest, size
+
+    def read(self, digest):
+        """Return the stored bytes for ``digest``."""
+        with self.open(digest) as fh:
+            return fh.read()
+
+    def _write(self, digest, data):
+        raise NotImplementedError
+
+    def open(self, digest):
+        """Return a binary file object positioned at the start of the blob."""
+        raise NotImplementedError
+
+    def exists(self, digest):
+        raise NotImplementedError
+
+    def delete(self, digest):
+        raise NotImplementedError
+
+
+class FileSystemBlobStorage(BlobStorage):
+    """
+    Store blobs on the local filesystem in sharded directories.
+
+    A digest ``ab12cd...`` is written to ``<location>/ab/12/ab12cd...`` so no
+    single directory grows past a few thousand entries.
+    """
+
+    def __init__(self, location, shard_levels=2, shard_width=2):
+        if not location:
+            raise ImproperlyConfigured('FileSystemBlobStorage requires a location.')
+        self.location = Path(location)
+        self.shard_levels = shard_levels
+        self.shard_width = shard_width
+
+    def path(self, digest):
+        """Return the filesystem path for ``digest``."""
+        if not digest or not all(c in '0123456789abcdef' for c in digest):
+            raise ValueError(f'Invalid blob digest: {digest!r}')
+        parts = [
+            digest[i * self.shard_width:(i + 1) * self.shard_width]
+            for i in range(self.shard_levels)
+        ]
+        return self.location.joinpath(*parts, digest)
+
+    def _write(self, digest, data):
+        target = self.path(digest)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file in the same directory and rename it into
+        # place, so readers never observe a partially written blob.
+        fd, tmp_path = tempfile.mkstemp(dir=target.parent, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(data)
+            os.replace(tmp_path, target)
+        except BaseException:
+            _unlink_quietly(tmp_path)
+            raise
+
+    def save_file(self, fileobj):
+        # The digest is only known at the end, so stream into a temporary
+        # file under the store root and rename it into its shard afterwards.
+        self.location.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.location, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                digest, size = _copy_hashed(fileobj, fh)
+            target = self.path(digest)
+            if target.exists():
+                _unlink_quietly(tmp_path)
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, target)
+        except BaseException:
+            _unlink_quietly(tmp_path)
+            raise
+        return digest, size
+
+    def open(self, digest):
+        try:
+            return open(self.path(digest), 'rb')
+        except FileNotFoundError:
+            raise BlobNotFound(digest)
+
+    def exists(self, digest):
+        return self.path(digest).exists()
+
+    def delete(self, digest):
+        try:
+            self.path(digest).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _unlink_quietly(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def _default_config():
+    return {
+        'BACKEND': 'listings.blob_storage.FileSystemBlobStorage',
+        'OPTIONS': {'location': Path(settings.MEDIA_ROOT) / 'photo_blobs'},
+    }
+
+
+@lru_cache(maxsize=None)
+def get_blob_storage():
+    """Return the configured blob storage backend instance."""
+    config = getattr(settings, 'PHOTO_BLOB_STORAGE', None) or _default_config()
+    try:
+        backend_class = import_string(config['BACKEND'])
+    except (KeyError, ImportError) as e:
+        raise ImproperlyConfigured(f'Invalid PHOTO_BLOB_STORAGE backend: {e}')
+    return backend_class(**config.get('OPTIONS', {}))
+
+
+@receiver(setting_changed)
+def _reset_blob_storage(*, setting, **kwargs):
+    if setting in ('PHOTO_BLOB_STORAGE', 'MEDIA_ROOT'):
+        get_blob_storage.cache_clear()
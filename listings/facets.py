@@ -0,0 +1,165 @@
+"""
+Result counts for the listings filter dropdowns.
+
+Next to each neighborhood, property type and price range, the listings
+page shows how many listings choosing it would return, given the other
+filters, the keyword search and the visibility in effect. Each dimension
+ignores its own selection, so switching from one neighborhood to another
+shows real numbers. Options that would return nothing are disabled.
+
+Each dimension is one grouped query over the filtered listings, or a count
+over the in-memory listing index when that serves the page. The counts are
+cached per normalized filter set and visibility, under a version counter
+that is part of every key. The counter is bumped when a Listing (or a
+lookup row) is saved or deleted, and by code that changes listings with
+``QuerySet.update()``. Old entries are never read again and age out after
+``TIMEOUT``.
+
+Configure with ``settings.LISTING_FACETS``::
+
+    LISTING_FACETS = {
+        'ENABLED': True,      # cache the counts
+        'CACHE': 'default',   # alias in settings.CACHES
+        'TIMEOUT': 300,       # seconds an entry is kept; 0 disables caching
+    }
+
+Caching is on by default, since uncached every listings page runs the
+grouped queries. How far invalidation reaches depends on the cache backend
+(see ``versioning.VersionCounter``).
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count
+
+from . import listing_index, listing_search
+from .versioning import VersionCounter
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+}
+
+# Facet name (as in the all_listings query string) -> Listing field, and
+# the listing index column it is counted from.
+DIMENSIONS = {
+    'neighborhood': ('neighborhood_id', 'neighborhood'),
+    'type': ('property_type_id', 'property_type'),
+    'price_range': ('pricebucket_id', 'pricebucket'),
+}
+
+# Saving or deleting any of these can change a count.
+INVALIDATING_MODELS = [
+    'listings.Listing',
+    'listings.Neighborhood',
+    'listings.PropertyType',
+    'listings.Pricebucket',
+]
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'LISTING_FACETS', {})}
+
+
+def _cache():
+    return caches[_config()['CACHE']]
+
+
+def enabled():
+    """Return True if facet counts are cached."""
+    config = _config()
+    return bool(config['ENABLED'] and config['TIMEOUT'])
+
+
+counter = VersionCounter('listings:facets:version', _cache)
+
+
+def current_version():
+    """Return the listing-table version that cache keys are built from."""
+    return counter.current()
+
+
+def bump_version():
+    """Invalidate every cached set of counts."""
+    counter.bump()
+
+
+def cache_key(visibility, selected, search=''):
+    """
+    Return the cache key for one filter set. ``visibility`` is 'visible',
+    'hidden' or 'all' as the view applied it, and ``selected`` maps facet
+    names to the selected id or None.
+    """
+    parts = [visibility, *(selected.get(name) for name in DIMENSIONS), listing_search.digest(search)]
+    normalized = ':'.join('' if part is None else str(part) for part in parts)
+    return f'listings:facets:{current_version()}:{normalized}'
+
+
+def _database_counts(visibility, selected, search):
+    from .models import Listing
+
+    listings = Listing.objects.all()
+    if visibility != 'all':
+        listings = listings.filter(is_visible=visibility == 'visible')
+    listings = listing_search.search(listings, search, rank=False)
+    counts = {}
+    for name, (field, _) in DIMENSIONS.items():
+        others = {
+            DIMENSIONS[other][0]: value
+            for other, value in selected.items() if other != name and value is not None
+        }
+        rows = listings.filter(**others).order_by().values_list(field).annotate(rows=Count('pk'))
+        counts[name] = dict(rows)
+    return counts
+
+
+def _index_counts(selected):
+    index = listing_index.get_index()
+    filters = {column: selected.get(name) for name, (_, column) in DIMENSIONS.items()}
+    counts = {}
+    for name, (_, column) in DIMENSIONS.items():
+        counts[name] = index.counts(column, **{
+            other: value for other, value in filters.items() if other != column
+        })
+    return counts
+
+
+def compute(visibility, selected, search=''):
+    """
+    Return the counts for one filter set, uncached: ``{facet: {id: rows}}``
+    for each of ``DIMENSIONS``, plus ``total``, the rows matching every
+    filter.
+    """
+    selected = {name: selected.get(name) for name in DIMENSIONS}
+    # The index holds visible listings and no text.
+    if listing_index.enabled() and visibility == 'visible' and not listing_search.terms(search):
+        counts = _index_counts(selected)
+    else:
+        counts = _database_counts(visibility, selected, search)
+
+    # Any one dimension's counts, with its own selection applied, give the total.
+    name = next(iter(DIMENSIONS))
+    if selected[name] is None:
+        total = sum(counts[name].values())
+    else:
+        total = counts[name].get(selected[name], 0)
+    # Listings without a price bucket aren't an option in any dropdown.
+    result = {name: {value: rows for value, rows in by_value.items() if value is not None}
+              for name, by_value in counts.items()}
+    result['total'] = total
+    return result
+
+
+def get_counts(visibility, selected, search=''):
+    """Return the counts for one filter set (see ``compute``), cached."""
+    if not enabled():
+        return compute(visibility, selected, search)
+    key = cache_key(visibility, selected, search)
+    counts = _cache().get(key)
+    if counts is None:
+        counts = compute(visibility, selected, search)
+        _cache().set(key, counts, timeout=_config()['TIMEOUT'])
+    return counts
+
+
+counter.bump_on_change(INVALIDATING_MODELS, 'facets')
@@ -5,6 +5,7 @@ from django.core.validators import validate_email
 from django.contrib.auth.forms import AuthenticationForm
 from django.template.base import logger
 from .models import Listing, OmahaLocation, Photo
+from .jobs import enqueue_photo_jobs
 
 
 class CustomLoginForm(AuthenticationForm):
@@ -132,8 +133,12 @@ class ListingForm(forms.ModelForm):
                         continue
 
                     if hasattr(Photo, 'image_data'):
-                        data = photo_file.read()
-                        Photo.objects.create(listing=listing, image_data=data, photo_display_order=i)
+                        p = Photo(listing=listing, photo_display_order=i, is_processed=False)
+                        # Streamed into the blob store chunk by chunk, never read whole.
+                        p.store_image(photo_file)
+                        p.save()
+                        # Compression and thumbnailing run in run_image_worker.
+                        enqueue_photo_jobs(p)
                         continue
 
                     Photo.objects.create(listing=listing, photo=photo_file)
@@ -0,0 +1,111 @@
+"""
+Rendered-fragment cache for AJAX listing pages.
+
+Most AJAX calls to all_listings are anonymous visitors paging through the
+same few filter and sort combinations. The rendered listing and
+pagination fragments (with the counts that go with them) are cached per
+normalized filter tuple, search words, page and viewer class, so a repeat
+request skips the COUNT, the page query and both templates.
+
+The viewer class is ``anonymous`` or ``staff``. The fragments show the
+edit/hide controls to every authenticated user, so every authenticated
+user is ``staff`` here, and the two classes never share an entry.
+Anonymous keys ignore the ``visibility`` parameter, because anonymous
+visitors only ever see visible listings.
+
+Entries are invalidated through a version counter that is part of every
+key. It is bumped when a Listing or Photo (or a lookup row shown on the
+cards) is saved or deleted, and explicitly by code that changes those
+tables with ``QuerySet.update()``, which sends no signals. Old entries are
+never read again and age out after ``TIMEOUT``.
+
+Configure with ``settings.LISTING_FRAGMENT_CACHE``::
+
+    LISTING_FRAGMENT_CACHE = {
+        'ENABLED': True,
+        'CACHE': 'default',   # alias in settings.CACHES
+        'TIMEOUT': 300,       # seconds an entry is kept
+    }
+
+It is off by default: invalidation only reaches every process through a
+shared backend (see ``versioning.VersionCounter``).
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from . import listing_search
+from .versioning import VersionCounter
+
+DEFAULTS = {
+    'ENABLED': False,
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+}
+
+# Saving or deleting any of these changes what a listing card shows.
+INVALIDATING_MODELS = [
+    'listings.Listing',
+    'listings.Photo',
+    'listings.Status',
+    'listings.Neighborhood',
+    'listings.PropertyType',
+    'listings.Pricebucket',
+]
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'LISTING_FRAGMENT_CACHE', {})}
+
+
+def _cache():
+    return caches[_config()['CACHE']]
+
+
+def enabled():
+    """Return True if AJAX listing fragments are cached."""
+    return _config()['ENABLED']
+
+
+counter = VersionCounter('listings:fragments:version', _cache)
+
+
+def current_version():
+    """Return the listing-table version that cache keys are built from."""
+    return counter.current()
+
+
+def bump_version():
+    """Invalidate every cached fragment."""
+    counter.bump()
+
+
+def viewer_class(user):
+    """Return 'staff' for users who see the listing controls, else 'anonymous'."""
+    return 'staff' if user.is_authenticated else 'anonymous'
+
+
+def cache_key(viewer, neighborhood, property_type, price_range, price_sort, visibility, page, search=''):
+    """
+    Return the cache key for one page of the listings grid. Filters are the
+    parsed ids (or None) and the sort and visibility names as the view
+    applied them. ``search`` is the keyword search text; searches with the
+    same words share a key.
+    """
+    if viewer != 'staff':
+        visibility = ''
+    parts = [neighborhood, property_type, price_range, price_sort, visibility, page, listing_search.digest(search)]
+    normalized = ':'.join('' if part is None else str(part) for part in parts)
+    return f'listings:fragments:{current_version()}:{viewer}:{normalized}'
+
+
+def get_fragments(key):
+    """Return the cached payload for ``key``, or None."""
+    return _cache().get(key)
+
+
+def set_fragments(key, payload):
+    """Cache an AJAX payload (a dict of rendered fragments and counts)."""
+    _cache().set(key, payload, timeout=_config()['TIMEOUT'])
+
+
+counter.bump_on_change(INVALIDATING_MODELS, 'fragments')
@@ -0,0 +1,211 @@
+"""
+Database-backed queue for photo processing.
+
+Uploads call ``enqueue_photo_jobs`` and return straight away; the
+``run_image_worker`` management command claims jobs from the ImageJob
+table and runs them. Claiming is a conditional UPDATE, so several workers
+(or worker processes on several hosts sharing the database) never run the
+same job at once, and a lease lets another worker pick up a job whose
+worker died mid-run.
+"""
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import fragment_cache
+from .image_utils import MAX_IMAGE_SIZE, THUMBNAIL_SIZE, generate_derivatives, generate_thumbnail
+from .models import ImageJob, Photo, PhotoRendition
+from .renditions import negotiated_formats, rendition_widths, store_renditions
+
+logger = logging.getLogger(__name__)
+
+# Seconds a claimed job may run before another worker can reclaim it.
+DEFAULT_LEASE_SECONDS = 300
+
+# Delay before retry N is RETRY_BACKOFF_SECONDS * 2 ** (N - 1).
+RETRY_BACKOFF_SECONDS = 30
+
+
+def default_worker_id():
+    """Identify this worker process in ``ImageJob.locked_by``."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_photo_jobs(photo):
+    """Queue compress and thumbnail jobs for a newly uploaded photo."""
+    if photo.is_processed:
+        Photo.objects.filter(pk=photo.pk).update(is_processed=False)
+        photo.is_processed = False
+        fragment_cache.bump_version()
+    return ImageJob.objects.bulk_create([
+        ImageJob(photo=photo, kind=ImageJob.KIND_COMPRESS),
+        ImageJob(photo=photo, kind=ImageJob.KIND_THUMBNAIL),
+    ])
+
+
+def claim_jobs(worker_id, limit=10, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Claim up to ``limit`` runnable jobs for ``worker_id`` and return them.
+
+    Runnable means pending and due, or running with an expired lease.
+    Each claim is an UPDATE guarded by the status the job was read with, so
+    a job another worker claimed in the meantime is skipped.
+    """
+    now = timezone.now()
+    runnable = Q(status=ImageJob.STATUS_PENDING, run_after__lte=now) | Q(
+        status=ImageJob.STATUS_RUNNING, locked_until__lt=now
+    )
+    candidates = list(
+        ImageJob.objects.filter(runnable)
+        .order_by('run_after', 'image_job_id')
+        .values_list('image_job_id', 'status', 'locked_until')[:limit]
+    )
+
+    claimed_ids = []
+    for job_id, status, locked_until in candidates:
+        claimed = ImageJob.objects.filter(
+            pk=job_id, status=status, locked_until=locked_until
+        ).update(
+            status=ImageJob.STATUS_RUNNING,
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=lease_seconds),
+            attempts=F('attempts') + 1,
+            updated_date=now,
+        )
+        if claimed:
+            claimed_ids.append(job_id)
+    return list(ImageJob.objects.filter(pk__in=claimed_ids).order_by('image_job_id'))
+
+
+def run_job(job):
+    """
+    Run one claimed job and record the outcome.
+
+    Returns the job's new status: ``done``, ``pending`` (will be retried)
+    or ``dead`` (out of attempts).
+    """
+    try:
+        JOB_HANDLERS[job.kind](job.photo_id)
+    except Exception as e:
+        logger.exception("Image job %s failed (attempt %s of %s)", job.pk, job.attempts, job.max_attempts)
+        if job.attempts >= job.max_attempts:
+            job.status = ImageJob.STATUS_DEAD
+        else:
+            job.status = ImageJob.STATUS_PENDING
+            job.run_after = timezone.now() + timedelta(
+                seconds=RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+            )
+        job.last_error = f"{type(e).__name__}: {e}"
+    else:
+        job.status = ImageJob.STATUS_DONE
+        job.last_error = ''
+    job.locked_by = ''
+    job.locked_until = None
+    job.save(update_fields=['status', 'run_after', 'last_error', 'locked_by', 'locked_until', 'updated_date'])
+
+    if job.status != ImageJob.STATUS_PENDING:
+        _mark_processed_if_finished(job.photo_id)
+    return job.status
+
+
+def retry_jobs(queryset):
+    """Send dead (or any) jobs back to the queue with a fresh set of attempts."""
+    photo_ids = set(queryset.values_list('photo_id', flat=True))
+    count = queryset.update(
+        status=ImageJob.STATUS_PENDING,
+        attempts=0,
+        run_after=timezone.now(),
+        locked_by='',
+        locked_until=None,
+        last_error='',
+    )
+    if Photo.objects.filter(pk__in=photo_ids).update(is_processed=False):
+        fragment_cache.bump_version()
+    return count
+
+
+def _mark_processed_if_finished(photo_id):
+    """Flip ``Photo.is_processed`` once none of its jobs are queued or running."""
+    unfinished = ImageJob.objects.filter(
+        photo_id=photo_id, status__in=[ImageJob.STATUS_PENDING, ImageJob.STATUS_RUNNING]
+    )
+    if not unfinished.exists():
+        Photo.objects.filter(pk=photo_id).update(is_processed=True)
+        # The cards stop showing the "Processing" placeholder.
+        fragment_cache.bump_version()
+
+
+def _compress_photo(photo_id):
+    """
+    Decode the upload once, streaming it from the blob store, and store
+    the compressed image, the thumbnail, the srcset renditions and their
+    negotiated-format variants, all made from that decode.
+    """
+    photo = Photo.objects.metadata().get(pk=photo_id)
+    original = photo.open_image()
+    if original is None:
+        raise ValueError(f"Photo {photo_id} has no image")
+    widths = rendition_widths()
+    formats = negotiated_formats()
+    sizes = {'image': MAX_IMAGE_SIZE, 'thumbnail': THUMBNAIL_SIZE}
+    sizes.update({width: (width, None) for width in widths})
+    with original:
+        # The size of what was read: legacy rows and missing blobs fall back
+        # to image_data, and image_size may be unset.
+        source_size = original.seek(0, os.SEEK_END)
+        original.seek(0)
+        outputs = generate_derivatives(original, sizes, formats=formats)
+    if not outputs:
+        # Unreadable image: leave it as uploaded; the thumbnail job reports it.
+        return
+
+    renditions = {}
+    for width in widths:
+        renditions[PhotoRendition.KIND_WIDTH, width, 'JPEG'] = outputs[width]
+        for format in formats:
+            renditions[PhotoRendition.KIND_WIDTH, width, format] = outputs[width, format]
+    for format in formats:
+        renditions[PhotoRendition.KIND_THUMBNAIL, 0, format] = outputs['thumbnail', format]
+
+    update_fields = list(Photo.THUMBNAIL_FIELDS)
+    compressed = outputs['image']
+    with transaction.atomic():
+        if len(compressed) < source_size:
+            photo.store_image(compressed)
+            update_fields += Photo.IMAGE_FIELDS
+            # Renditions made from the uncompressed upload are now stale.
+            PhotoRendition.objects.filter(photo_id=photo_id).delete()
+            # Full-size variants are only made here when they match the
+            # stored image's size; like get_or_create_variant, keep the
+            # JPEG where a variant would not be smaller.
+            for format in formats:
+                variant = outputs['image', format]
+                renditions[PhotoRendition.KIND_IMAGE, 0, format] = (
+                    variant if len(variant) < len(compressed) else compressed
+                )
+        photo.store_thumbnail(outputs['thumbnail'])
+        photo.save(update_fields=sorted(set(update_fields)))
+        store_renditions(photo, renditions)
+
+
+def _thumbnail_photo(photo_id):
+    photo = Photo.objects.metadata().get(pk=photo_id)
+    if photo.thumbnail_digest:
+        # Already made by the compress job from the same decode.
+        return
+    thumbnail = generate_thumbnail(photo.read_image())
+    if not thumbnail:
+        raise ValueError(f"Could not generate a thumbnail for photo {photo_id}")
+    photo.store_thumbnail(thumbnail)
+    photo.save(update_fields=Photo.THUMBNAIL_FIELDS)
+
+
+JOB_HANDLERS = {
+    ImageJob.KIND_COMPRESS: _compress_photo,
+    ImageJob.KIND_THUMBNAIL: _thumbnail_photo,
+}
@@ -0,0 +1,340 @@
+"""
+In-process columnar index of visible listings for the public grid.
+
+The public listings page filters a few thousand visible listings on
+neighborhood, property type and price range and sorts them by price or
+listed date. With the index enabled, ``all_listings`` answers the filter,
+sort and count from flat integer columns held in memory, and only asks the
+database for the twelve listings on the page, by primary key.
+
+Columns are NumPy ``int64`` arrays when NumPy is installed, and
+``array('q')`` columns with plain Python loops otherwise. Prices are stored
+in cents, ``listed_date`` in microseconds since the epoch and NULL foreign
+keys as 0, so every column is an integer. Each sort order is computed once
+per snapshot; a NumPy query is then a vectorized mask over the presorted
+rows, and the fallback walks per-value posting lists.
+
+Snapshots are immutable and replaced whole. A Listing save or delete
+reloads that one row after the transaction commits and swaps in a copy of
+the snapshot with the row replaced or removed. Other processes find out
+through a version counter in the cache (``versioning.VersionCounter``),
+and rebuild from the database the next time they query. Code that changes
+listings with ``QuerySet.update()`` must call ``bump_version()``. A process
+that hasn't built an index only bumps the counter, and with the index
+disabled saves cost nothing here.
+
+Configure with ``settings.LISTING_INDEX``::
+
+    LISTING_INDEX = {
+        'ENABLED': True,
+        'CACHE': 'default',   # alias in settings.CACHES for the version counter
+    }
+"""
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - exercised when NumPy is missing
+    numpy = None
+
+from . import pagination
+from .versioning import ProcessSnapshot, VersionCounter
+
+DEFAULTS = {
+    'ENABLED': False,
+    'CACHE': 'default',
+}
+
+# Index column -> Listing field it is loaded from.
+COLUMNS = {
+    'listing_id': 'listing_id',
+    'price': 'price',
+    'neighborhood': 'neighborhood_id',
+    'property_type': 'property_type_id',
+    'pricebucket': 'pricebucket_id',
+    'bedrooms': 'bedrooms',
+    'listed_date': 'listed_date',
+    'status': 'status_id',
+}
+
+# Columns a query may filter on by equality.
+FILTERS = ('neighborhood', 'property_type', 'pricebucket', 'bedrooms', 'status')
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'LISTING_INDEX', {})}
+
+
+def _cache():
+    return caches[_config()['CACHE']]
+
+
+def enabled():
+    """Return True if the listings grid is served from the index."""
+    return _config()['ENABLED']
+
+
+def encode_row(values):
+    """
+    Return the integer encoding of one row of ``COLUMNS`` values, as loaded
+    with ``values_list``.
+    """
+    listing_id, price, neighborhood, property_type, pricebucket, bedrooms, listed_date, status = values
+    return (
+        listing_id,
+        int(price.scaleb(2)),
+        neighborhood or 0,
+        property_type or 0,
+        pricebucket or 0,
+        -1 if bedrooms is None else bedrooms,
+        (listed_date - EPOCH) // MICROSECOND,
+        status or 0,
+    )
+
+
+def _visible_rows(**filters):
+    from .models import Listing
+
+    rows = Listing.objects.filter(is_visible=True, **filters).order_by().values_list(*COLUMNS.values())
+    return (encode_row(values) for values in rows.iterator(chunk_size=5000))
+
+
+class ListingIndex:
+    """An immutable snapshot of the visible listings, one array per column."""
+
+    def __init__(self, columns, use_numpy=None):
+        self.use_numpy = numpy is not None if use_numpy is None else use_numpy
+        if self.use_numpy:
+            self.columns = {name: numpy.asarray(columns[name], dtype=numpy.int64) for name in COLUMNS}
+        else:
+            self.columns = {name: array('q', columns[name]) for name in COLUMNS}
+        # Per-snapshot caches, filled on first use.
+        self._orders = {}
+        self._ranks = {}
+        self._posting_lists = {}
+
+    @classmethod
+    def from_rows(cls, rows, use_numpy=None):
+        """Build an index from encoded rows (see ``encode_row``)."""
+        columns = list(zip(*rows)) or [()] * len(COLUMNS)
+        return cls(dict(zip(COLUMNS, columns)), use_numpy)
+
+    @classmethod
+    def load(cls, use_numpy=None):
+        """Build an index of every visible listing in the database."""
+        return cls.from_rows(_visible_rows(), use_numpy)
+
+    def __len__(self):
+        return len(self.columns['listing_id'])
+
+    def _position(self, listing_id):
+        ids = self.columns['listing_id']
+        if self.use_numpy:
+            found = numpy.flatnonzero(ids == listing_id)
+            return int(found[0]) if len(found) else None
+        try:
+            return ids.index(listing_id)
+        except ValueError:
+            return None
+
+    def replace(self, listing_id, row):
+        """
+        Return a copy with ``listing_id``'s row replaced by ``row``, added if
+        missing, or removed if ``row`` is None.
+        """
+        position = self._position(listing_id)
+        if position is None and row is None:
+            return self
+        columns = {}
+        for value, (name, column) in zip(row or COLUMNS, self.columns.items()):
+            if self.use_numpy:
+                if position is not None:
+                    column = numpy.delete(column, position)
+                if row is not None:
+                    column = numpy.append(column, value)
+            else:
+                column = array('q', column)
+                if position is not None:
+                    del column[position]
+                if row is not None:
+                    column.append(value)
+            columns[name] = column
+        return type(self)(columns, self.use_numpy)
+
+    def order(self, price_sort=''):
+        """Return row positions in the grid order for ``price_sort``."""
+        key = pagination.SORTS.get(price_sort, pagination.SORTS[''])
+        if key not in self._orders:
+            field, descending = key
+            values, ids = self.columns[field], self.columns['listing_id']
+            # Ascending by (value, listing_id); reversed it is descending by
+            # both, matching pagination.ordering().
+            if self.use_numpy:
+                order = numpy.lexsort((ids, values))
+            else:
+                order = array('q', sorted(range(len(ids)), key=lambda i: (values[i], ids[i])))
+            order = order[::-1] if descending else order
+            if self.use_numpy:
+                sorted_ids = ids[order]
+            else:
+                sorted_ids = array('q', (ids[i] for i in order))
+            self._orders[key] = order, sorted_ids
+        return self._orders[key][0]
+
+    def _sorted_ids(self, price_sort):
+        self.order(price_sort)
+        return self._orders[pagination.SORTS.get(price_sort, pagination.SORTS[''])][1]
+
+    def _rank(self, price_sort):
+        """Python backend: each row position's place in the grid order."""
+        key = pagination.SORTS.get(price_sort, pagination.SORTS[''])
+        if key not in self._ranks:
+            rank = array('q', bytes(8 * len(self)))
+            for place, position in enumerate(self.order(price_sort)):
+                rank[position] = place
+            self._ranks[key] = rank
+        return self._ranks[key]
+
+    def _postings(self, name):
+        """Python backend: the row positions holding each value of a column."""
+        if name not in self._posting_lists:
+            postings = {}
+            for position, value in enumerate(self.columns[name]):
+                postings.setdefault(value, []).append(position)
+            self._posting_lists[name] = postings
+        return self._posting_lists[name]
+
+    def query(self, price_sort='', **filters):
+        """
+        Return the ids of the listings matching ``filters``, in grid order.
+
+        ``filters`` are equality tests on ``FILTERS`` columns; None means no
+        filter. The result is a NumPy array or an ``array('q')``; treat it
+        as read-only.
+        """
+        unknown = set(filters) - set(FILTERS)
+        if unknown:
+            raise TypeError(f"Can't filter the listing index on {', '.join(sorted(unknown))}")
+        tests = [(name, value) for name, value in filters.items() if value is not None]
+        if not tests:
+            return self._sorted_ids(price_sort)
+        ids = self.columns['listing_id']
+
+        if self.use_numpy:
+            order = self.order(price_sort)
+            mask = numpy.ones(len(ids), dtype=bool)
+            for name, value in tests:
+                mask &= self.columns[name] == value
+            return ids[order[mask[order]]]
+
+        # Start from the rarest value's rows and check the other columns.
+        candidates = [self._postings(name).get(value, []) for name, value in tests]
+        candidates.sort(key=len)
+        others = [(self.columns[name], value) for name, value in tests]
+        matches = [
+            position for position in candidates[0]
+            if all(column[position] == value for column, value in others)
+        ]
+        matches.sort(key=self._rank(price_sort).__getitem__)
+        return array('q', (ids[position] for position in matches))
+
+    def counts(self, name, **filters):
+        """
+        Return ``{value: rows}`` for column ``name`` over the rows matching
+        ``filters`` (as for ``query``). NULL foreign keys are counted under
+        None.
+        """
+        unknown = ({name} | set(filters)) - set(FILTERS)
+        if unknown:
+            raise TypeError(f"Can't count the listing index on {', '.join(sorted(unknown))}")
+        tests = [(column, value) for column, value in filters.items() if value is not None]
+        null = 0 if name != 'bedrooms' else -1
+
+        if self.use_numpy:
+            values = self.columns[name]
+            if tests:
+                mask = numpy.ones(len(values), dtype=bool)
+                for column, value in tests:
+                    mask &= self.columns[column] == value
+                values = values[mask]
+            found, rows = numpy.unique(values, return_counts=True)
+            counts = dict(zip(found.tolist(), rows.tolist()))
+        elif not tests:
+            counts = {value: len(positions) for value, positions in self._postings(name).items()}
+        else:
+            candidates = [self._postings(column).get(value, []) for column, value in tests]
+            candidates.sort(key=len)
+            others = [(self.columns[column], value) for column, value in tests]
+            values = self.columns[name]
+            counts = {}
+            for position in candidates[0]:
+                if all(column[position] == value for column, value in others):
+                    value = values[position]
+                    counts[value] = counts.get(value, 0) + 1
+        if null in counts:
+            counts[None] = counts.pop(null)
+        return counts
+
+
+class IndexedListings:
+    """
+    A sequence of listings in index order that Paginator can page through.
+
+    Its length comes from the index; slicing loads just that slice from
+    ``queryset`` by primary key. Rows the queryset no longer matches, e.g.
+    because the snapshot is a moment behind, are left out.
+    """
+
+    def __init__(self, ids, queryset):
+        self.ids = ids
+        self.queryset = queryset
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        page_ids = [int(listing_id) for listing_id in self.ids[key]]
+        listings = self.queryset.order_by().in_bulk(page_ids)
+        return [listings[listing_id] for listing_id in page_ids if listing_id in listings]
+
+
+counter = VersionCounter('listings:index:version', _cache)
+snapshot = ProcessSnapshot(counter, ListingIndex.load)
+
+
+def current_version():
+    """Return the shared version the index must be built at."""
+    return counter.current()
+
+
+def bump_version():
+    """Make every process rebuild its index; return the new version or None."""
+    return counter.bump()
+
+
+def get_index():
+    """Return this process's index, rebuilt if another process changed listings."""
+    return snapshot.get()
+
+
+def clear():
+    """Drop this process's index; the next query rebuilds it."""
+    snapshot.clear()
+
+
+snapshot.patch_on_change(
+    'listings.Listing',
+    load=lambda listing_id: next(_visible_rows(pk=listing_id), None),
+    change=lambda index, listing_id, row: index.replace(listing_id, row),
+    dispatch_uid='listing-index',
+    enabled=enabled,
+)
@@ -0,0 +1,175 @@
+"""
+Full-text search over listing addresses and descriptions.
+
+``Listing_FTS`` is an SQLite FTS5 table over the ``Address`` and
+``Description`` columns of ``Listing``. It is an external-content table, so
+it stores only the index and reads the text back from ``Listing``. Triggers
+on ``Listing`` keep it in step with every insert, update and delete,
+including ``QuerySet.update()`` and raw SQL.
+
+``search(queryset, text)`` narrows any Listing queryset to the matches and
+annotates ``search_rank``, the BM25 score with address hits weighted above
+description hits. Lower is better, so ``order_by('search_rank')`` puts the
+best matches first. Every word in ``text`` must match, as a prefix.
+
+The table and triggers are created by migration ``0023``. Django rebuilds a
+SQLite table to alter it, which drops its triggers, so ``install()`` runs
+after every ``migrate`` once the table exists. It recreates missing
+triggers and rebuilds the index if any were gone. ``manage.py rebuild_listing_search`` rebuilds it
+by hand. On databases other than SQLite, or before migration ``0023``,
+searches fall back to ``icontains``.
+"""
+import hashlib
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_migrate
+
+TABLE = 'Listing_FTS'
+
+# BM25 weights for the Address and Description columns.
+WEIGHTS = (4.0, 1.0)
+
+# Longest search text that is used; the rest is ignored.
+MAX_LENGTH = 200
+
+CREATE_TABLE = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS "{TABLE}" USING fts5('
+    '"Address", "Description", '
+    'content=\'Listing\', content_rowid=\'Listing_ID\', '
+    'tokenize=\'unicode61 remove_diacritics 2\')'
+)
+
+TRIGGERS = {
+    'Listing_FTS_insert': (
+        f'CREATE TRIGGER IF NOT EXISTS "Listing_FTS_insert" AFTER INSERT ON "Listing" BEGIN '
+        f'INSERT INTO "{TABLE}"(rowid, "Address", "Description") '
+        'VALUES (new."Listing_ID", new."Address", new."Description"); '
+        'END'
+    ),
+    'Listing_FTS_delete': (
+        f'CREATE TRIGGER IF NOT EXISTS "Listing_FTS_delete" AFTER DELETE ON "Listing" BEGIN '
+        f'INSERT INTO "{TABLE}"("{TABLE}", rowid, "Address", "Description") '
+        'VALUES (\'delete\', old."Listing_ID", old."Address", old."Description"); '
+        'END'
+    ),
+    'Listing_FTS_update': (
+        f'CREATE TRIGGER IF NOT EXISTS "Listing_FTS_update" '
+        'AFTER UPDATE OF "Listing_ID", "Address", "Description" ON "Listing" BEGIN '
+        f'INSERT INTO "{TABLE}"("{TABLE}", rowid, "Address", "Description") '
+        'VALUES (\'delete\', old."Listing_ID", old."Address", old."Description"); '
+        f'INSERT INTO "{TABLE}"(rowid, "Address", "Description") '
+        'VALUES (new."Listing_ID", new."Address", new."Description"); '
+        'END'
+    ),
+}
+
+
+# Database alias -> whether it has the FTS5 table, probed once per process.
+_available = {}
+
+
+def available(using='default'):
+    """Return True if the database has the FTS5 table (SQLite only)."""
+    if using not in _available:
+        connection = connections[using]
+        _available[using] = connection.vendor == 'sqlite' and TABLE in connection.introspection.table_names()
+    return _available[using]
+
+
+def terms(text):
+    """Return the words of a search, lowercased, in order."""
+    return re.findall(r'\w+', (text or '')[:MAX_LENGTH].lower())
+
+
+def match_expression(text):
+    """
+    Return the FTS5 MATCH expression for ``text``: every word, quoted and
+    matched as a prefix, so user input can't inject FTS5 operators. Returns
+    '' if ``text`` has no words.
+    """
+    return ' '.join(f'"{term}"*' for term in terms(text))
+
+
+def digest(text):
+    """
+    Return a short digest of the words of ``text`` for cache keys, or '' if
+    it has none. Searches with the same words share a digest.
+    """
+    words = ' '.join(terms(text))
+    return hashlib.sha256(words.encode()).hexdigest()[:32] if words else ''
+
+
+def search(queryset, text, rank=True):
+    """
+    Return ``queryset`` narrowed to listings matching ``text`` and, with
+    ``rank``, annotated with ``search_rank``. A search with no words
+    matches everything.
+    """
+    expression = match_expression(text)
+    if not expression:
+        return queryset
+    if not available(queryset.db):
+        condition = Q()
+        for term in terms(text):
+            condition &= Q(address__icontains=term) | Q(description__icontains=term)
+        return queryset.filter(condition)
+
+    queryset = queryset.filter(
+        listing_id__in=RawSQL(f'SELECT rowid FROM "{TABLE}" WHERE "{TABLE}" MATCH %s', (expression,))
+    )
+    if not rank:
+        return queryset
+    weights = ', '.join(str(weight) for weight in WEIGHTS)
+    return queryset.annotate(
+        search_rank=RawSQL(
+            f'SELECT bm25("{TABLE}", {weights}) FROM "{TABLE}" '
+            f'WHERE "{TABLE}" MATCH %s AND "{TABLE}".rowid = "Listing"."Listing_ID"',
+            (expression,),
+        )
+    )
+
+
+def rebuild(using='default'):
+    """Rebuild the whole index from ``Listing`` and return the number of listings."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'INSERT INTO "{TABLE}"("{TABLE}") VALUES (\'rebuild\')')
+        cursor.execute(f'INSERT INTO "{TABLE}"("{TABLE}") VALUES (\'optimize\')')
+        cursor.execute('SELECT COUNT(*) FROM "Listing"')
+        return cursor.fetchone()[0]
+
+
+def install(using='default'):
+    """
+    Create the FTS5 table and any missing triggers. If a trigger was
+    missing, edits may have been missed, so the index is rebuilt. Returns
+    the names of the triggers that were created.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existing = {row[0] for row in cursor.fetchall()}
+        cursor.execute(CREATE_TABLE)
+        missing = [name for name in TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(TRIGGERS[name])
+    _available[using] = True
+    if missing:
+        rebuild(using)
+    return missing
+
+
+def _post_migrate(sender, using='default', **kwargs):
+    if sender.name != 'listings':
+        return
+    _available.pop(using, None)
+    # Only once migration 0023 has created the table.
+    if TABLE in connections[using].introspection.table_names():
+        install(using)
+
+
+post_migrate.connect(_post_migrate, dispatch_uid='listing-search-install')
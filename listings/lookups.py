@@ -0,0 +1,100 @@
+"""
+In-process cache for the small lookup tables behind the listing filters.
+
+Neighborhood, PropertyType and Pricebucket rows change a few times a year
+but are read on every listings request: once to build the filter dropdowns
+and once more to resolve the selected filters for the SearchLog row. Each
+``LookupCache`` loads its whole table on first use and serves it from
+memory until a row is saved or deleted.
+
+Invalidation is signal-driven. The process that makes the change clears
+its copy immediately (and again on commit, in case a concurrent request
+reloaded the old rows in between). Other processes notice through a
+version counter in the default cache (``versioning.VersionCounter``),
+which every read compares against. Every copy is also reloaded once it is
+``MAX_AGE`` seconds old, and ``get()`` checks the database for an id it
+doesn't hold before reporting it missing.
+
+Configure with ``settings.LISTING_LOOKUPS``::
+
+    LISTING_LOOKUPS = {
+        'MAX_AGE': 60,   # seconds before a process reloads a table regardless
+    }
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import Neighborhood, Pricebucket, PropertyType
+from .versioning import ProcessSnapshot, VersionCounter
+
+DEFAULTS = {
+    'MAX_AGE': 60,
+}
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'LISTING_LOOKUPS', {})}
+
+
+class LookupCache:
+    """All rows of one lookup model, kept in memory in a fixed order."""
+
+    def __init__(self, model, ordering):
+        self.model = model
+        self.ordering = ordering
+        self.counter = VersionCounter(f'lookups:{model._meta.label_lower}:version')
+        self._snapshot = ProcessSnapshot(self.counter, self._build)
+
+    def _build(self):
+        rows = list(self.model.objects.order_by(*self.ordering))
+        return rows, {row.pk: row for row in rows}
+
+    def _load(self):
+        return self._snapshot.get(max_age=_config()['MAX_AGE'])
+
+    def all(self):
+        """Return every row, in ``ordering``."""
+        return self._load()[0]
+
+    def get(self, pk):
+        """Return the row with primary key ``pk`` (int or string), or None."""
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return None
+        row = self._load()[1].get(pk)
+        if row is None and self.model.objects.filter(pk=pk).exists():
+            # Added in another process that couldn't tell this one.
+            self._snapshot.clear()
+            row = self._load()[1].get(pk)
+        return row
+
+    def invalidate(self):
+        """Drop this process's copy and tell other processes to drop theirs."""
+        self._snapshot.clear()
+        self.counter.bump()
+
+
+neighborhoods = LookupCache(Neighborhood, ['name'])
+property_types = LookupCache(PropertyType, ['name'])
+pricebuckets = LookupCache(Pricebucket, ['pricebucket_id'])
+
+CACHES = {lookup.model: lookup for lookup in (neighborhoods, property_types, pricebuckets)}
+
+
+def clear():
+    """Invalidate every lookup cache."""
+    for lookup in CACHES.values():
+        lookup.invalidate()
+
+
+def _invalidate(sender, **kwargs):
+    lookup = CACHES[sender]
+    lookup.invalidate()
+    transaction.on_commit(lookup.invalidate)
+
+
+for _model in CACHES:
+    post_save.connect(_invalidate, sender=_model, dispatch_uid=f'lookups-save-{_model.__name__}')
+    post_delete.connect(_invalidate, sender=_model, dispatch_uid=f'lookups-delete-{_model.__name__}')
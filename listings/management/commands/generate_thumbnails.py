@@ -4,13 +4,29 @@ Management command to generate thumbnails for existing photos.
 This command is useful for generating thumbnails for photos that were
 uploaded before the thumbnail feature was implemented.
 
+Photos are read in ``photo_id`` order one chunk at a time, so only one
+chunk of image bytes is in memory. With ``--workers`` the Pillow work runs
+in a process pool; each chunk's rows are written with a single
+``bulk_update``. With ``--checkpoint`` the last completed photo id is
+recorded after every chunk, and an interrupted run resumes from there.
+
 Usage:
     py manage.py generate_thumbnails
+    py manage.py generate_thumbnails --force --workers 4 --checkpoint thumbs.json
 """
 
-from django.core.management.base import BaseCommand
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+from listings.blob_storage import get_blob_storage
 from listings.models import Photo
-from listings.image_utils import generate_thumbnail
+from listings.image_utils import generate_thumbnail_job
 
 
 class Command(BaseCommand):
@@ -22,54 +38,161 @@ class Command(BaseCommand):
             action='store_true',
             help='Regenerate thumbnails even if they already exist',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of worker processes for image processing (default: 1, no pool)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100,
+            help='Number of photos read, processed and written per chunk (default: 100)',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording progress; an interrupted run resumes from it',
+        )
 
     def handle(self, *args, **options):
         force = options.get('force', False)
-        
+        workers = max(1, options.get('workers') or 1)
+        chunk_size = max(1, options.get('chunk_size') or 100)
+        checkpoint = Path(options['checkpoint']) if options.get('checkpoint') else None
+
+        has_image = Q(image_digest__isnull=False) | Q(image_data__isnull=False)
+
         if force:
-            photos = Photo.objects.filter(image_data__isnull=False)
-            self.stdout.write(
-                self.style.NOTICE(f"Regenerating thumbnails for all {photos.count()} photos...")
-            )
+            photos = Photo.objects.filter(has_image)
         else:
             photos = Photo.objects.filter(
-                image_data__isnull=False,
+                has_image,
+                thumbnail_digest__isnull=True,
                 thumbnail_data__isnull=True
             )
-            self.stdout.write(
-                self.style.NOTICE(f"Generating thumbnails for {photos.count()} photos without thumbnails...")
-            )
-        
-        if photos.count() == 0:
+
+        last_id = self._read_checkpoint(checkpoint, force)
+        if last_id:
+            self.stdout.write(self.style.NOTICE(f"Resuming after Photo {last_id} from {checkpoint}"))
+            photos = photos.filter(photo_id__gt=last_id)
+
+        total = photos.count()
+        if total == 0:
             self.stdout.write(
                 self.style.SUCCESS("No photos need thumbnail generation.")
             )
+            self._clear_checkpoint(checkpoint)
             return
-        
-        success_count = 0
-        error_count = 0
-        
-        for photo in photos:
-            try:
-                thumbnail = generate_thumbnail(photo.image_data)
-                if thumbnail:
-                    photo.thumbnail_data = thumbnail
-                    photo.save(update_fields=['thumbnail_data'])
-                    success_count += 1
-                    self.stdout.write(f"Generated thumbnail for Photo {photo.photo_id}")
+
+        verb = "Regenerating" if force else "Generating"
+        self.stdout.write(
+            self.style.NOTICE(f"{verb} thumbnails for {total} photos with {workers} worker(s)...")
+        )
+
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        processed = success_count = error_count = bytes_read = 0
+        started = time.monotonic()
+        try:
+            while True:
+                # Keyset pagination: each query is cheap and only one chunk
+                # of image bytes is held in memory at a time.
+                chunk = list(
+                    photos.filter(photo_id__gt=last_id)
+                    .order_by('photo_id')
+                    .only('photo_id', 'image_digest', 'image_data')[:chunk_size]
+                )
+                if not chunk:
+                    break
+
+                jobs = []
+                for photo in chunk:
+                    try:
+                        image_data = photo.read_image()
+                    except Exception as e:
+                        image_data = None
+                        self.stdout.write(self.style.ERROR(f"Error reading Photo {photo.photo_id}: {e}"))
+                    bytes_read += len(image_data or b'')
+                    jobs.append((photo.photo_id, image_data))
+
+                if executor is not None:
+                    results = executor.map(generate_thumbnail_job, jobs)
                 else:
-                    error_count += 1
-                    self.stdout.write(
-                        self.style.WARNING(f"Failed to generate thumbnail for Photo {photo.photo_id}")
-                    )
-            except Exception as e:
-                error_count += 1
+                    results = map(generate_thumbnail_job, jobs)
+
+                generated, errors = self._save_thumbnails(results)
+                success_count += generated
+                error_count += errors
+                processed += len(chunk)
+                last_id = chunk[-1].photo_id
+                self._write_checkpoint(checkpoint, last_id, force)
+
+                elapsed = time.monotonic() - started
                 self.stdout.write(
-                    self.style.ERROR(f"Error processing Photo {photo.photo_id}: {e}")
+                    f"Processed {processed}/{total} photos "
+                    f"({processed / elapsed if elapsed else 0:.1f} photos/s)"
                 )
-        
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        self._clear_checkpoint(checkpoint)
+        elapsed = time.monotonic() - started
         self.stdout.write(
             self.style.SUCCESS(
                 f"\nCompleted: {success_count} thumbnails generated, {error_count} errors"
             )
         )
+        self.stdout.write(
+            f"{processed} photos in {elapsed:.1f}s "
+            f"({processed / elapsed if elapsed else 0:.1f} photos/s, "
+            f"{bytes_read / 1_000_000 / elapsed if elapsed else 0:.1f} MB/s read)"
+        )
+
+    def _save_thumbnails(self, results):
+        """Store generated thumbnails and write the chunk's rows in one bulk_update."""
+        storage = get_blob_storage()
+        now = timezone.now()
+        updated = []
+        errors = 0
+        for photo_id, thumbnail in results:
+            if not thumbnail:
+                errors += 1
+                self.stdout.write(
+                    self.style.WARNING(f"Failed to generate thumbnail for Photo {photo_id}")
+                )
+                continue
+            digest, size = storage.save(thumbnail)
+            # bulk_update() skips auto_now, so updated_date is set explicitly.
+            updated.append(Photo(
+                photo_id=photo_id, thumbnail_digest=digest, thumbnail_size=size,
+                thumbnail_data=None, updated_date=now,
+            ))
+        if updated:
+            Photo.objects.bulk_update(updated, Photo.THUMBNAIL_FIELDS)
+        return len(updated), errors
+
+    def _read_checkpoint(self, checkpoint, force):
+        if checkpoint is None or not checkpoint.exists():
+            return 0
+        try:
+            state = json.loads(checkpoint.read_text())
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read checkpoint {checkpoint}: {e}")
+        if state.get('force', False) != force:
+            raise CommandError(
+                f"Checkpoint {checkpoint} was written by a run "
+                f"{'with' if state.get('force') else 'without'} --force; delete it to start over."
+            )
+        return int(state.get('last_photo_id', 0))
+
+    def _write_checkpoint(self, checkpoint, last_id, force):
+        if checkpoint is None:
+            return
+        tmp_path = checkpoint.with_name(checkpoint.name + '.tmp')
+        tmp_path.write_text(json.dumps({'last_photo_id': last_id, 'force': force}))
+        os.replace(tmp_path, checkpoint)
+
+    def _clear_checkpoint(self, checkpoint):
+        if checkpoint is not None and checkpoint.exists():
+            checkpoint.unlink()
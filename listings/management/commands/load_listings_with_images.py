@@ -3,7 +3,7 @@ Custom management command to load listings fixtures and attach image data.
 
 Typical workflow:
 
-1. Load fixtures and hydrate Photo.image_data from files:
+1. Load fixtures and store Photo image bytes from files:
 
        python manage.py load_listings_with_images
 
@@ -12,7 +12,7 @@ This command:
     (statuses, property types, neighborhoods, price buckets, listings)
   - For each Photo record, looks for an image file named
         photo_<photo_id>.(png|jpg|jpeg|gif)
-    in `listings/fixtures/images/` and writes its bytes into `image_data`.
+    in `listings/fixtures/images/` and writes its bytes to the photo blob store.
 
 Image files (compressed) are committed to source control.
 """
@@ -26,11 +26,11 @@ from django.conf import settings
 from django.core.management import BaseCommand, call_command
 from PIL import Image
 
-from listings.models import Photo
+from listings.models import Photo, assign_pricebuckets
 
 
 class Command(BaseCommand):
-    help = "Load listings fixtures and attach Photo.image_data from fixture image files."
+    help = "Load listings fixtures and attach Photo images from fixture image files."
 
     def add_arguments(self, parser) -> None:
         parser.add_argument(
@@ -61,6 +61,8 @@ class Command(BaseCommand):
                 self.style.NOTICE(f"Loading fixtures via loaddata: {', '.join(fixtures)}")
             )
             call_command("loaddata", *fixtures)
+            # loaddata bypasses Listing.save(), which derives pricebucket.
+            assign_pricebuckets()
 
         base_dir = Path(settings.BASE_DIR)
         fixtures_dir = base_dir / "listings" / "fixtures"
@@ -77,7 +79,7 @@ class Command(BaseCommand):
         updated = 0
         missing = 0
 
-        for photo in Photo.objects.all():
+        for photo in Photo.objects.metadata():
             image_path = self._find_image_for_photo(images_dir, photo)
             if not image_path:
                 missing += 1
@@ -92,13 +94,15 @@ class Command(BaseCommand):
             # Compress image bytes before storing to the database to keep the
             # overall fixture/data size manageable.
             compressed_image = self._compress_image(image_path)
-            photo.image_data = compressed_image
+            photo.store_image(compressed_image)
             
             # Generate thumbnail
             from listings.image_utils import generate_thumbnail
-            photo.thumbnail_data = generate_thumbnail(compressed_image)
+            thumbnail = generate_thumbnail(compressed_image)
+            if thumbnail:
+                photo.store_thumbnail(thumbnail)
             
-            photo.save(update_fields=["image_data", "thumbnail_data"])
+            photo.save(update_fields=Photo.IMAGE_FIELDS + Photo.THUMBNAIL_FIELDS)
             updated += 1
 
         self.stdout.write(
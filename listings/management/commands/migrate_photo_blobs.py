@@ -0,0 +1,100 @@
+"""
+Management command to move photo bytes out of the Photo table.
+
+Copies ``Photo.image_data`` and ``Photo.thumbnail_data`` into the configured
+content-addressed blob store, records the digest and size on the row, and
+clears the legacy column. Rows are read in primary-key order in small
+batches, so only one batch of blobs is held in memory at a time. Photos keep
+serving throughout: rows that have not been moved yet are read from their
+legacy columns.
+
+Usage:
+    py manage.py migrate_photo_blobs
+    py manage.py migrate_photo_blobs --batch-size 50 --keep-db-bytes
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from listings.blob_storage import get_blob_storage
+from listings.models import Photo
+
+
+class Command(BaseCommand):
+    help = "Move Photo image and thumbnail bytes into the content-addressed blob store"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of photo rows to read and update per batch (default: 100)',
+        )
+        parser.add_argument(
+            '--keep-db-bytes',
+            action='store_true',
+            help='Record digests but leave the legacy binary columns populated',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        keep_db_bytes = options['keep_db_bytes']
+        storage = get_blob_storage()
+
+        if keep_db_bytes:
+            pending = Photo.objects.filter(
+                Q(image_data__isnull=False, image_digest__isnull=True)
+                | Q(thumbnail_data__isnull=False, thumbnail_digest__isnull=True)
+            )
+        else:
+            # Also clears bytes left behind by an earlier --keep-db-bytes run.
+            pending = Photo.objects.filter(
+                Q(image_data__isnull=False) | Q(thumbnail_data__isnull=False)
+            )
+        self.stdout.write(
+            self.style.NOTICE(f"Moving bytes for {pending.count()} photos to the blob store...")
+        )
+
+        moved = 0
+        bytes_moved = 0
+        last_id = 0
+
+        while True:
+            # Keyset pagination keeps each query cheap and only one batch of
+            # blobs in memory at a time.
+            batch = list(
+                pending.filter(photo_id__gt=last_id)
+                .order_by('photo_id')
+                .values_list('photo_id', 'image_data', 'thumbnail_data',
+                             'image_digest', 'thumbnail_digest')[:batch_size]
+            )
+            if not batch:
+                break
+
+            with transaction.atomic():
+                for photo_id, image_data, thumbnail_data, image_digest, thumbnail_digest in batch:
+                    changes = {}
+                    if image_data and not image_digest:
+                        changes['image_digest'], changes['image_size'] = storage.save(image_data)
+                        bytes_moved += changes['image_size']
+                    if thumbnail_data and not thumbnail_digest:
+                        changes['thumbnail_digest'], changes['thumbnail_size'] = storage.save(thumbnail_data)
+                        bytes_moved += changes['thumbnail_size']
+                    if not keep_db_bytes:
+                        changes['image_data'] = None
+                        changes['thumbnail_data'] = None
+                    if changes:
+                        Photo.objects.filter(pk=photo_id).update(**changes)
+
+            moved += len(batch)
+            last_id = batch[-1][0]
+            self.stdout.write(f"Moved {moved} photos ({bytes_moved} bytes)")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"\nCompleted: {moved} photos moved, {bytes_moved} bytes written to the blob store")
+        )
+        if moved and not keep_db_bytes:
+            self.stdout.write(
+                "Run VACUUM on the database to reclaim the space freed by the legacy columns."
+            )
@@ -0,0 +1,28 @@
+"""
+Management command to rebuild the Listing_FTS full-text index.
+
+Triggers keep the index in step with Listing, so this is only needed after
+restoring the database from elsewhere, or if the index is suspected to be
+out of date. Missing triggers are recreated first.
+
+Usage:
+    py manage.py rebuild_listing_search
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from listings import listing_search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index over listing addresses and descriptions"
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Full-text search needs SQLite with FTS5.")
+
+        recreated = listing_search.install()
+        if recreated:
+            self.stdout.write(self.style.WARNING(f"Recreated missing triggers: {', '.join(recreated)}"))
+        count = listing_search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the listing search index: {count} listings."))
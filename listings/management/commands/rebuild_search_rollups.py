@@ -0,0 +1,38 @@
+"""
+Management command to rebuild the daily search rollup from SearchLog.
+
+New searches are added to SearchLogDailyRollup as they are written, so
+this is only needed after SearchLog rows are loaded, edited or deleted by
+other means, or after changing TIME_ZONE (days are local days).
+
+Usage:
+    py manage.py rebuild_search_rollups
+    py manage.py rebuild_search_rollups --since 2025-01-01
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from listings.search_logging import rebuild_search_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute SearchLogDailyRollup from the raw search log"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Only rebuild days on or after this date (YYYY-MM-DD)',
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options.get('since'):
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError(f"Invalid --since date: {options['since']}")
+
+        rows = rebuild_search_rollups(since)
+        scope = f"from {since}" if since else "for all days"
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search rollups {scope}: {rows} rows."))
@@ -0,0 +1,88 @@
+"""
+Management command that runs queued photo processing jobs.
+
+Uploads enqueue ``compress`` and ``thumbnail`` ImageJob rows; this worker
+claims and runs them. Failed jobs are retried with exponential backoff and
+end up in the ``dead`` state after their last attempt (retry them from the
+admin). Several workers can run at once against the same database.
+
+Usage:
+    py manage.py run_image_worker
+    py manage.py run_image_worker --once
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from listings.jobs import DEFAULT_LEASE_SECONDS, claim_jobs, default_worker_id, run_job
+from listings.models import ImageJob
+
+
+class Command(BaseCommand):
+    help = "Run queued photo compression and thumbnail jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no runnable jobs are left instead of polling',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Number of jobs to claim at a time (default: 10)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to sleep when the queue is empty (default: 2)',
+        )
+        parser.add_argument(
+            '--lease',
+            type=int,
+            default=DEFAULT_LEASE_SECONDS,
+            help=f'Seconds before a claimed job can be reclaimed (default: {DEFAULT_LEASE_SECONDS})',
+        )
+        parser.add_argument(
+            '--worker-id',
+            default=None,
+            help='Name recorded on claimed jobs (default: host:pid)',
+        )
+
+    def handle(self, *args, **options):
+        worker_id = options['worker_id'] or default_worker_id()
+        batch_size = max(1, options['batch_size'])
+        counts = {ImageJob.STATUS_DONE: 0, ImageJob.STATUS_PENDING: 0, ImageJob.STATUS_DEAD: 0}
+
+        self.stdout.write(self.style.NOTICE(f"Image worker {worker_id} started"))
+        try:
+            while True:
+                jobs = claim_jobs(worker_id, limit=batch_size, lease_seconds=options['lease'])
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                for job in jobs:
+                    status = run_job(job)
+                    counts[status] += 1
+                    message = f"{job.get_kind_display()} for Photo {job.photo_id}: {status}"
+                    if status == ImageJob.STATUS_DONE:
+                        self.stdout.write(message)
+                    elif status == ImageJob.STATUS_PENDING:
+                        self.stdout.write(self.style.WARNING(f"{message} (retry after {job.run_after:%H:%M:%S})"))
+                    else:
+                        self.stdout.write(self.style.ERROR(f"{message}: {job.last_error}"))
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted; unfinished jobs will be reclaimed when their lease expires.")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\nCompleted: {counts[ImageJob.STATUS_DONE]} done, "
+                f"{counts[ImageJob.STATUS_PENDING]} retrying, {counts[ImageJob.STATUS_DEAD]} dead"
+            )
+        )
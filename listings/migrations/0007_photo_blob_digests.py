@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0006_listing_featured_highlight_listing_featured_title'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='image_digest',
+            field=models.CharField(blank=True, db_column='Image_Digest', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='image_size',
+            field=models.PositiveIntegerField(blank=True, db_column='Image_Size', null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='thumbnail_digest',
+            field=models.CharField(blank=True, db_column='Thumbnail_Digest', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='thumbnail_size',
+            field=models.PositiveIntegerField(blank=True, db_column='Thumbnail_Size', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_photo_blob_digests'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='updated_date',
+            field=models.DateTimeField(auto_now=True, db_column='Updated_Date', null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0008_photo_updated_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoRendition',
+            fields=[
+                ('photo_rendition_id', models.AutoField(db_column='Photo_Rendition_ID', primary_key=True, serialize=False)),
+                ('width', models.PositiveIntegerField(db_column='Width')),
+                ('format', models.CharField(db_column='Format', default='JPEG', max_length=10)),
+                ('digest', models.CharField(db_column='Digest', max_length=64)),
+                ('size', models.PositiveIntegerField(db_column='Size')),
+                ('created_date', models.DateTimeField(auto_now_add=True, db_column='Created_Date')),
+                ('photo', models.ForeignKey(db_column='Photo_ID', on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='listings.photo')),
+            ],
+            options={
+                'db_table': 'Photo_Rendition',
+                'constraints': [models.UniqueConstraint(fields=('photo', 'width', 'format'), name='unique_photo_rendition')],
+            },
+        ),
+    ]
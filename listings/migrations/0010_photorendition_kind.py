@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0009_photorendition'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='photorendition',
+            name='unique_photo_rendition',
+        ),
+        migrations.AddField(
+            model_name='photorendition',
+            name='kind',
+            field=models.CharField(choices=[('width', 'Resized to width'), ('image', 'Full-size image'), ('thumbnail', 'Thumbnail')], db_column='Kind', default='width', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='photorendition',
+            name='width',
+            field=models.PositiveIntegerField(db_column='Width', default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='photorendition',
+            constraint=models.UniqueConstraint(fields=('photo', 'kind', 'width', 'format'), name='unique_photo_rendition'),
+        ),
+    ]
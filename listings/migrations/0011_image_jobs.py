@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0010_photorendition_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='is_processed',
+            field=models.BooleanField(db_column='Is_Processed', default=True),
+        ),
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('image_job_id', models.AutoField(db_column='Image_Job_ID', primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('compress', 'Compress image'), ('thumbnail', 'Generate thumbnail')], db_column='Kind', max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('dead', 'Dead')], db_column='Status', default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(db_column='Attempts', default=0)),
+                ('max_attempts', models.PositiveIntegerField(db_column='Max_Attempts', default=3)),
+                ('run_after', models.DateTimeField(db_column='Run_After', default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, db_column='Locked_By', default='', max_length=100)),
+                ('locked_until', models.DateTimeField(blank=True, db_column='Locked_Until', null=True)),
+                ('last_error', models.TextField(blank=True, db_column='Last_Error', default='')),
+                ('created_date', models.DateTimeField(auto_now_add=True, db_column='Created_Date')),
+                ('updated_date', models.DateTimeField(auto_now=True, db_column='Updated_Date')),
+                ('photo', models.ForeignKey(db_column='Photo_ID', on_delete=django.db.models.deletion.CASCADE, related_name='image_jobs', to='listings.photo')),
+            ],
+            options={
+                'db_table': 'Image_Job',
+                'ordering': ['image_job_id'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='image_job_status_run_after')],
+            },
+        ),
+    ]
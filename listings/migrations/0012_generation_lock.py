@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0011_image_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationLock',
+            fields=[
+                ('key', models.CharField(db_column='Lock_Key', max_length=100, primary_key=True, serialize=False)),
+                ('owner', models.CharField(db_column='Owner', max_length=100)),
+                ('expires_at', models.DateTimeField(db_column='Expires_At')),
+            ],
+            options={
+                'db_table': 'Generation_Lock',
+            },
+        ),
+    ]
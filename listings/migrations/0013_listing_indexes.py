@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0012_generation_lock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_visible', True)), fields=['listed_date'], name='listing_visible_listed'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_visible', True)), fields=['price'], name='listing_visible_price'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_visible', True)), fields=['neighborhood', 'price'], name='listing_vis_nbhd_price'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_visible', True)), fields=['neighborhood', 'listed_date'], name='listing_vis_nbhd_listed'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_visible', True)), fields=['property_type', 'price'], name='listing_vis_type_price'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_visible', True)), fields=['property_type', 'listed_date'], name='listing_vis_type_listed'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_visible', False)), fields=['listed_date'], name='listing_hidden_listed'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['listed_date'], name='listing_listed'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['price'], name='listing_price'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_featured', True)), fields=['listed_date'], name='listing_featured'),
+        ),
+    ]
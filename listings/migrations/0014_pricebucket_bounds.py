@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0013_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricebucket',
+            name='max_price',
+            field=models.DecimalField(blank=True, db_column='Max_Price', decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='pricebucket',
+            name='min_price',
+            field=models.DecimalField(blank=True, db_column='Min_Price', decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_visible', True)), fields=['pricebucket', 'price'], name='listing_vis_bucket_price'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_visible', True)), fields=['pricebucket', 'listed_date'], name='listing_vis_bucket_listed'),
+        ),
+        migrations.AddIndex(
+            model_name='pricebucket',
+            index=models.Index(fields=['min_price', 'max_price'], name='pricebucket_bounds'),
+        ),
+    ]
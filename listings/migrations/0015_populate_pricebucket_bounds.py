@@ -0,0 +1,52 @@
+# Generated manually: parse Pricebucket.range into the new bound columns and
+# point every listing at the bucket containing its price.
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations
+from django.db.models import Q
+
+
+def parse_range(range_str):
+    # Frozen copy of listings.models.parse_price_range.
+    try:
+        range_str = (range_str or '').replace('$', '').replace(',', '').strip()
+        if '+' in range_str:
+            return Decimal(range_str.replace('+', '').strip()), None
+        parts = range_str.split(' - ')
+        if len(parts) == 2:
+            return Decimal(parts[0].strip()), Decimal(parts[1].strip())
+    except (InvalidOperation, ValueError):
+        pass
+    return None, None
+
+
+def populate_bounds(apps, schema_editor):
+    Pricebucket = apps.get_model('listings', 'Pricebucket')
+    Listing = apps.get_model('listings', 'Listing')
+
+    buckets = list(Pricebucket.objects.all())
+    for bucket in buckets:
+        bucket.min_price, bucket.max_price = parse_range(bucket.range)
+    Pricebucket.objects.bulk_update(buckets, ['min_price', 'max_price'])
+
+    covered = Q(pk__in=[])
+    for bucket in buckets:
+        if bucket.min_price is None:
+            continue
+        in_bucket = Q(price__gte=bucket.min_price)
+        if bucket.max_price is not None:
+            in_bucket &= Q(price__lt=bucket.max_price)
+        Listing.objects.filter(in_bucket).update(pricebucket=bucket)
+        covered |= in_bucket
+    Listing.objects.exclude(covered).update(pricebucket=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0014_pricebucket_bounds'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_bounds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:13
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0015_populate_pricebucket_bounds'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='searchlog',
+            name='timestamp',
+            field=models.DateTimeField(db_column='Timestamp', default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:19
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0016_searchlog_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchLogDailyRollup',
+            fields=[
+                ('rollup_id', models.AutoField(db_column='Rollup_ID', primary_key=True, serialize=False)),
+                ('day', models.DateField(db_column='Day')),
+                ('search_count', models.PositiveIntegerField(db_column='Search_Count', default=0)),
+                ('neighborhood', models.ForeignKey(blank=True, db_column='Neighborhood_ID', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='search_rollups', to='listings.neighborhood')),
+                ('pricebucket', models.ForeignKey(blank=True, db_column='Pricebucket_ID', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='search_rollups', to='listings.pricebucket')),
+                ('property_type', models.ForeignKey(blank=True, db_column='Property_Type_ID', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='search_rollups', to='listings.propertytype')),
+            ],
+            options={
+                'db_table': 'Search_Log_Daily_Rollup',
+                'indexes': [models.Index(fields=['day'], name='search_rollup_day')],
+                'constraints': [models.UniqueConstraint(models.F('day'), django.db.models.functions.comparison.Coalesce('property_type', 0, output_field=models.IntegerField()), django.db.models.functions.comparison.Coalesce('neighborhood', 0, output_field=models.IntegerField()), django.db.models.functions.comparison.Coalesce('pricebucket', 0, output_field=models.IntegerField()), name='search_rollup_combination')],
+            },
+        ),
+    ]
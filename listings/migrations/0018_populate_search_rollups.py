@@ -0,0 +1,43 @@
+# Generated manually: build SearchLogDailyRollup from the existing SearchLog rows.
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def populate_rollups(apps, schema_editor):
+    # Frozen copy of listings.search_logging.rebuild_search_rollups.
+    SearchLog = apps.get_model('listings', 'SearchLog')
+    SearchLogDailyRollup = apps.get_model('listings', 'SearchLogDailyRollup')
+
+    totals = (
+        SearchLog.objects.order_by()
+        .annotate(day=TruncDate('timestamp'))
+        .values('day', 'property_type_id', 'neighborhood_id', 'pricebucket_id')
+        .annotate(search_count=Count('search_log_id'))
+        .values_list('day', 'property_type_id', 'neighborhood_id', 'pricebucket_id', 'search_count')
+    )
+    SearchLogDailyRollup.objects.all().delete()
+    SearchLogDailyRollup.objects.bulk_create(
+        (
+            SearchLogDailyRollup(
+                day=day,
+                property_type_id=property_type_id,
+                neighborhood_id=neighborhood_id,
+                pricebucket_id=pricebucket_id,
+                search_count=search_count,
+            )
+            for day, property_type_id, neighborhood_id, pricebucket_id, search_count in totals
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0017_searchlogdailyrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
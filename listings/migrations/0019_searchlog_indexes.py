@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0018_populate_search_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='searchlog',
+            index=models.Index(fields=['timestamp'], name='search_log_timestamp'),
+        ),
+        migrations.AddIndex(
+            model_name='searchlog',
+            index=models.Index(fields=['property_type', 'timestamp'], name='search_log_type_ts'),
+        ),
+        migrations.AddIndex(
+            model_name='searchlog',
+            index=models.Index(fields=['neighborhood', 'timestamp'], name='search_log_nbhd_ts'),
+        ),
+        migrations.AddIndex(
+            model_name='searchlog',
+            index=models.Index(fields=['pricebucket', 'timestamp'], name='search_log_bucket_ts'),
+        ),
+    ]
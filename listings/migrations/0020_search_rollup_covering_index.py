@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0019_searchlog_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='searchlogdailyrollup',
+            name='search_rollup_day',
+        ),
+        migrations.AddIndex(
+            model_name='searchlogdailyrollup',
+            index=models.Index(fields=['day', 'property_type', 'neighborhood', 'pricebucket', 'search_count'], name='search_rollup_day_cover'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0020_search_rollup_covering_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='primary_photo',
+            field=models.ForeignKey(blank=True, db_column='Primary_Photo_ID', editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='listings.photo'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated manually: point existing listings at their first photo.
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def populate_primary_photos(apps, schema_editor):
+    # Frozen copy of listings.models.refresh_primary_photos.
+    Listing = apps.get_model('listings', 'Listing')
+    Photo = apps.get_model('listings', 'Photo')
+
+    first_photo = Photo.objects.filter(listing=OuterRef('pk')).order_by('photo_display_order', 'photo_id')
+    Listing.objects.update(primary_photo=Subquery(first_photo.values('pk')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0021_listing_primary_photo'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_primary_photos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated manually: FTS5 index over Listing.Address and Listing.Description.
+from django.db import migrations
+
+# Frozen copy of listings.listing_search.CREATE_TABLE and TRIGGERS.
+CREATE_TABLE = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS "Listing_FTS" USING fts5('
+    '"Address", "Description", '
+    'content=\'Listing\', content_rowid=\'Listing_ID\', '
+    'tokenize=\'unicode61 remove_diacritics 2\')'
+)
+
+TRIGGERS = [
+    'CREATE TRIGGER IF NOT EXISTS "Listing_FTS_insert" AFTER INSERT ON "Listing" BEGIN '
+    'INSERT INTO "Listing_FTS"(rowid, "Address", "Description") '
+    'VALUES (new."Listing_ID", new."Address", new."Description"); '
+    'END',
+    'CREATE TRIGGER IF NOT EXISTS "Listing_FTS_delete" AFTER DELETE ON "Listing" BEGIN '
+    'INSERT INTO "Listing_FTS"("Listing_FTS", rowid, "Address", "Description") '
+    'VALUES (\'delete\', old."Listing_ID", old."Address", old."Description"); '
+    'END',
+    'CREATE TRIGGER IF NOT EXISTS "Listing_FTS_update" '
+    'AFTER UPDATE OF "Listing_ID", "Address", "Description" ON "Listing" BEGIN '
+    'INSERT INTO "Listing_FTS"("Listing_FTS", rowid, "Address", "Description") '
+    'VALUES (\'delete\', old."Listing_ID", old."Address", old."Description"); '
+    'INSERT INTO "Listing_FTS"(rowid, "Address", "Description") '
+    'VALUES (new."Listing_ID", new."Address", new."Description"); '
+    'END',
+]
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_TABLE)
+    for trigger in TRIGGERS:
+        schema_editor.execute(trigger)
+    schema_editor.execute('INSERT INTO "Listing_FTS"("Listing_FTS") VALUES (\'rebuild\')')
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in ('Listing_FTS_insert', 'Listing_FTS_delete', 'Listing_FTS_update'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+    schema_editor.execute('DROP TABLE IF EXISTS "Listing_FTS"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0022_populate_primary_photo'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
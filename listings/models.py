@@ -1,7 +1,19 @@
 # listings/models.py
+import logging
+from decimal import Decimal, InvalidOperation
+from io import BytesIO
+
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 
+from . import facets, fragment_cache, listing_index
+from .blob_storage import BlobNotFound, get_blob_storage
+
+logger = logging.getLogger(__name__)
+
 
 class UserManager(BaseUserManager):
     """Manager for custom User model."""
@@ -109,17 +121,112 @@ class Neighborhood(models.Model):
         return self.name
 
 
+def parse_price_range(range_str):
+    """
+    Parse a price range string and return (min_price, max_price) tuple.
+
+    "$200,000 - $300,000" gives (200000, 300000) and "$1,000,000+" gives
+    (1000000, None); anything else gives (None, None).
+    """
+    try:
+        range_str = range_str.replace('$', '').replace(',', '').strip()
+
+        if '+' in range_str:
+            min_price = Decimal(range_str.replace('+', '').strip())
+            return (min_price, None)
+
+        if ' - ' in range_str:
+            parts = range_str.split(' - ')
+            if len(parts) == 2:
+                min_price = Decimal(parts[0].strip())
+                max_price = Decimal(parts[1].strip())
+                return (min_price, max_price)
+
+        return (None, None)
+    except (ValueError, TypeError, ArithmeticError):
+        return (None, None)
+
+
+class PricebucketQuerySet(models.QuerySet):
+    """QuerySet helpers for Pricebucket rows."""
+
+    def containing(self, price):
+        """Buckets whose [min_price, max_price) holds ``price``, lowest first."""
+        try:
+            price = Decimal(str(price))
+        except (InvalidOperation, ValueError):
+            return self.none()
+        return self.filter(
+            models.Q(max_price__gt=price) | models.Q(max_price=None),
+            min_price__lte=price,
+        ).order_by('min_price')
+
+
 class Pricebucket(models.Model):
-    """Price bucket lookup table."""
+    """
+    Price bucket lookup table.
+
+    ``range`` is the label shown in the filter dropdown. ``min_price`` and
+    ``max_price`` are parsed from it on save and hold the half-open interval
+    [min_price, max_price); max_price is NULL for an open-ended "$X+" bucket.
+    """
     pricebucket_id = models.AutoField(primary_key=True, db_column='Pricebucket_ID')
     range = models.CharField(max_length=100, db_column='Range')
+    min_price = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True, editable=False, db_column='Min_Price'
+    )
+    max_price = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True, editable=False, db_column='Max_Price'
+    )
     
+    objects = PricebucketQuerySet.as_manager()
+
     class Meta:
         db_table = 'Pricebucket'
+        indexes = [
+            models.Index(fields=['min_price', 'max_price'], name='pricebucket_bounds'),
+        ]
     
     def __str__(self):
         return self.range
 
+    def save(self, *args, **kwargs):
+        self.min_price, self.max_price = parse_price_range(self.range or '')
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'range' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'min_price', 'max_price'}
+        if self._state.adding:
+            old_bounds = (None, None)
+        else:
+            old_bounds = Pricebucket.objects.filter(pk=self.pk).values_list('min_price', 'max_price').first()
+        super().save(*args, **kwargs)
+        # Renaming a bucket without moving its bounds leaves every listing
+        # where it is.
+        if old_bounds != (self.min_price, self.max_price):
+            assign_pricebuckets()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        # A bucket without bounds held no listings.
+        if self.min_price is not None:
+            assign_pricebuckets()
+        return result
+
+    def contains(self, price):
+        """Return True if ``price`` falls in [min_price, max_price)."""
+        if self.min_price is None or price is None:
+            return False
+        return price >= self.min_price and (self.max_price is None or price < self.max_price)
+
+    def price_filter(self):
+        """Return a Q matching listings priced inside this bucket."""
+        if self.min_price is None:
+            return models.Q(pk__in=[])
+        condition = models.Q(price__gte=self.min_price)
+        if self.max_price is not None:
+            condition &= models.Q(price__lt=self.max_price)
+        return condition
+
 
 class Listing(models.Model):
     """Listing model matching the database schema."""
@@ -197,14 +304,86 @@ class Listing(models.Model):
         db_column='Featured_Highlight'
     )
     listed_date = models.DateTimeField(auto_now_add=True)
+    # First photo in gallery order, so listing cards need no photo query.
+    # Maintained by refresh_primary_photos() whenever a photo is saved or
+    # deleted.
+    primary_photo = models.ForeignKey(
+        'Photo',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        db_column='Primary_Photo_ID',
+        related_name='+'
+    )
     
     class Meta:
         db_table = 'Listing'
         ordering = ['-listed_date']
+        # Matched to the all_listings query shapes: the public page filters
+        # on is_visible and optional FKs (the price range is the pricebucket
+        # FK), then sorts by price or listed_date. Django renders is_visible=True as a bare column
+        # test, which SQLite can't seek on in a composite index, so visible
+        # rows get partial indexes instead. test_listing_indexes checks every
+        # combination with EXPLAIN QUERY PLAN.
+        indexes = [
+            models.Index(fields=['listed_date'], name='listing_visible_listed', condition=models.Q(is_visible=True)),
+            models.Index(fields=['price'], name='listing_visible_price', condition=models.Q(is_visible=True)),
+            models.Index(
+                fields=['neighborhood', 'price'], name='listing_vis_nbhd_price',
+                condition=models.Q(is_visible=True),
+            ),
+            models.Index(
+                fields=['neighborhood', 'listed_date'], name='listing_vis_nbhd_listed',
+                condition=models.Q(is_visible=True),
+            ),
+            models.Index(
+                fields=['property_type', 'price'], name='listing_vis_type_price',
+                condition=models.Q(is_visible=True),
+            ),
+            models.Index(
+                fields=['property_type', 'listed_date'], name='listing_vis_type_listed',
+                condition=models.Q(is_visible=True),
+            ),
+            models.Index(
+                fields=['pricebucket', 'price'], name='listing_vis_bucket_price',
+                condition=models.Q(is_visible=True),
+            ),
+            models.Index(
+                fields=['pricebucket', 'listed_date'], name='listing_vis_bucket_listed',
+                condition=models.Q(is_visible=True),
+            ),
+            # Staff "hidden" and "all" views.
+            models.Index(fields=['listed_date'], name='listing_hidden_listed', condition=models.Q(is_visible=False)),
+            models.Index(fields=['listed_date'], name='listing_listed'),
+            models.Index(fields=['price'], name='listing_price'),
+            # Home page featured lookup; at most one row is featured.
+            models.Index(fields=['listed_date'], name='listing_featured', condition=models.Q(is_featured=True)),
+        ]
     
     def __str__(self):
         return f"{self.address} - ${self.price}"
-    
+
+    def save(self, *args, **kwargs):
+        # pricebucket is derived from price so the price-range filter can be
+        # an indexed equality lookup.
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'price' in update_fields:
+            self.pricebucket = Pricebucket.objects.containing(self.price).first()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'pricebucket'}
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # primary_photo is written by refresh_primary_photos() with
+            # QuerySet.update(); a copy loaded before a photo changed must
+            # not overwrite it. Deferred fields stay unloaded, as in a plain
+            # save().
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred and field.name != 'primary_photo'
+            ]
+        super().save(*args, **kwargs)
+
     # Keep compatibility with existing code
     @property
     def title(self):
@@ -233,7 +412,81 @@ class Listing(models.Model):
         return status_value
 
 
+def assign_pricebuckets(listings=None):
+    """
+    Point each listing's ``pricebucket`` at the bucket containing its price,
+    or NULL if none does, and return the number of rows changed.
+
+    Runs one UPDATE per bucket, so it is cheap enough to call whenever the
+    buckets themselves change.
+    """
+    listings = Listing.objects.all() if listings is None else listings
+    changed = 0
+    covered = models.Q(pk__in=[])
+    for bucket in Pricebucket.objects.exclude(min_price=None):
+        in_bucket = bucket.price_filter()
+        changed += listings.filter(in_bucket).exclude(pricebucket=bucket).update(pricebucket=bucket)
+        covered |= in_bucket
+    changed += listings.exclude(covered).exclude(pricebucket=None).update(pricebucket=None)
+    if changed:
+        # QuerySet.update() sends no signals; price range filters now match differently.
+        facets.bump_version()
+        fragment_cache.bump_version()
+        listing_index.bump_version()
+    return changed
+
+
+def _assign_loaded_pricebuckets(sender, instance, raw=False, using=None, **kwargs):
+    # loaddata saves with raw=True, which skips Listing.save() and
+    # Pricebucket.save(); derive the same fields here so fixture listings
+    # match the price-range filter whichever file is loaded first.
+    if not raw:
+        return
+    if sender is Pricebucket:
+        bounds = parse_price_range(instance.range or '')
+        if (instance.min_price, instance.max_price) != bounds:
+            instance.min_price, instance.max_price = bounds
+            Pricebucket.objects.using(using).filter(pk=instance.pk).update(min_price=bounds[0], max_price=bounds[1])
+        assign_pricebuckets(Listing.objects.using(using))
+    else:
+        bucket = Pricebucket.objects.using(using).containing(instance.price).first()
+        Listing.objects.using(using).filter(pk=instance.pk).update(pricebucket=bucket)
+
+
+post_save.connect(_assign_loaded_pricebuckets, sender=Listing, dispatch_uid='pricebucket-load-listing')
+post_save.connect(_assign_loaded_pricebuckets, sender=Pricebucket, dispatch_uid='pricebucket-load-bucket')
+
+
+class PhotoQuerySet(models.QuerySet):
+    """QuerySet helpers for Photo rows."""
+
+    # Columns needed to build photo URLs, keep gallery ordering and locate
+    # the bytes in the blob store.
+    METADATA_FIELDS = (
+        'photo_id', 'listing', 'photo_display_order', 'is_processed',
+        'image_digest', 'image_size', 'thumbnail_digest', 'thumbnail_size',
+        'updated_date',
+    )
+
+    def metadata(self):
+        """
+        Load only the photo metadata columns.
+
+        The image and thumbnail blobs are deferred so pages that only render
+        ``<img>`` URLs never pull the binary data into memory.
+        """
+        return self.only(*self.METADATA_FIELDS)
+
+
 class Photo(models.Model):
+    """
+    A listing photo.
+
+    New photos keep their bytes in the content-addressed blob store and only
+    record the SHA-256 digest and size here. ``image_data`` and
+    ``thumbnail_data`` remain as a read fallback for rows that have not been
+    moved by ``migrate_photo_blobs`` yet.
+    """
     photo_id = models.AutoField(primary_key=True, db_column='Photo_ID')
     listing = models.ForeignKey(
         Listing,
@@ -243,11 +496,29 @@ class Photo(models.Model):
     )
     image_data = models.BinaryField(null=True, blank=True, db_column='Image_Data')
     thumbnail_data = models.BinaryField(null=True, blank=True, db_column='Thumbnail_Data')
+    image_digest = models.CharField(max_length=64, null=True, blank=True, db_column='Image_Digest')
+    image_size = models.PositiveIntegerField(null=True, blank=True, db_column='Image_Size')
+    thumbnail_digest = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        db_column='Thumbnail_Digest'
+    )
+    thumbnail_size = models.PositiveIntegerField(null=True, blank=True, db_column='Thumbnail_Size')
+    updated_date = models.DateTimeField(auto_now=True, null=True, db_column='Updated_Date')
     photo_display_order = models.IntegerField(
         null=True,
         blank=True,
         db_column='Photo_Display_Order'
     )
+    # False while an upload's compress/thumbnail jobs are still queued.
+    is_processed = models.BooleanField(default=True, db_column='Is_Processed')
+
+    objects = PhotoQuerySet.as_manager()
+
+    # update_fields to pass to save() after store_image() / store_thumbnail()
+    IMAGE_FIELDS = ['image_digest', 'image_size', 'image_data', 'updated_date']
+    THUMBNAIL_FIELDS = ['thumbnail_digest', 'thumbnail_size', 'thumbnail_data', 'updated_date']
     
     class Meta:
         db_table = 'Photo'
@@ -256,6 +527,222 @@ class Photo(models.Model):
     def __str__(self):
         return f"Photo {self.photo_id} for {self.listing.address}"
 
+    def store_image(self, data):
+        """
+        Write the full-size image to the blob store (call save() afterwards).
+
+        ``data`` may be bytes or a file object such as an upload, which is
+        streamed into the store in chunks.
+        """
+        self.image_digest, self.image_size = get_blob_storage().save(data)
+        self.image_data = None
+
+    def store_thumbnail(self, data):
+        """Write the thumbnail to the blob store (call save() afterwards)."""
+        self.thumbnail_digest, self.thumbnail_size = get_blob_storage().save(data)
+        self.thumbnail_data = None
+
+    def read_image(self):
+        """Return the full-size image bytes, or None if the photo has none."""
+        return self._read_blob(self.image_digest, 'image_data')
+
+    def has_image(self):
+        """Return True if the photo has a full-size image, without reading it."""
+        if self.image_digest:
+            return True
+        if 'image_data' in self.get_deferred_fields():
+            return Photo.objects.filter(pk=self.pk).exclude(image_data=None).exclude(image_data=b'').exists()
+        return bool(self.image_data)
+
+    def open_image(self):
+        """Return a binary file object for the full-size image, or None."""
+        if self.image_digest:
+            try:
+                return get_blob_storage().open(self.image_digest)
+            except BlobNotFound:
+                logger.warning("Blob %s for photo %s is missing; using image_data", self.image_digest, self.pk)
+        return BytesIO(self.image_data) if self.image_data else None
+
+    def read_thumbnail(self):
+        """Return the thumbnail bytes, or None if no thumbnail exists yet."""
+        return self._read_blob(self.thumbnail_digest, 'thumbnail_data')
+
+    def _read_blob(self, digest, legacy_field):
+        if digest:
+            try:
+                return get_blob_storage().read(digest)
+            except BlobNotFound:
+                logger.warning("Blob %s for photo %s is missing; using %s", digest, self.pk, legacy_field)
+        # Rows not yet moved to the blob store still carry their bytes.
+        data = getattr(self, legacy_field)
+        return bytes(data) if data else None
+
+
+def photo_metadata_prefetch(lookup='photos'):
+    """Prefetch a listing's photos without their binary columns."""
+    return models.Prefetch(lookup, queryset=Photo.objects.metadata())
+
+
+def refresh_primary_photos(listings=None):
+    """
+    Point each listing's ``primary_photo`` at its first photo in gallery
+    order (``Photo.Meta.ordering``), or NULL if it has none.
+
+    One UPDATE with a correlated subquery. Photo saves and deletes call
+    this through signals; call it after changing photos with
+    ``QuerySet.update()`` or raw SQL.
+    """
+    listings = Listing.objects.all() if listings is None else listings
+    first_photo = Photo.objects.filter(listing=models.OuterRef('pk')).order_by(*Photo._meta.ordering)
+    return listings.update(primary_photo=models.Subquery(first_photo.values('pk')[:1]))
+
+
+# Saves that can change which photo comes first.
+PRIMARY_PHOTO_FIELDS = {'listing', 'photo_display_order'}
+
+
+def _refresh_primary_photo(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not PRIMARY_PHOTO_FIELDS & set(update_fields):
+        return
+    # The photo's own listing, and the listing it was primary for if it
+    # has moved to another one.
+    refresh_primary_photos(
+        Listing.objects.filter(models.Q(pk=instance.listing_id) | models.Q(primary_photo=instance.pk))
+    )
+
+
+post_save.connect(_refresh_primary_photo, sender=Photo, dispatch_uid='primary-photo-save')
+post_delete.connect(_refresh_primary_photo, sender=Photo, dispatch_uid='primary-photo-delete')
+
+
+class PhotoRendition(models.Model):
+    """
+    A derived copy of a Photo: a resized srcset width, or the full-size
+    image or thumbnail re-encoded in a format negotiated from ``Accept``.
+
+    Renditions are generated on first request and their bytes are kept in
+    the blob store like the original image.
+    """
+    KIND_WIDTH = 'width'
+    KIND_IMAGE = 'image'
+    KIND_THUMBNAIL = 'thumbnail'
+    KIND_CHOICES = [
+        (KIND_WIDTH, 'Resized to width'),
+        (KIND_IMAGE, 'Full-size image'),
+        (KIND_THUMBNAIL, 'Thumbnail'),
+    ]
+
+    photo_rendition_id = models.AutoField(primary_key=True, db_column='Photo_Rendition_ID')
+    photo = models.ForeignKey(
+        Photo,
+        on_delete=models.CASCADE,
+        db_column='Photo_ID',
+        related_name='renditions'
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=KIND_WIDTH, db_column='Kind')
+    width = models.PositiveIntegerField(default=0, db_column='Width')
+    format = models.CharField(max_length=10, default='JPEG', db_column='Format')
+    digest = models.CharField(max_length=64, db_column='Digest')
+    size = models.PositiveIntegerField(db_column='Size')
+    created_date = models.DateTimeField(auto_now_add=True, db_column='Created_Date')
+
+    class Meta:
+        db_table = 'Photo_Rendition'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['photo', 'kind', 'width', 'format'],
+                name='unique_photo_rendition'
+            ),
+        ]
+
+    def __str__(self):
+        if self.kind == self.KIND_WIDTH:
+            return f"Photo {self.photo_id} at {self.width}px ({self.format})"
+        return f"Photo {self.photo_id} {self.kind} ({self.format})"
+
+    def read(self):
+        """Return the rendition bytes from the blob store."""
+        return get_blob_storage().read(self.digest)
+
+
+class ImageJob(models.Model):
+    """
+    A queued piece of image work for a Photo, run by ``run_image_worker``.
+
+    Workers claim pending jobs by moving them to ``running`` with a lease.
+    A failed job goes back to ``pending`` with a backoff until it has used
+    ``max_attempts``, then stays in ``dead`` for inspection in the admin.
+    """
+    KIND_COMPRESS = 'compress'
+    KIND_THUMBNAIL = 'thumbnail'
+    KIND_CHOICES = [
+        (KIND_COMPRESS, 'Compress image'),
+        (KIND_THUMBNAIL, 'Generate thumbnail'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_DEAD, 'Dead'),
+    ]
+
+    image_job_id = models.AutoField(primary_key=True, db_column='Image_Job_ID')
+    photo = models.ForeignKey(
+        Photo,
+        on_delete=models.CASCADE,
+        db_column='Photo_ID',
+        related_name='image_jobs'
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, db_column='Kind')
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        db_column='Status'
+    )
+    attempts = models.PositiveIntegerField(default=0, db_column='Attempts')
+    max_attempts = models.PositiveIntegerField(default=3, db_column='Max_Attempts')
+    run_after = models.DateTimeField(default=timezone.now, db_column='Run_After')
+    locked_by = models.CharField(max_length=100, blank=True, default='', db_column='Locked_By')
+    locked_until = models.DateTimeField(null=True, blank=True, db_column='Locked_Until')
+    last_error = models.TextField(blank=True, default='', db_column='Last_Error')
+    created_date = models.DateTimeField(auto_now_add=True, db_column='Created_Date')
+    updated_date = models.DateTimeField(auto_now=True, db_column='Updated_Date')
+
+    class Meta:
+        db_table = 'Image_Job'
+        ordering = ['image_job_id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='image_job_status_run_after'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for photo {self.photo_id} ({self.status})"
+
+
+class GenerationLock(models.Model):
+    """
+    A short-lived lease that lets one process generate a derived image
+    while others wait for it (see ``listings.single_flight``).
+
+    Rows are deleted on release; an expired row left by a crashed process
+    is taken over by the next caller.
+    """
+    key = models.CharField(max_length=100, primary_key=True, db_column='Lock_Key')
+    owner = models.CharField(max_length=100, db_column='Owner')
+    expires_at = models.DateTimeField(db_column='Expires_At')
+
+    class Meta:
+        db_table = 'Generation_Lock'
+
+    def __str__(self):
+        return f"{self.key} held by {self.owner} until {self.expires_at}"
+
 
 class SearchLog(models.Model):
     """Search log model for tracking searches."""
@@ -284,16 +771,90 @@ class SearchLog(models.Model):
         db_column='Pricebucket_ID',
         related_name='search_logs'
     )
-    timestamp = models.DateTimeField(auto_now_add=True, db_column='Timestamp')
+    # Not auto_now_add: buffered rows are written after the search happened,
+    # and bulk_create must keep the time the caller recorded.
+    timestamp = models.DateTimeField(default=timezone.now, db_column='Timestamp')
     
     class Meta:
         db_table = 'Search_Log'
         ordering = ['-timestamp']
+        # Report queries select a [start, end) range of Timestamp, alone or
+        # together with one filter dimension.
+        indexes = [
+            models.Index(fields=['timestamp'], name='search_log_timestamp'),
+            models.Index(fields=['property_type', 'timestamp'], name='search_log_type_ts'),
+            models.Index(fields=['neighborhood', 'timestamp'], name='search_log_nbhd_ts'),
+            models.Index(fields=['pricebucket', 'timestamp'], name='search_log_bucket_ts'),
+        ]
     
     def __str__(self):
         return f"Search log {self.search_log_id} - {self.timestamp}"
 
 
+class SearchLogDailyRollup(models.Model):
+    """
+    Search counts per local day and filter combination, for the search reports.
+
+    Maintained as SearchLog rows are written (see
+    ``listings.search_logging.write_search_logs``) and rebuilt from the raw
+    log by ``manage.py rebuild_search_rollups``.
+    """
+    rollup_id = models.AutoField(primary_key=True, db_column='Rollup_ID')
+    day = models.DateField(db_column='Day')
+    property_type = models.ForeignKey(
+        PropertyType,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_column='Property_Type_ID',
+        related_name='search_rollups'
+    )
+    neighborhood = models.ForeignKey(
+        Neighborhood,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_column='Neighborhood_ID',
+        related_name='search_rollups'
+    )
+    pricebucket = models.ForeignKey(
+        Pricebucket,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_column='Pricebucket_ID',
+        related_name='search_rollups'
+    )
+    search_count = models.PositiveIntegerField(default=0, db_column='Search_Count')
+
+    class Meta:
+        db_table = 'Search_Log_Daily_Rollup'
+        # Covers every column the reports read, so a period is answered from
+        # the index alone.
+        indexes = [
+            models.Index(
+                fields=['day', 'property_type', 'neighborhood', 'pricebucket', 'search_count'],
+                name='search_rollup_day_cover',
+            ),
+        ]
+        # One row per day and combination, with NULL (no filter) counted as
+        # a value. SQLite can't make NULLs equal in a unique index
+        # (nulls_distinct), so the keys are coalesced to 0; the upsert in
+        # search_logging targets the same expressions.
+        constraints = [
+            models.UniqueConstraint(
+                'day',
+                Coalesce('property_type', 0, output_field=models.IntegerField()),
+                Coalesce('neighborhood', 0, output_field=models.IntegerField()),
+                Coalesce('pricebucket', 0, output_field=models.IntegerField()),
+                name='search_rollup_combination',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.search_count} searches"
+
+
 class OmahaLocation(models.Model):
     """Omaha Location model for Discover Omaha page (See & Do, Food, Events)."""
     CATEGORY_CHOICES = [
@@ -0,0 +1,94 @@
+"""
+Keyset ("seek") pagination for the listings grid.
+
+Offset pagination counts the filtered set and skips ``OFFSET`` rows on
+every page. Keyset pagination remembers the sort key of the last row shown
+and asks for the rows after it, which the Listing indexes answer directly
+however deep the client has scrolled.
+
+Cursors are opaque to clients: the sort name, the last row's sort value and
+its ``listing_id`` are signed with ``django.core.signing``, so a cursor
+can't be forged or reused with a different sort.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = 'listings.pagination.cursor'
+
+# price_sort value from the listings page -> (sort field, descending).
+# listing_id breaks ties so every row has a unique position.
+SORTS = {
+    'low-high': ('price', False),
+    'high-low': ('price', True),
+    '': ('listed_date', True),
+}
+
+_PARSERS = {
+    'price': Decimal,
+    'listed_date': datetime.fromisoformat,
+}
+
+
+class InvalidCursor(ValueError):
+    """Raised for cursors that are malformed, tampered with or for another sort."""
+
+
+def _sort(price_sort):
+    return SORTS.get(price_sort, SORTS[''])
+
+
+def ordering(price_sort):
+    """Return the ``order_by`` arguments for a sort, tiebroken on listing_id."""
+    field, descending = _sort(price_sort)
+    prefix = '-' if descending else ''
+    return prefix + field, prefix + 'listing_id'
+
+
+def encode_cursor(listing, price_sort):
+    """Return the cursor that continues after ``listing``."""
+    field, _ = _sort(price_sort)
+    value = getattr(listing, field)
+    value = value.isoformat() if isinstance(value, datetime) else str(value)
+    return signing.dumps([field, value, listing.pk], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor, price_sort):
+    """Return ``(sort value, listing_id)`` from a cursor, or raise InvalidCursor."""
+    field, _ = _sort(price_sort)
+    try:
+        cursor_field, value, listing_id = signing.loads(cursor, salt=CURSOR_SALT)
+        if cursor_field != field:
+            raise InvalidCursor('Cursor belongs to a different sort order.')
+        return _PARSERS[field](value), int(listing_id)
+    except (signing.BadSignature, ValueError, TypeError, ArithmeticError) as e:
+        raise InvalidCursor(str(e))
+
+
+def keyset_page(queryset, price_sort, cursor=None, per_page=12):
+    """
+    Return ``(listings, next_cursor)`` for the page after ``cursor``.
+
+    ``queryset`` must already be filtered; it is ordered here. ``cursor`` is
+    None or empty for the first page, and ``next_cursor`` is None on the
+    last page. No COUNT query is issued.
+    """
+    field, descending = _sort(price_sort)
+    queryset = queryset.order_by(*ordering(price_sort))
+    if cursor:
+        value, listing_id = decode_cursor(cursor, price_sort)
+        # The range term lets the index seek to the cursor; the OR only
+        # sorts out rows that share the cursor's sort value.
+        after, beyond = ('lte', 'lt') if descending else ('gte', 'gt')
+        queryset = queryset.filter(
+            Q(**{f'{field}__{after}': value}),
+            Q(**{f'{field}__{beyond}': value}) | Q(**{field: value, f'listing_id__{beyond}': listing_id}),
+        )
+
+    listings = list(queryset[:per_page + 1])
+    if len(listings) <= per_page:
+        return listings, None
+    listings = listings[:per_page]
+    return listings, encode_cursor(listings[-1], price_sort)
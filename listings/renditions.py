@@ -0,0 +1,168 @@
+"""
+Responsive photo renditions and format variants.
+
+Each Photo can be served at the widths listed in
+``settings.PHOTO_RENDITION_WIDTHS`` through ``/photo/<id>/<width>/``, and
+every photo endpoint can answer with a WebP or AVIF variant when the
+request's ``Accept`` header allows it. Each is persisted as a
+PhotoRendition row plus a blob, so serving it is a single indexed lookup.
+The compress job stores them all from its one decode of the upload
+(``store_renditions``); one that is still missing, e.g. for a width added
+to the settings later, is generated the first time it is requested.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+
+from .blob_storage import get_blob_storage
+from .image_utils import convert_image, format_supported, generate_rendition, generate_thumbnail
+from .models import PhotoRendition
+from .single_flight import rendition_flight
+
+DEFAULT_RENDITION_WIDTHS = (160, 320, 640, 1280)
+
+# Formats offered to clients that list them in Accept, most preferred first.
+DEFAULT_NEGOTIATED_FORMATS = ('AVIF', 'WEBP')
+
+FORMAT_CONTENT_TYPES = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+    'AVIF': 'image/avif',
+}
+
+# Shown in place of a thumbnail while an upload's image jobs are queued, by
+# the thumbnail endpoint and by {% processing_placeholder_url %}.
+PROCESSING_PLACEHOLDER_URL = 'https://placehold.co/400x300?text=Processing+Photo'
+
+
+def rendition_widths():
+    """Return the configured rendition widths in ascending order."""
+    return tuple(sorted(getattr(settings, 'PHOTO_RENDITION_WIDTHS', DEFAULT_RENDITION_WIDTHS)))
+
+
+def negotiated_formats():
+    """Return the configured Accept-negotiated formats this Pillow can encode."""
+    formats = getattr(settings, 'PHOTO_NEGOTIATED_FORMATS', DEFAULT_NEGOTIATED_FORMATS)
+    return tuple(f for f in formats if f in FORMAT_CONTENT_TYPES and format_supported(f))
+
+
+def preferred_format(accept):
+    """
+    Pick the best negotiated format for an ``Accept`` header value.
+
+    Only formats the client names explicitly count; wildcards such as
+    ``image/*`` or ``*/*`` do not, because older browsers send them without
+    being able to decode WebP or AVIF. Returns None when the client should
+    get the original JPEG.
+    """
+    accepted = {}
+    for part in accept.split(','):
+        media_type, *params = [p.strip() for p in part.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[media_type.lower()] = quality
+
+    best, best_quality = None, 0.0
+    for format in negotiated_formats():
+        quality = accepted.get(FORMAT_CONTENT_TYPES[format], 0.0)
+        if quality > best_quality:
+            best, best_quality = format, quality
+    return best
+
+
+def get_or_create_rendition(photo, width, format='JPEG'):
+    """
+    Return ``(rendition, outcome)`` for ``photo`` at ``width``, generating
+    and persisting the rendition on first use. ``outcome`` is None when it
+    was already stored, and otherwise the ``single_flight`` outcome of
+    generating it; the rendition is None if the photo has no image or
+    another request is still generating it.
+    """
+    return _get_or_create(
+        photo, PhotoRendition.KIND_WIDTH, width, format,
+        lambda: generate_rendition(photo.read_image(), width, format=format),
+    )
+
+
+def get_or_create_variant(photo, kind, format):
+    """
+    Return ``(rendition, outcome)`` for the full-size image (``KIND_IMAGE``)
+    or thumbnail (``KIND_THUMBNAIL``) of ``photo`` re-encoded as ``format``,
+    generating and persisting it on first use, as ``get_or_create_rendition``
+    does.
+
+    A ``KIND_IMAGE`` variant that would not be smaller than the original
+    stores the original bytes instead, so serve it with a sniffed content
+    type rather than assuming ``format``.
+    """
+    if kind == PhotoRendition.KIND_IMAGE:
+        def generate():
+            # An already well-compressed upload can beat the re-encode; keep
+            # the original bytes for this format then, so it is not retried.
+            original = photo.read_image()
+            converted = convert_image(original, format)
+            if converted and original and len(converted) >= len(original):
+                return original
+            return converted or original
+    elif kind == PhotoRendition.KIND_THUMBNAIL:
+        def generate():
+            return generate_thumbnail(photo.read_image() or photo.read_thumbnail(), format=format)
+    else:
+        raise ValueError(f"Unknown variant kind: {kind!r}")
+    return _get_or_create(photo, kind, 0, format, generate)
+
+
+def _get_or_create(photo, kind, width, format, generate):
+    lookup = {'photo': photo, 'kind': kind, 'width': width, 'format': format}
+
+    def find():
+        return PhotoRendition.objects.filter(**lookup).first()
+
+    rendition = find()
+    if rendition is not None:
+        return rendition, None
+
+    def create():
+        data = generate()
+        if not data:
+            return None
+        digest, size = get_blob_storage().save(data)
+        try:
+            with transaction.atomic():
+                return PhotoRendition.objects.create(digest=digest, size=size, **lookup)
+        except IntegrityError:
+            # Stored first by the compress job.
+            return PhotoRendition.objects.get(**lookup)
+
+    # Only one request per rendition encodes it; concurrent ones wait for it.
+    return rendition_flight.run(f'{photo.pk}:{kind}:{width}:{format}', create, find)
+
+
+def store_renditions(photo, renditions):
+    """
+    Persist renditions of ``photo`` generated elsewhere. ``renditions`` maps
+    ``(kind, width, format)`` to the encoded bytes; ones already stored are
+    kept.
+    """
+    storage = get_blob_storage()
+    rows = []
+    for (kind, width, format), data in renditions.items():
+        digest, size = storage.save(data)
+        rows.append(PhotoRendition(
+            photo=photo, kind=kind, width=width, format=format, digest=digest, size=size,
+        ))
+    PhotoRendition.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def photo_srcset(photo_id):
+    """Build an ``srcset`` attribute value covering every rendition width."""
+    return ', '.join(
+        f"{reverse('listing_photo_rendition', args=[photo_id, width])} {width}w"
+        for width in rendition_widths()
+    )
@@ -0,0 +1,330 @@
+"""
+Search report queries.
+
+The search report counts searches per property type, neighborhood and
+price range over a range of local days, in total and optionally per day
+or per week. ``search_report`` computes every section in one pass over
+one query, with one of two strategies:
+
+- ``scan``: select the rows once and group them in Python with
+  ``Counter``; names come from the in-process lookup caches, which reload
+  when asked for an id they don't hold.
+- ``union``: one ``UNION ALL`` statement with a ``GROUP BY`` per section
+  (SQLite has no ``GROUPING SETS``), names joined in SQL.
+
+Counts come from ``SearchLogDailyRollup`` rather than the raw
+``SearchLog``: a month is at most 31 days times the filter combinations
+searched on each day, however many searches were logged, and the period
+is selected with a range on the indexed ``day`` column. ``source='log'``
+counts the raw log instead, which the benchmark and the rollup checks use.
+
+Queries on the raw log select periods with half-open ``[start, end)``
+ranges of aware datetimes, computed once from local midnights in the
+configured time zone. ``timestamp__month``/``timestamp__year`` would
+compile to a timezone-converting function call on every row, which no
+index can serve; a range on ``Timestamp`` seeks in the Search_Log indexes.
+
+CSV exports are generators of rows for a ``StreamingHttpResponse``
+(``stream_csv``). The raw export reads the log in keyset-paginated chunks,
+so memory stays constant however long the range is, and no read
+transaction stays open between chunks to hold up search log writes.
+"""
+import csv
+import logging
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Count, DateField, F, Q, Sum, Value
+from django.db.models.functions import TruncDate, TruncWeek
+from django.utils import timezone
+
+from . import lookups
+from .models import SearchLog, SearchLogDailyRollup
+
+logger = logging.getLogger(__name__)
+
+# Report section -> (foreign key, name field of the related model, lookup cache).
+# Rows are listed under '<foreign key>__<name field>', e.g. 'neighborhood__name'.
+DIMENSIONS = {
+    'property_types': ('property_type', 'name', lookups.property_types),
+    'neighborhoods': ('neighborhood', 'name', lookups.neighborhoods),
+    'price_ranges': ('pricebucket', 'range', lookups.pricebuckets),
+}
+
+GRANULARITIES = ('day', 'week')
+SOURCES = ('rollup', 'log')
+STRATEGIES = ('scan', 'union')
+
+# Longest start/end range the report views accept, in days.
+MAX_RANGE_DAYS = 366
+
+
+def month_bounds(year, month):
+    """Return the half-open ``[first day, first day of next month)`` of a month."""
+    first = date(year, month, 1)
+    if month == 12:
+        return first, date(year + 1, 1, 1)
+    return first, date(year, month + 1, 1)
+
+
+def day_start(day):
+    """Return the aware datetime of local midnight at the start of ``day``."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def datetime_range(start_day, end_day):
+    """Return ``(start, end)`` datetimes for the local days ``[start_day, end_day)``."""
+    return day_start(start_day), day_start(end_day)
+
+
+def search_logs_between(start, end):
+    """SearchLog rows with ``start <= timestamp < end``."""
+    return SearchLog.objects.filter(timestamp__gte=start, timestamp__lt=end)
+
+
+def period_start(day, granularity):
+    """Return the first day of the period containing ``day``; weeks start on Monday."""
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    return None
+
+
+def search_report(start_day, end_day, granularity=None, source='rollup', strategy=None):
+    """
+    Count the searches on the local days ``[start_day, end_day)``.
+
+    Returns a dict with ``search_count`` (all searches) and, for every
+    section in DIMENSIONS, a list of ``{'<fk>__<name>': ..., 'search_count': n}``
+    dicts, most searched first. With ``granularity`` 'day' or 'week' it also
+    has ``periods``: one dict of the same shape plus ``start`` for every
+    period overlapping the range, empty ones included. A week is listed
+    under its Monday even when the range starts mid-week.
+
+    ``strategy`` None picks ``union`` for totals and ``scan`` for a
+    breakdown: SQLite truncates dates to periods with a Python function per
+    row, which costs more than grouping the rows in Python
+    (``benchmarks/search_reports.py``).
+    """
+    if granularity not in (None, *GRANULARITIES):
+        raise ValueError(f"Unknown report granularity: {granularity!r}")
+    if source not in SOURCES:
+        raise ValueError(f"Unknown report source: {source!r}")
+    if strategy is None:
+        strategy = 'scan' if granularity else 'union'
+    if strategy == 'scan':
+        totals, counts = _scan_counts(start_day, end_day, granularity, source)
+    elif strategy == 'union':
+        totals, counts = _union_counts(start_day, end_day, granularity, source)
+    else:
+        raise ValueError(f"Unknown report strategy: {strategy!r}")
+
+    report = {
+        'start': start_day,
+        'end': end_day,
+        'granularity': granularity,
+        **_sections(totals, counts, None),
+    }
+    if granularity:
+        report['periods'] = []
+        period = period_start(start_day, granularity)
+        step = timedelta(days=1 if granularity == 'day' else 7)
+        while period < end_day:
+            report['periods'].append({'start': period, **_sections(totals, counts, period)})
+            period += step
+    return report
+
+
+def _sections(totals, counts, period):
+    """Report sections for one period, or for the whole range when ``period`` is None."""
+    sections = {'search_count': totals[period] if period else sum(totals.values())}
+    for section, (fk, name, _) in DIMENSIONS.items():
+        by_name = Counter()
+        for (row_period, label), count in counts[section].items():
+            if period is None or row_period == period:
+                by_name[label] += count
+        sections[section] = [
+            {f'{fk}__{name}': label, 'search_count': count}
+            for label, count in sorted(by_name.items(), key=lambda item: (-item[1], item[0]))
+        ]
+    return sections
+
+
+def _scan_counts(start_day, end_day, granularity, source):
+    """
+    Read the rows once and group them in Python. Returns ``(totals, counts)``:
+    searches per period, and per section a Counter of ``(period, name)``.
+    """
+    fks = [f'{fk}_id' for fk, _, _ in DIMENSIONS.values()]
+    if source == 'rollup':
+        rollups = SearchLogDailyRollup.objects.filter(day__gte=start_day, day__lt=end_day).order_by()
+        if granularity:
+            rows = rollups.values_list('day', *fks, 'search_count')
+        else:
+            # Totals only: skip reading and parsing every row's date.
+            rows = ((None, *row) for row in rollups.values_list(*fks, 'search_count'))
+    else:
+        logs = search_logs_between(*datetime_range(start_day, end_day)).order_by()
+        rows = (
+            (timezone.localdate(timestamp) if granularity else None, *ids, 1)
+            for timestamp, *ids in logs.values_list('timestamp', *fks).iterator(chunk_size=10000)
+        )
+
+    totals = Counter()
+    by_id = {section: Counter() for section in DIMENSIONS}
+    sections = list(by_id.items())
+    for day, *ids, weight in rows:
+        period = period_start(day, granularity)
+        totals[period] += weight
+        for (_, counter), key in zip(sections, ids):
+            if key is not None:
+                counter[period, key] += weight
+
+    counts = {}
+    for section, (_, name, cache) in DIMENSIONS.items():
+        labels = {}
+        counts[section] = Counter()
+        for (period, key), count in by_id[section].items():
+            if key not in labels:
+                labels[key] = _label(cache, name, key)
+            counts[section][period, labels[key]] += count
+    return totals, counts
+
+
+def _label(cache, name, key):
+    """
+    Return the name of lookup row ``key``. ``cache.get()`` reloads for a row
+    this process hasn't seen; a row deleted since it was counted is listed
+    under its id rather than left out of the report.
+    """
+    row = cache.get(key)
+    if row is None:
+        logger.warning('%s %s was counted in a search report but no longer exists', cache.model.__name__, key)
+        return f'#{key}'
+    return getattr(row, name)
+
+
+def _union_counts(start_day, end_day, granularity, source):
+    """One UNION ALL of per-section GROUP BYs; same return value as _scan_counts."""
+    if source == 'rollup':
+        rows = SearchLogDailyRollup.objects.filter(day__gte=start_day, day__lt=end_day)
+        day, weight = F('day'), Sum('search_count')
+    else:
+        rows = search_logs_between(*datetime_range(start_day, end_day))
+        day, weight = TruncDate('timestamp'), Count('search_log_id')
+    period = {
+        None: Value(None, output_field=DateField()),
+        'day': day,
+        'week': TruncWeek(day, output_field=DateField()),
+    }[granularity]
+
+    def grouped(queryset, section, label):
+        return (
+            queryset.order_by()
+            .annotate(section=Value(section), period=period, label=label)
+            .values('section', 'period', 'label')
+            .annotate(search_count=weight)
+        )
+
+    parts = [
+        grouped(rows.filter(**{f'{fk}__isnull': False}), section, F(f'{fk}__{name}'))
+        for section, (fk, name, _) in DIMENSIONS.items()
+    ]
+    combined = grouped(rows, '', Value('')).union(*parts, all=True)
+
+    totals = Counter()
+    counts = {section: Counter() for section in DIMENSIONS}
+    for row in combined:
+        if not row['search_count']:
+            # The ungrouped total over no rows is a single NULL row.
+            continue
+        if row['section']:
+            counts[row['section']][row['period'], row['label']] += row['search_count']
+        else:
+            totals[row['period']] += row['search_count']
+    return totals, counts
+
+
+# Columns of the raw export: (CSV header, SearchLog lookup).
+RAW_EXPORT_COLUMNS = [
+    ('Search ID', 'search_log_id'),
+    ('Timestamp', 'timestamp'),
+    ('Home Type', 'property_type__name'),
+    ('Neighborhood', 'neighborhood__name'),
+    ('Price Range', 'pricebucket__range'),
+]
+
+RAW_EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """File-like object whose write() returns the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """Yield each row of ``rows`` as a CSV-encoded line."""
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+# Section -> CSV heading.
+SECTION_HEADINGS = {
+    'property_types': 'Home Type',
+    'neighborhoods': 'Neighborhood',
+    'price_ranges': 'Price Range',
+}
+
+
+def summary_csv_rows(title, report):
+    """Yield the rows of the summary CSV for a ``search_report`` result."""
+    yield [title]
+    for section, heading in SECTION_HEADINGS.items():
+        fk, name, _ = DIMENSIONS[section]
+        yield []
+        yield [heading, 'Searches']
+        for item in report[section]:
+            yield [item[f'{fk}__{name}'], item['search_count']]
+
+    if report['granularity']:
+        yield []
+        yield [f"{report['granularity'].title()} Starting", 'Category', 'Name', 'Searches']
+        for period in report['periods']:
+            start = period['start'].isoformat()
+            yield [start, 'All Searches', '', period['search_count']]
+            for section, heading in SECTION_HEADINGS.items():
+                fk, name, _ = DIMENSIONS[section]
+                for item in period[section]:
+                    yield [start, heading, item[f'{fk}__{name}'], item['search_count']]
+
+
+def iter_search_logs(start, end, chunk_size=RAW_EXPORT_CHUNK_SIZE):
+    """
+    Yield ``RAW_EXPORT_COLUMNS`` value tuples for every search in ``[start,
+    end)``, oldest first. Each chunk is a separate query that seeks past the
+    last ``(timestamp, search_log_id)`` seen.
+    """
+    fields = [lookup for _, lookup in RAW_EXPORT_COLUMNS]
+    logs = search_logs_between(start, end).order_by('timestamp', 'search_log_id')
+    chunk = logs
+    while True:
+        rows = list(chunk.values_list(*fields)[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_id, last_timestamp = rows[-1][0], rows[-1][1]
+        chunk = logs.filter(
+            Q(timestamp__gt=last_timestamp) | Q(timestamp=last_timestamp, search_log_id__gt=last_id),
+            timestamp__gte=last_timestamp,
+        )
+
+
+def raw_csv_rows(start, end, chunk_size=RAW_EXPORT_CHUNK_SIZE):
+    """Yield the header and one row per search in ``[start, end)``."""
+    yield [header for header, _ in RAW_EXPORT_COLUMNS]
+    for search_log_id, timestamp, *names in iter_search_logs(start, end, chunk_size):
+        yield [search_log_id, timezone.localtime(timestamp).isoformat(), *names]
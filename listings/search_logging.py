@@ -0,0 +1,325 @@
+"""
+Buffered SearchLog writes.
+
+all_listings records a search on every filtered request. One INSERT per
+request means one SQLite write lock per request, and every reader has to
+wait while a writer commits. ``record_search`` instead hands the event to
+the process's ``SearchLogBuffer``, which writes queued events with a single
+``bulk_create`` once ``MAX_SIZE`` are waiting or ``MAX_AGE_SECONDS`` have
+passed, whichever comes first.
+
+Configure with ``settings.SEARCH_LOG_BUFFER``::
+
+    SEARCH_LOG_BUFFER = {
+        'ENABLED': True,
+        'MAX_SIZE': 100,          # flush when this many events are queued
+        'MAX_AGE_SECONDS': 5.0,   # flush at least this often
+    }
+
+With ``ENABLED`` False each search is written straight away.
+
+Either way rows go through ``write_search_logs``, which also adds them to
+``SearchLogDailyRollup`` in the same transaction, so the reports never see
+a row that isn't counted (or a count without its row). The rollup is
+upserted against its ``search_rollup_combination`` constraint, so flushers
+in different processes add to one row per combination.
+
+Pending events are flushed when the interpreter exits (``atexit``), which
+covers a graceful shutdown of runserver or gunicorn workers. A process
+that is killed outright loses at most the events of one interval. A
+failed flush puts its events back at the front of the queue for the next
+attempt; an event recorded after the buffer was closed is written
+straight away.
+
+Buffering is off by default. Under uWSGI, only enable it with
+``enable-threads = true`` (without it the flusher thread never runs) and
+``lazy-apps = true``, and expect that recycled workers (``max-requests``,
+``harakiri``, reloads) may exit without running ``atexit`` and lose their
+last interval of searches.
+
+A worker forked from a parent that already had a buffer (gunicorn
+``--preload``) gets fresh locks and an empty queue, and starts its own
+flusher thread on its first search; threads don't survive ``fork()``.
+"""
+import atexit
+import logging
+import os
+import threading
+import weakref
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import SearchLog, SearchLogDailyRollup
+from .reports import day_start
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'MAX_SIZE': 100,
+    'MAX_AGE_SECONDS': 5.0,
+}
+
+# A buffer whose flushes keep failing stops growing at MAX_SIZE times this.
+MAX_BACKLOG_BATCHES = 50
+
+# Columns identifying one rollup row, and the combinations per upsert.
+ROLLUP_KEYS = ('day', 'property_type_id', 'neighborhood_id', 'pricebucket_id')
+UPSERT_BATCH_SIZE = 100
+
+# The conflict target repeats the expressions of the search_rollup_combination
+# constraint, which SQLite and PostgreSQL match it against.
+UPSERT_ROLLUPS = (
+    'INSERT INTO "Search_Log_Daily_Rollup" '
+    '("Day", "Property_Type_ID", "Neighborhood_ID", "Pricebucket_ID", "Search_Count") '
+    'VALUES {rows} '
+    'ON CONFLICT ("Day", (COALESCE("Property_Type_ID", 0)), (COALESCE("Neighborhood_ID", 0)), '
+    '(COALESCE("Pricebucket_ID", 0))) '
+    'DO UPDATE SET "Search_Count" = "Search_Log_Daily_Rollup"."Search_Count" + excluded."Search_Count"'
+)
+
+# Lookup model -> its key in the rollup.
+LOOKUP_KEYS = {
+    'listings.PropertyType': 'property_type_id',
+    'listings.Neighborhood': 'neighborhood_id',
+    'listings.Pricebucket': 'pricebucket_id',
+}
+
+
+def write_search_logs(logs):
+    """Insert unsaved SearchLog instances and add them to the daily rollup."""
+    with transaction.atomic():
+        SearchLog.objects.bulk_create(logs)
+        add_to_rollups(logs)
+
+
+def add_to_rollups(logs):
+    """Add ``logs`` to SearchLogDailyRollup."""
+    counts = Counter(
+        (timezone.localdate(log.timestamp), log.property_type_id, log.neighborhood_id, log.pricebucket_id)
+        for log in logs
+    )
+    upsert_rollups(counts)
+
+
+def upsert_rollups(counts):
+    """
+    Add ``{(day, property_type_id, neighborhood_id, pricebucket_id): searches}``
+    to SearchLogDailyRollup, with one INSERT ... ON CONFLICT DO UPDATE per
+    ``UPSERT_BATCH_SIZE`` combinations.
+    """
+    items = list(counts.items())
+    with connection.cursor() as cursor:
+        for start in range(0, len(items), UPSERT_BATCH_SIZE):
+            batch = items[start:start + UPSERT_BATCH_SIZE]
+            params = []
+            for (day, property_type_id, neighborhood_id, pricebucket_id), count in batch:
+                params += [
+                    connection.ops.adapt_datefield_value(day),
+                    property_type_id, neighborhood_id, pricebucket_id, count,
+                ]
+            rows = ', '.join(['(%s, %s, %s, %s, %s)'] * len(batch))
+            cursor.execute(UPSERT_ROLLUPS.format(rows=rows), params)
+
+
+def rebuild_search_rollups(since=None):
+    """
+    Recompute SearchLogDailyRollup from the raw log, for every day or for
+    ``since`` (a date) onwards. Returns the number of rollup rows written.
+    """
+    rollups = SearchLogDailyRollup.objects.all()
+    logs = SearchLog.objects.all()
+    if since is not None:
+        rollups = rollups.filter(day__gte=since)
+        logs = logs.filter(timestamp__gte=day_start(since))
+    totals = (
+        logs.order_by()
+        .annotate(day=TruncDate('timestamp'))
+        .values('day', 'property_type_id', 'neighborhood_id', 'pricebucket_id')
+        .annotate(search_count=Count('search_log_id'))
+        .values_list('day', 'property_type_id', 'neighborhood_id', 'pricebucket_id', 'search_count')
+    )
+    with transaction.atomic():
+        rollups.delete()
+        created = SearchLogDailyRollup.objects.bulk_create(
+            (
+                SearchLogDailyRollup(
+                    day=day,
+                    property_type_id=property_type_id,
+                    neighborhood_id=neighborhood_id,
+                    pricebucket_id=pricebucket_id,
+                    search_count=search_count,
+                )
+                for day, property_type_id, neighborhood_id, pricebucket_id, search_count in totals
+            ),
+            batch_size=500,
+        )
+    return len(created)
+
+
+class SearchLogBuffer:
+    """Collects SearchLog rows in memory and writes them in batches."""
+
+    def __init__(self, max_size=100, max_age=5.0):
+        self.max_size = max_size
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._stop = threading.Event()
+        self._flusher = None
+        _buffers.add(self)
+
+    def add(self, log):
+        """
+        Queue an unsaved SearchLog, flushing inline if the batch is full.
+        Once the buffer is closed nothing would flush it, so it is written
+        straight away.
+        """
+        with self._lock:
+            closed = self._stop.is_set()
+            if not closed:
+                self._pending.append(log)
+            full = len(self._pending) >= self.max_size
+            if self._flusher is None and not closed:
+                self._flusher = threading.Thread(
+                    target=self._run, name='search-log-flusher', daemon=True
+                )
+                self._flusher.start()
+        if closed:
+            write_search_logs([log])
+        elif full:
+            self.flush()
+
+    def pending(self):
+        """Return the number of queued, unwritten events."""
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Write every queued event now and return how many were written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                write_search_logs(batch)
+            except Exception:
+                logger.exception("Failed to write %s buffered search logs; will retry", len(batch))
+                with self._lock:
+                    self._pending[:0] = batch
+                    overflow = len(self._pending) - self.max_size * MAX_BACKLOG_BATCHES
+                    if overflow > 0:
+                        logger.error("Search log backlog full; dropping %s oldest events", overflow)
+                        del self._pending[:overflow]
+                return 0
+            return len(batch)
+
+    def close(self):
+        """Stop the background flusher and write whatever is still queued."""
+        self._stop.set()
+        flusher = self._flusher
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join()
+        self.flush()
+
+    def _after_fork(self):
+        # The child inherits the locks in whatever state another thread
+        # held them, a flusher that no longer runs, and the parent's queue,
+        # which the parent writes itself.
+        stopped = self._stop.is_set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._stop = threading.Event()
+        if stopped:
+            self._stop.set()
+        self._flusher = None
+
+    def _run(self):
+        while not self._stop.wait(self.max_age):
+            try:
+                self.flush()
+            finally:
+                # This thread's connection is idle until the next interval.
+                connection.close()
+
+
+# Every buffer in this process, reset in a forked child.
+_buffers = weakref.WeakSet()
+
+
+def _reset_buffers_after_fork():
+    for buffer in list(_buffers):
+        buffer._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):  # not on Windows
+    os.register_at_fork(after_in_child=_reset_buffers_after_fork)
+
+
+@lru_cache(maxsize=None)
+def get_search_log_buffer():
+    """Return this process's buffer, or None when buffering is disabled."""
+    config = {**DEFAULTS, **getattr(settings, 'SEARCH_LOG_BUFFER', {})}
+    if not config['ENABLED']:
+        return None
+    buffer = SearchLogBuffer(config['MAX_SIZE'], config['MAX_AGE_SECONDS'])
+    atexit.register(buffer.close)
+    return buffer
+
+
+def record_search(pricebucket=None, neighborhood=None, property_type=None, timestamp=None):
+    """Record one listings search, buffered or written straight away."""
+    log = SearchLog(
+        pricebucket=pricebucket,
+        neighborhood=neighborhood,
+        property_type=property_type,
+        timestamp=timestamp or timezone.now(),
+    )
+    buffer = get_search_log_buffer()
+    if buffer is None:
+        write_search_logs([log])
+    else:
+        buffer.add(log)
+    return log
+
+
+@receiver(setting_changed)
+def _reset_search_log_buffer(*, setting, **kwargs):
+    if setting == 'SEARCH_LOG_BUFFER':
+        if get_search_log_buffer.cache_info().currsize:
+            buffer = get_search_log_buffer()
+            if buffer is not None:
+                buffer.close()
+                atexit.unregister(buffer.close)
+        get_search_log_buffer.cache_clear()
+
+
+def _fold_rollups(sender, instance, **kwargs):
+    # Deleting a lookup row sets its rollups' key to NULL, and that
+    # combination may already have a row; add the counts to it instead.
+    key = LOOKUP_KEYS[sender._meta.label]
+    rows = SearchLogDailyRollup.objects.filter(**{key: instance.pk})
+    position = ROLLUP_KEYS.index(key)
+    counts = Counter()
+    for *combination, count in rows.values_list(*ROLLUP_KEYS, 'search_count'):
+        combination[position] = None
+        counts[tuple(combination)] += count
+    if counts:
+        rows.delete()
+        upsert_rollups(counts)
+
+
+for _model in LOOKUP_KEYS:
+    pre_delete.connect(_fold_rollups, sender=_model, dispatch_uid=f'search-rollups-fold-{_model}')
@@ -0,0 +1,159 @@
+"""
+Single-flight execution for on-demand image generation.
+
+When many requests ask for the same missing thumbnail, rendition or format
+variant at once, only one of them should run Pillow. ``SingleFlight.run`` elects a leader per key in two
+layers:
+
+* within a process, the first thread registers an Event and the others
+  wait on it;
+* across processes, the leader also takes a GenerationLock row, and a
+  leader in another process that finds the row taken polls for the
+  result instead of generating it.
+
+Callers that are still waiting when ``wait_seconds`` runs out get
+``TIMED_OUT`` and are expected to serve a placeholder. When the leader
+finishes without a result (``generate()`` returned None or raised), it and
+its waiters get ``FAILED`` instead. Outcome counters are
+kept in the default cache, so they aggregate across processes when a
+shared cache backend is configured.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import GenerationLock
+
+logger = logging.getLogger(__name__)
+
+GENERATED = 'generated'
+SHARED = 'shared'
+TIMED_OUT = 'timed_out'
+FAILED = 'failed'
+OUTCOMES = (GENERATED, SHARED, TIMED_OUT, FAILED)
+
+
+class SingleFlight:
+    """Run ``generate`` at most once at a time per key, across threads and processes."""
+
+    def __init__(self, name, wait_seconds=2.0, lease_seconds=30, poll_interval=0.05):
+        self.name = name
+        self.wait_seconds = wait_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._mutex = threading.Lock()
+        self._inflight = {}
+
+    def run(self, key, generate, lookup):
+        """
+        Return ``(result, outcome)`` for ``key``.
+
+        ``generate()`` produces and persists the result; ``lookup()`` returns
+        the persisted result or None. Exactly one caller per key runs
+        ``generate``; the others get the leader's result through ``lookup``
+        (outcome ``SHARED``) or give up after ``wait_seconds``
+        (outcome ``TIMED_OUT``, result None). If the leader finishes without
+        a result, everyone gets ``FAILED`` and None; an exception from
+        ``generate`` is re-raised to the leader.
+        """
+        with self._mutex:
+            event = self._inflight.get(key)
+            is_leader = event is None
+            if is_leader:
+                event = self._inflight[key] = threading.Event()
+
+        if not is_leader:
+            finished = event.wait(self.wait_seconds)
+            return self._outcome(lookup(), finished)
+
+        try:
+            owner = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+            lock_key = f"{self.name}:{key}"
+            if self._acquire(lock_key, owner):
+                result = None
+                try:
+                    result = generate()
+                finally:
+                    GenerationLock.objects.filter(key=lock_key, owner=owner).delete()
+                    # Recorded after generate(), so errors count as failures.
+                    outcome = GENERATED if result is not None else FAILED
+                    self._record(outcome)
+                return result, outcome
+            return self._outcome(*self._poll(lock_key, lookup))
+        finally:
+            with self._mutex:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def stats(self):
+        """Return outcome counts, plus the number of generations avoided."""
+        counts = {outcome: cache.get(self._metric_key(outcome), 0) for outcome in OUTCOMES}
+        counts['duplicates_avoided'] = counts[SHARED] + counts[TIMED_OUT]
+        return counts
+
+    def reset_stats(self):
+        cache.delete_many([self._metric_key(outcome) for outcome in OUTCOMES])
+
+    def _outcome(self, result, finished):
+        """Outcome for a waiter; ``finished`` says whether the leader is done."""
+        if result is not None:
+            outcome = SHARED
+        else:
+            outcome = FAILED if finished else TIMED_OUT
+        self._record(outcome)
+        return result, outcome
+
+    def _acquire(self, lock_key, owner):
+        now = timezone.now()
+        for _ in range(2):
+            try:
+                with transaction.atomic():
+                    GenerationLock.objects.create(
+                        key=lock_key, owner=owner,
+                        expires_at=now + timedelta(seconds=self.lease_seconds),
+                    )
+                return True
+            except IntegrityError:
+                # Take over a lease left behind by a crashed process.
+                if not GenerationLock.objects.filter(key=lock_key, expires_at__lt=now).delete()[0]:
+                    return False
+        return False
+
+    def _poll(self, lock_key, lookup):
+        """Return ``(result, finished)`` once the other process's leader is done or time is up."""
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            result = lookup()
+            if result is not None:
+                return result, True
+            if not GenerationLock.objects.filter(key=lock_key).exists():
+                # Released without a result; look once more in case it was
+                # stored between the two queries.
+                return lookup(), True
+            if time.monotonic() >= deadline:
+                return None, False
+            time.sleep(self.poll_interval)
+
+    def _metric_key(self, outcome):
+        return f"single_flight:{self.name}:{outcome}"
+
+    def _record(self, outcome):
+        metric_key = self._metric_key(outcome)
+        cache.add(metric_key, 0, timeout=None)
+        try:
+            cache.incr(metric_key)
+        except ValueError:
+            # Evicted between add() and incr().
+            cache.set(metric_key, 1, timeout=None)
+        logger.debug("single-flight %s: %s", self.name, outcome)
+
+
+thumbnail_flight = SingleFlight('thumbnail')
+rendition_flight = SingleFlight('rendition')
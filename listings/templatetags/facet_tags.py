@@ -0,0 +1,12 @@
+"""
+Template filters for the listings filter dropdowns.
+"""
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def facet_count(counts, pk):
+    """Return the count for option ``pk`` from one facet's counts, or 0."""
+    return (counts or {}).get(pk, 0)
@@ -0,0 +1,20 @@
+"""
+Template tags for rendering listing photos.
+"""
+from django import template
+
+from listings.renditions import PROCESSING_PLACEHOLDER_URL, photo_srcset as build_photo_srcset
+
+register = template.Library()
+
+
+@register.simple_tag
+def photo_srcset(photo_id):
+    """Return the ``srcset`` value for a photo's responsive renditions."""
+    return build_photo_srcset(photo_id)
+
+
+@register.simple_tag
+def processing_placeholder_url():
+    """Return the image shown for a photo whose image jobs haven't run yet."""
+    return PROCESSING_PLACEHOLDER_URL
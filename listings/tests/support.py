@@ -0,0 +1,39 @@
+"""
+Fixtures and helpers shared by the listings test modules.
+"""
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from listings.models import Listing
+
+User = get_user_model()
+
+
+def create_user(email='test@example.com', firstname='Test'):
+    """Create a regular user with the suite's usual password and names."""
+    return User.objects.create_user(email=email, password='testpass123', firstname=firstname, lastname='User')
+
+
+def create_listing(user, address, price=250000, **fields):
+    """Create a listing owned by ``user``; ``fields`` go to ``Listing.objects.create``."""
+    return Listing.objects.create(address=address, price=Decimal(price), created_by=user, **fields)
+
+
+def at(*args):
+    """Return an aware UTC datetime: ``at(2026, 3, 1, 9)``."""
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+def explain(query):
+    """Return the EXPLAIN QUERY PLAN detail lines for a queryset or SQL string."""
+    sql, params = query.query.sql_with_params() if hasattr(query, 'query') else (query, ())
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def listing_queries(ctx):
+    """Return the SQL of the captured queries that read the Listing table."""
+    return [q['sql'] for q in ctx.captured_queries if 'FROM "Listing"' in q['sql']]
@@ -0,0 +1,218 @@
+"""
+Test cases for the address autocomplete endpoint and its in-memory index.
+"""
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from listings import autocomplete, versioning
+from listings.models import Listing, Neighborhood, PropertyType
+from listings.tests.support import create_listing, create_user, listing_queries
+
+ADDRESSES = [
+    '12 Garden St',
+    '48 Maple Ave',
+    '7 Garden Ct',
+    '300 Elm St',
+    '1200 Gardenia Blvd',
+    '5 Café Rd',
+]
+
+
+def index_loads(ctx):
+    """The queries that (re)built the index, rather than checked suggestions."""
+    return [sql for sql in listing_queries(ctx) if 'LIMIT' in sql]
+
+
+class AddressIndexTests(SimpleTestCase):
+    """Matching, ranking and bookkeeping of AddressIndex."""
+
+    def setUp(self):
+        self.index = autocomplete.AddressIndex(max_listings=100)
+        for listing_id, address in enumerate(ADDRESSES, start=1):
+            self.index.add(listing_id, address)
+
+    def addresses(self, text, limit=8):
+        return [address for _, address in self.index.complete(text, limit)]
+
+    def test_word_prefixes(self):
+        self.assertEqual(self.addresses('gard'), ['7 Garden Ct', '12 Garden St', '1200 Gardenia Blvd'])
+        self.assertEqual(self.addresses('12 gar'), ['12 Garden St', '1200 Gardenia Blvd'])
+        self.assertEqual(self.addresses('garden st'), ['12 Garden St'])
+        self.assertEqual(self.addresses('elm'), ['300 Elm St'])
+        self.assertEqual(self.addresses('zzz'), [])
+        self.assertEqual(self.addresses('  '), [])
+
+    def test_whole_text_prefix_ranks_first(self):
+        self.assertEqual(self.addresses('12'), ['12 Garden St', '1200 Gardenia Blvd'])
+        self.assertEqual(self.addresses('gard', limit=1), ['7 Garden Ct'])
+
+    def test_typos(self):
+        self.assertEqual(self.addresses('grden ct'), ['7 Garden Ct'])
+        self.assertEqual(self.addresses('mapel'), ['48 Maple Ave'])
+        # Prefix matches come before corrections.
+        self.index.add(99, '9 Mapel Rd')
+        self.assertEqual(self.addresses('maple'), ['48 Maple Ave', '9 Mapel Rd'])
+        self.assertEqual(self.addresses('mapel'), ['9 Mapel Rd', '48 Maple Ave'])
+
+    def test_house_numbers_are_not_corrected(self):
+        self.assertEqual(self.addresses('301'), [])
+        self.assertEqual(self.index.corrections('3000'), [])
+
+    def test_accents_and_punctuation(self):
+        self.assertEqual(self.addresses('cafe'), ['5 Café Rd'])
+        self.assertEqual(self.addresses('5, CAFÉ'), ['5 Café Rd'])
+
+    def test_remove_prunes_everything(self):
+        self.index.replace(2, '48 Oak Ave')
+        self.assertEqual(self.addresses('maple'), [])
+        self.assertEqual(self.addresses('oak'), ['48 Oak Ave'])
+        for listing_id in range(1, len(ADDRESSES) + 1):
+            self.index.replace(listing_id, None)
+        self.index.remove(99)
+        stats = self.index.stats()
+        self.assertEqual(
+            {key: stats[key] for key in ('listings', 'words', 'trie_nodes', 'trigrams')},
+            {'listings': 0, 'words': 0, 'trie_nodes': 0, 'trigrams': 0},
+        )
+        self.assertEqual(self.index.trie, {})
+
+    def test_max_listings_evicts_oldest(self):
+        index = autocomplete.AddressIndex(max_listings=2)
+        index.add(1, '1 First St')
+        index.add(2, '2 Second St')
+        index.add(3, '3 Third St')
+        self.assertEqual(list(index.entries), [2, 3])
+        # Re-indexing a listing already held keeps its place and evicts nothing.
+        index.add(2, '2 Other St')
+        self.assertEqual(list(index.entries), [2, 3])
+        self.assertEqual([address for _, address in index.complete('first')], [])
+        index.add(4, '4 Fourth St')
+        self.assertEqual(list(index.entries), [3, 4])
+        stats = index.stats()
+        self.assertEqual((stats['listings'], stats['evicted']), (2, 2))
+        self.assertGreater(stats['approx_bytes'], 0)
+
+
+@override_settings(LISTING_AUTOCOMPLETE={'CACHE': 'default', 'MAX_LISTINGS': 1000, 'LIMIT': 3})
+class AutocompleteViewTests(TestCase):
+    """/listings/autocomplete/ and keeping the process index current."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.neighborhood = Neighborhood.objects.create(name='Benson')
+        cls.property_type = PropertyType.objects.create(name='House')
+        cls.listings = [cls.create_listing(address) for address in ADDRESSES]
+        cls.hidden = cls.create_listing('9 Garden Pl', is_visible=False)
+
+    @classmethod
+    def create_listing(cls, address, **fields):
+        return create_listing(
+            cls.user, address, neighborhood=cls.neighborhood, property_type=cls.property_type, **fields
+        )
+
+    def setUp(self):
+        cache.clear()
+        autocomplete.clear()
+        self.addCleanup(autocomplete.clear)
+
+    def suggest(self, **params):
+        response = self.client.get(reverse('listing_autocomplete'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def addresses(self, text):
+        return [result['address'] for result in self.suggest(q=text, limit=20)['results']]
+
+    def test_response(self):
+        listing = self.listings[0]
+        self.assertEqual(self.suggest(q=' 12 garden s'), {
+            'query': '12 garden s',
+            'results': [{
+                'id': listing.pk,
+                'address': '12 Garden St',
+                'url': reverse('listing_detail', args=[listing.pk]),
+            }],
+        })
+        self.assertEqual(self.suggest(q=''), {'query': '', 'results': []})
+
+    def test_limit(self):
+        self.assertEqual(len(self.suggest(q='g')['results']), 3)
+        self.assertEqual(len(self.suggest(q='g', limit=1)['results']), 1)
+        self.assertEqual(len(self.suggest(q='g', limit=0)['results']), 1)
+        self.assertEqual(len(self.suggest(q='g', limit='x')['results']), 3)
+
+    def test_hidden_listings_are_not_suggested(self):
+        self.assertNotIn('9 Garden Pl', self.addresses('garden'))
+
+    def test_warm_request_only_checks_suggestions(self):
+        self.suggest(q='elm')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.addresses('mapel'), ['48 Maple Ave'])
+            self.assertEqual(self.addresses('zzz'), [])
+        self.assertEqual(len(listing_queries(ctx)), 1)
+        self.assertEqual(index_loads(ctx), [])
+
+    def test_stale_index_never_suggests_hidden_listings(self):
+        """A change another process made, with no shared cache to say so."""
+        self.suggest(q='elm')
+        Listing.objects.filter(pk=self.listings[3].pk).update(is_visible=False)
+        Listing.objects.filter(pk=self.listings[1].pk).update(address='48 Maple Avenue')
+        self.assertEqual(self.addresses('elm'), [])
+        self.assertEqual(self.addresses('maple'), ['48 Maple Avenue'])
+
+    def test_rebuilds_after_max_age_in_the_background(self):
+        self.suggest(q='elm')
+        added = Listing.objects.bulk_create([Listing(
+            address='88 Juniper Ln', price=Decimal('250000'), created_by=self.user,
+            neighborhood=self.neighborhood, property_type=self.property_type,
+        )])
+        self.assertEqual(self.addresses('junip'), [])
+        later = versioning.time.monotonic() + 301
+        snapshot = autocomplete.snapshot
+        # Run the refresh in this thread, so it can see the test's rows.
+        refresh = mock.patch.object(snapshot, '_refresh_later', lambda: snapshot._rebuild(snapshot.counter.current()))
+        with mock.patch.object(versioning.time, 'monotonic', return_value=later), refresh:
+            # The request that finds the index too old is served from it.
+            self.assertEqual(self.addresses('junip'), [])
+        self.assertEqual(self.addresses('junip'), [added[0].address])
+
+    def test_saves_patch_the_index(self):
+        """A committed change reloads one row instead of rebuilding."""
+        self.suggest(q='elm')
+        with self.captureOnCommitCallbacks(execute=True):
+            added = self.create_listing('88 Juniper Ln')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hidden.is_visible = True
+            self.hidden.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listings[3].delete()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.addresses('junip'), ['88 Juniper Ln'])
+            self.assertIn('9 Garden Pl', self.addresses('garden'))
+            self.assertEqual(self.addresses('elm'), [])
+        self.assertEqual(index_loads(ctx), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added.is_visible = False
+            added.save()
+        self.assertEqual(self.addresses('junip'), [])
+
+    def test_other_process_change_rebuilds(self):
+        self.suggest(q='elm')
+        Listing.objects.filter(pk=self.listings[3].pk).update(address='300 Birch St')
+        autocomplete.bump_version()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.addresses('birch'), ['300 Birch St'])
+        self.assertEqual(len(index_loads(ctx)), 1)
+
+    def test_stats(self):
+        stats = autocomplete.stats()
+        self.assertEqual(stats['listings'], len(ADDRESSES))
+        self.assertEqual(stats['max_listings'], 1000)
+        self.assertEqual(stats['version'], autocomplete.current_version())
@@ -0,0 +1,163 @@
+"""
+Test cases for the content-addressed photo blob store.
+"""
+import hashlib
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from listings.blob_storage import FileSystemBlobStorage, get_blob_storage
+from listings.models import Photo, PropertyType, Neighborhood
+from listings.tests.support import create_listing, create_user
+
+JPEG_BYTES = b'\xff\xd8\xff\xe0' + b'jpeg-body' * 100
+THUMB_BYTES = b'\xff\xd8\xff\xe0' + b'thumb-body' * 10
+
+
+class BlobStorageTestMixin:
+    """Point the blob store at a temporary directory for each test."""
+
+    def setUp(self):
+        super().setUp()
+        self.blob_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.blob_dir, ignore_errors=True)
+        settings_override = override_settings(PHOTO_BLOB_STORAGE={
+            'BACKEND': 'listings.blob_storage.FileSystemBlobStorage',
+            'OPTIONS': {'location': self.blob_dir},
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_listing(self):
+        return create_listing(
+            create_user(),
+            '100 Blob St, Omaha, NE 68102',
+            neighborhood=Neighborhood.objects.create(name='Downtown'),
+            property_type=PropertyType.objects.create(name='House'),
+            is_visible=True,
+        )
+
+
+class FileSystemBlobStorageTests(BlobStorageTestMixin, TestCase):
+    """Test cases for the filesystem backend."""
+
+    def test_save_uses_sharded_sha256_path(self):
+        """Blobs are stored under <ab>/<cd>/<digest>."""
+        storage = get_blob_storage()
+        digest, size = storage.save(JPEG_BYTES)
+
+        self.assertEqual(digest, hashlib.sha256(JPEG_BYTES).hexdigest())
+        self.assertEqual(size, len(JPEG_BYTES))
+        path = storage.path(digest)
+        self.assertEqual(path.parent.name, digest[2:4])
+        self.assertEqual(path.parent.parent.name, digest[0:2])
+        self.assertEqual(storage.read(digest), JPEG_BYTES)
+
+    def test_save_is_idempotent(self):
+        """Saving identical bytes twice stores a single blob."""
+        storage = FileSystemBlobStorage(self.blob_dir)
+        first = storage.save(JPEG_BYTES)
+        second = storage.save(JPEG_BYTES)
+        self.assertEqual(first, second)
+
+    def test_rejects_invalid_digest(self):
+        """Digests are validated before touching the filesystem."""
+        storage = FileSystemBlobStorage(self.blob_dir)
+        with self.assertRaises(ValueError):
+            storage.path('../../etc/passwd')
+
+
+class PhotoBlobTests(BlobStorageTestMixin, TestCase):
+    """Test cases for Photo reads and writes through the blob store."""
+
+    def setUp(self):
+        super().setUp()
+        self.listing = self.create_listing()
+
+    def test_store_image_keeps_only_digest_in_row(self):
+        """store_image() records digest and size and leaves the column empty."""
+        photo = Photo(listing=self.listing, photo_display_order=1)
+        photo.store_image(JPEG_BYTES)
+        photo.save()
+
+        photo.refresh_from_db()
+        self.assertIsNone(photo.image_data)
+        self.assertEqual(photo.image_size, len(JPEG_BYTES))
+        self.assertEqual(photo.read_image(), JPEG_BYTES)
+
+    def test_legacy_row_is_still_readable(self):
+        """Rows that were never migrated fall back to the binary columns."""
+        photo = Photo.objects.create(
+            listing=self.listing, image_data=JPEG_BYTES, thumbnail_data=THUMB_BYTES
+        )
+        photo = Photo.objects.metadata().get(pk=photo.pk)
+        self.assertEqual(photo.read_image(), JPEG_BYTES)
+        self.assertEqual(photo.read_thumbnail(), THUMB_BYTES)
+
+    def test_listing_photo_serves_blob_and_legacy_rows(self):
+        """The photo views serve both migrated and legacy rows."""
+        migrated = Photo(listing=self.listing)
+        migrated.store_image(JPEG_BYTES)
+        migrated.store_thumbnail(THUMB_BYTES)
+        migrated.save()
+        legacy = Photo.objects.create(
+            listing=self.listing, image_data=JPEG_BYTES, thumbnail_data=THUMB_BYTES
+        )
+
+        for photo in (migrated, legacy):
+            response = self.client.get(reverse('listing_photo', args=[photo.pk]))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'image/jpeg')
+            # Blob rows are streamed, legacy rows are not.
+            self.assertEqual(response.getvalue(), JPEG_BYTES)
+
+            response = self.client.get(reverse('listing_photo_thumbnail', args=[photo.pk]))
+            self.assertEqual(response.content, THUMB_BYTES)
+
+
+class MigratePhotoBlobsCommandTests(BlobStorageTestMixin, TestCase):
+    """Test cases for the migrate_photo_blobs management command."""
+
+    def setUp(self):
+        super().setUp()
+        self.listing = self.create_listing()
+        self.photos = [
+            Photo.objects.create(
+                listing=self.listing,
+                image_data=JPEG_BYTES + bytes([i]),
+                thumbnail_data=THUMB_BYTES if i % 2 else None,
+                photo_display_order=i,
+            )
+            for i in range(5)
+        ]
+
+    def test_moves_bytes_in_batches(self):
+        """Every row gets a digest and the legacy columns are cleared."""
+        out = StringIO()
+        call_command('migrate_photo_blobs', batch_size=2, stdout=out)
+
+        self.assertIn('Moved 2 photos', out.getvalue())
+        self.assertIn('5 photos moved', out.getvalue())
+        for i, photo in enumerate(Photo.objects.order_by('photo_id')):
+            self.assertIsNone(photo.image_data)
+            self.assertIsNone(photo.thumbnail_data)
+            self.assertEqual(photo.read_image(), JPEG_BYTES + bytes([i]))
+            if i % 2:
+                self.assertEqual(photo.read_thumbnail(), THUMB_BYTES)
+            else:
+                self.assertIsNone(photo.thumbnail_digest)
+
+    def test_keep_db_bytes_then_clear(self):
+        """--keep-db-bytes records digests; a later run clears the columns."""
+        call_command('migrate_photo_blobs', keep_db_bytes=True, stdout=StringIO())
+        photo = Photo.objects.get(pk=self.photos[1].pk)
+        self.assertIsNotNone(photo.image_digest)
+        self.assertEqual(bytes(photo.image_data), JPEG_BYTES + bytes([1]))
+
+        call_command('migrate_photo_blobs', stdout=StringIO())
+        photo.refresh_from_db()
+        self.assertIsNone(photo.image_data)
+        self.assertEqual(photo.read_image(), JPEG_BYTES + bytes([1]))
@@ -0,0 +1,177 @@
+"""
+Test cases for the result counts shown in the listings filter dropdowns.
+"""
+import unittest
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from listings import facets, listing_index
+from listings.models import Listing, Neighborhood, Pricebucket, PropertyType
+from listings.tests.support import create_listing, create_user
+
+NO_FILTERS = {'neighborhood': None, 'type': None, 'price_range': None}
+
+
+class FacetDataMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.benson = Neighborhood.objects.create(name='Benson')
+        cls.dundee = Neighborhood.objects.create(name='Dundee')
+        cls.empty = Neighborhood.objects.create(name='Elkhorn')
+        cls.house = PropertyType.objects.create(name='House')
+        cls.condo = PropertyType.objects.create(name='Condo')
+        cls.low = Pricebucket.objects.create(range='$100,000 - $200,000')
+        cls.high = Pricebucket.objects.create(range='$200,000 - $300,000')
+        rows = [
+            # neighborhood, type, price, visible
+            (cls.benson, cls.house, '150000', True),
+            (cls.benson, cls.house, '250000', True),
+            (cls.benson, cls.condo, '150000', True),
+            (cls.dundee, cls.house, '250000', True),
+            (cls.dundee, cls.condo, '950000', True),   # no price bucket
+            (cls.dundee, cls.condo, '150000', False),
+        ]
+        for i, (neighborhood, property_type, price, visible) in enumerate(rows):
+            create_listing(
+                cls.user, f'{i} Facet St', price=price, description='Garden' if i % 2 else '',
+                neighborhood=neighborhood, property_type=property_type, is_visible=visible,
+            )
+
+    def setUp(self):
+        cache.clear()
+        listing_index.clear()
+        self.addCleanup(listing_index.clear)
+
+
+class FacetCountTests(FacetDataMixin, TestCase):
+    """compute() and get_counts()."""
+
+    def test_no_filters(self):
+        self.assertEqual(facets.compute('visible', NO_FILTERS), {
+            'neighborhood': {self.benson.pk: 3, self.dundee.pk: 2},
+            'type': {self.house.pk: 3, self.condo.pk: 2},
+            # The listing outside every bucket is in the total only.
+            'price_range': {self.low.pk: 2, self.high.pk: 2},
+            'total': 5,
+        })
+
+    def test_each_facet_ignores_its_own_selection(self):
+        counts = facets.compute('visible', {'neighborhood': self.benson.pk, 'type': self.house.pk})
+        self.assertEqual(counts, {
+            'neighborhood': {self.benson.pk: 2, self.dundee.pk: 1},
+            'type': {self.house.pk: 2, self.condo.pk: 1},
+            'price_range': {self.low.pk: 1, self.high.pk: 1},
+            'total': 2,
+        })
+        self.assertEqual(facets.compute('visible', {'neighborhood': self.empty.pk})['total'], 0)
+
+    def test_visibility_and_search(self):
+        self.assertEqual(facets.compute('hidden', NO_FILTERS)['neighborhood'], {self.dundee.pk: 1})
+        self.assertEqual(facets.compute('all', NO_FILTERS)['total'], 6)
+        counts = facets.compute('visible', {'neighborhood': self.dundee.pk}, search='garden')
+        self.assertEqual(counts['neighborhood'], {self.benson.pk: 1, self.dundee.pk: 1})
+        self.assertEqual(counts['type'], {self.house.pk: 1})
+        self.assertEqual(counts['total'], 1)
+
+    def check_index_matches_database(self, use_numpy):
+        filter_sets = [
+            NO_FILTERS,
+            {'neighborhood': self.benson.pk},
+            {'type': self.condo.pk, 'price_range': self.low.pk},
+            {'neighborhood': self.dundee.pk, 'type': self.house.pk, 'price_range': self.high.pk},
+            {'neighborhood': self.empty.pk},
+        ]
+        index = listing_index.ListingIndex.load(use_numpy=use_numpy)
+        for selected in filter_sets:
+            with self.subTest(**selected):
+                with override_settings(LISTING_INDEX={'ENABLED': True}):
+                    listing_index.snapshot.set(index, listing_index.current_version())
+                    indexed = facets.compute('visible', selected)
+                self.assertEqual(indexed, facets.compute('visible', selected))
+
+    def test_python_index_matches_database(self):
+        self.check_index_matches_database(use_numpy=False)
+
+    @unittest.skipIf(listing_index.numpy is None, 'NumPy is not installed')
+    def test_numpy_index_matches_database(self):
+        self.check_index_matches_database(use_numpy=True)
+
+    @override_settings(LISTING_FACETS={'ENABLED': True})
+    def test_cached_until_listings_change(self):
+        counts = facets.get_counts('visible', NO_FILTERS)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(facets.get_counts('visible', NO_FILTERS), counts)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        listing = Listing.objects.filter(is_visible=True).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.is_visible = False
+            listing.save()
+        self.assertEqual(facets.get_counts('visible', NO_FILTERS)['total'], 4)
+
+    def test_price_bucket_reassignment_invalidates(self):
+        version = facets.current_version()
+        Pricebucket.objects.create(range='$900,000 - $1,000,000')
+        self.assertNotEqual(facets.current_version(), version)
+
+    def test_keys_normalize_search_words(self):
+        self.assertEqual(
+            facets.cache_key('visible', NO_FILTERS, 'Garden  view'),
+            facets.cache_key('visible', NO_FILTERS, 'garden view'),
+        )
+        self.assertNotEqual(
+            facets.cache_key('visible', NO_FILTERS),
+            facets.cache_key('visible', {'neighborhood': self.benson.pk}),
+        )
+
+    @override_settings(LISTING_FACETS={'ENABLED': True, 'TIMEOUT': 0})
+    def test_timeout_zero_disables_cache(self):
+        facets.get_counts('visible', NO_FILTERS)
+        with CaptureQueriesContext(connection) as ctx:
+            facets.get_counts('visible', NO_FILTERS)
+        self.assertEqual(len(ctx.captured_queries), 3)
+
+    @override_settings(LISTING_FACETS={})
+    def test_cache_on_by_default(self):
+        self.assertTrue(facets.enabled())
+        facets.get_counts('visible', NO_FILTERS)
+        with CaptureQueriesContext(connection) as ctx:
+            facets.get_counts('visible', NO_FILTERS)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    @override_settings(LISTING_FACETS={'ENABLED': False})
+    def test_disabled_cache_runs_grouped_queries(self):
+        facets.get_counts('visible', NO_FILTERS)
+        with CaptureQueriesContext(connection) as ctx:
+            facets.get_counts('visible', NO_FILTERS)
+        self.assertEqual(len(ctx.captured_queries), 3)
+
+
+class FacetViewTests(FacetDataMixin, TestCase):
+    """Counts in the all_listings context, dropdowns and AJAX payload."""
+
+    def test_page_context_and_dropdowns(self):
+        response = self.client.get(reverse('listings'), {'type': self.condo.pk})
+        self.assertEqual(response.context['facets']['neighborhood'], {self.benson.pk: 1, self.dundee.pk: 1})
+        self.assertContains(response, 'data-label="Benson" >Benson (1)</option>', html=False)
+        self.assertContains(response, 'data-label="Elkhorn" disabled>Elkhorn (0)</option>', html=False)
+        self.assertContains(response, 'data-label="Condo" selected>Condo (2)</option>', html=False)
+
+    def test_ajax_payload(self):
+        response = self.client.get(reverse('listings'), {'neighborhood': self.dundee.pk, 'ajax': '1'})
+        self.assertEqual(response.json()['facets'], {
+            'neighborhood': {str(self.benson.pk): 3, str(self.dundee.pk): 2},
+            'type': {str(self.house.pk): 1, str(self.condo.pk): 1},
+            'price_range': {str(self.high.pk): 1},
+            'total': 2,
+        })
+
+    def test_staff_hidden_view_counts_hidden_listings(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('listings'), {'visibility': 'hidden'})
+        self.assertEqual(response.context['facets']['total'], 1)
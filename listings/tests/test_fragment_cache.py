@@ -0,0 +1,165 @@
+"""
+Test cases for the rendered-fragment cache behind AJAX listing pages.
+"""
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from listings import fragment_cache
+from listings.jobs import _mark_processed_if_finished
+from listings.models import Neighborhood, Photo, Pricebucket, PropertyType, SearchLog
+from listings.tests.support import create_listing, create_user, listing_queries
+
+ENABLED = {'ENABLED': True, 'CACHE': 'default', 'TIMEOUT': 300}
+
+
+@override_settings(LISTING_FRAGMENT_CACHE=ENABLED)
+class FragmentCacheTests(TestCase):
+    """Repeat AJAX pages are served from the cache until listings change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.neighborhood = Neighborhood.objects.create(name='Downtown')
+        cls.property_type = PropertyType.objects.create(name='House')
+        cls.listings = [
+            create_listing(
+                cls.user, f'{i} Fragment St', price=200000 + i * 1000,
+                neighborhood=cls.neighborhood, property_type=cls.property_type,
+            )
+            for i in range(15)
+        ]
+        cls.hidden = create_listing(
+            cls.user, '1 Hidden Ln', is_visible=False,
+            neighborhood=cls.neighborhood, property_type=cls.property_type,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def fetch(self, **params):
+        params['ajax'] = '1'
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(reverse('listings'), params).json()
+        return data, listing_queries(queries)
+
+    def test_repeat_request_is_served_from_cache(self):
+        first, first_queries = self.fetch(price='low-high', page=2)
+        second, second_queries = self.fetch(price='low-high', page=2)
+        self.assertTrue(first_queries)
+        self.assertEqual(second_queries, [])
+        self.assertEqual(second, first)
+        self.assertEqual(second['current_page'], 2)
+
+    def test_key_covers_filters_sort_and_page(self):
+        self.fetch(price='low-high', page=1)
+        for params in (
+            {'price': 'low-high', 'page': 2},
+            {'price': 'high-low', 'page': 1},
+            {'price': 'low-high', 'page': 1, 'neighborhood': self.neighborhood.pk},
+            {'price': 'low-high', 'page': 1, 'type': self.property_type.pk},
+        ):
+            with self.subTest(**params):
+                _, queries = self.fetch(**params)
+                self.assertTrue(queries)
+
+    def test_search_is_logged_on_hit(self):
+        self.fetch(neighborhood=self.neighborhood.pk)
+        self.fetch(neighborhood=self.neighborhood.pk)
+        self.assertEqual(SearchLog.objects.filter(neighborhood=self.neighborhood).count(), 2)
+
+    def test_staff_controls_never_reach_anonymous_entries(self):
+        self.client.force_login(self.user)
+        staff, _ = self.fetch(visibility='all')
+        self.assertIn('Edit Listing', staff['listings_html'])
+        self.assertIn('1 Hidden Ln', staff['listings_html'])
+
+        self.client.logout()
+        for params in ({}, {'visibility': 'all'}):
+            with self.subTest(**params):
+                anonymous, _ = self.fetch(**params)
+                self.assertNotIn('Edit Listing', anonymous['listings_html'])
+                self.assertNotIn('1 Hidden Ln', anonymous['listings_html'])
+
+        self.client.force_login(self.user)
+        staff_again, queries = self.fetch()
+        self.assertIn('Edit Listing', staff_again['listings_html'])
+        self.assertTrue(queries)
+
+    def test_listing_save_and_delete_invalidate(self):
+        self.fetch(price='high-low')
+        top = self.listings[-1]
+        top.address = '99 Renamed Ave'
+        top.save()
+        data, queries = self.fetch(price='high-low')
+        self.assertTrue(queries)
+        self.assertIn('99 Renamed Ave', data['listings_html'])
+
+        top.delete()
+        data, _ = self.fetch(price='high-low')
+        self.assertNotIn('99 Renamed Ave', data['listings_html'])
+
+    def test_photo_changes_invalidate(self):
+        self.fetch()
+        version = fragment_cache.current_version()
+        photo = Photo.objects.create(listing=self.listings[-1], is_processed=False)
+        self.assertNotEqual(fragment_cache.current_version(), version)
+
+        # Job completion flips is_processed with QuerySet.update().
+        version = fragment_cache.current_version()
+        _mark_processed_if_finished(photo.pk)
+        self.assertNotEqual(fragment_cache.current_version(), version)
+
+        version = fragment_cache.current_version()
+        photo.delete()
+        self.assertNotEqual(fragment_cache.current_version(), version)
+
+    def test_bucket_reassignment_invalidates(self):
+        version = fragment_cache.current_version()
+        Pricebucket.objects.create(range='$200,000 - $205,000')
+        self.assertNotEqual(fragment_cache.current_version(), version)
+
+    def test_unknown_sort_is_not_cached(self):
+        self.fetch(price='"><b>')
+        _, queries = self.fetch(price='"><b>')
+        self.assertTrue(queries)
+
+
+class FragmentCacheSettingsTests(TestCase):
+    """The cache is off unless enabled and uses the configured backend."""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_listing(
+            create_user(), '1 Settings St', price=100000,
+            neighborhood=Neighborhood.objects.create(name='Downtown'),
+            property_type=PropertyType.objects.create(name='House'),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('listings'), {'ajax': '1'})
+        return listing_queries(queries)
+
+    @override_settings(LISTING_FRAGMENT_CACHE={'ENABLED': False})
+    def test_disabled(self):
+        self.get()
+        self.assertTrue(self.get())
+
+    @override_settings(
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+            'fragments': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fragments'},
+        },
+        LISTING_FRAGMENT_CACHE={'ENABLED': True, 'CACHE': 'fragments'},
+    )
+    def test_configured_backend(self):
+        caches['fragments'].clear()
+        self.get()
+        self.assertFalse(self.get())
+        self.assertIsNotNone(caches['fragments'].get(fragment_cache.counter.key))
+        self.assertIsNone(caches['default'].get(fragment_cache.counter.key))
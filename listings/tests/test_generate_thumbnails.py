@@ -0,0 +1,109 @@
+"""
+Test cases for the generate_thumbnails management command.
+"""
+import json
+import os
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from listings.management.commands.generate_thumbnails import Command
+from listings.models import Photo
+from listings.tests.test_blob_storage import BlobStorageTestMixin
+from listings.tests.test_renditions import make_jpeg
+
+
+class GenerateThumbnailsCommandTests(BlobStorageTestMixin, TestCase):
+    """Test cases for chunked, parallel and resumable thumbnail generation."""
+
+    def setUp(self):
+        super().setUp()
+        self.listing = self.create_listing()
+        self.photos = []
+        for i in range(5):
+            photo = Photo(listing=self.listing, photo_display_order=i)
+            photo.store_image(make_jpeg(600, 400, color=(i * 40, 80, 120)))
+            photo.save()
+            self.photos.append(photo)
+        self.checkpoint = os.path.join(self.blob_dir, 'checkpoint.json')
+
+    def run_command(self, **options):
+        out = StringIO()
+        call_command('generate_thumbnails', stdout=out, **options)
+        return out.getvalue()
+
+    def test_generates_in_chunks_with_bulk_update(self):
+        """Each chunk is one keyset SELECT plus one bulk UPDATE."""
+        with CaptureQueriesContext(connection) as ctx:
+            output = self.run_command(chunk_size=2)
+
+        self.assertIn('5 thumbnails generated, 0 errors', output)
+        self.assertIn('Processed 4/5 photos', output)
+        self.assertIn('photos/s', output)
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 3)
+        for photo in Photo.objects.all():
+            self.assertIsNotNone(photo.thumbnail_digest)
+            self.assertIsNotNone(photo.updated_date)
+            self.assertTrue(photo.read_thumbnail().startswith(b'\xff\xd8\xff'))
+
+        self.assertIn('No photos need thumbnail generation.', self.run_command())
+
+    def test_worker_pool(self):
+        """--workers produces the same thumbnails as the serial path."""
+        output = self.run_command(workers=2, chunk_size=3)
+        self.assertIn('with 2 worker(s)', output)
+        self.assertIn('5 thumbnails generated', output)
+        serial = Photo.objects.order_by('photo_id').values_list('thumbnail_digest', flat=True)
+
+        Photo.objects.update(thumbnail_digest=None, thumbnail_size=None)
+        self.run_command(chunk_size=3)
+        self.assertEqual(
+            list(serial),
+            list(Photo.objects.order_by('photo_id').values_list('thumbnail_digest', flat=True)),
+        )
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        """A run stopped mid-way picks up after the last completed chunk."""
+        real_save = Command._save_thumbnails
+        calls = []
+
+        def save_then_stop(command, results):
+            if calls:
+                raise KeyboardInterrupt
+            calls.append(1)
+            return real_save(command, results)
+
+        with mock.patch.object(Command, '_save_thumbnails', save_then_stop):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_command(force=True, chunk_size=2, checkpoint=self.checkpoint)
+
+        with open(self.checkpoint) as fh:
+            self.assertEqual(json.load(fh), {'last_photo_id': self.photos[1].pk, 'force': True})
+
+        output = self.run_command(force=True, chunk_size=2, checkpoint=self.checkpoint)
+        self.assertIn(f'Resuming after Photo {self.photos[1].pk}', output)
+        self.assertIn('3 thumbnails generated', output)
+        self.assertFalse(os.path.exists(self.checkpoint))
+        self.assertFalse(Photo.objects.filter(thumbnail_digest__isnull=True).exists())
+
+    def test_checkpoint_from_other_mode_is_rejected(self):
+        """A --force checkpoint is not silently applied to a normal run."""
+        with open(self.checkpoint, 'w') as fh:
+            json.dump({'last_photo_id': self.photos[2].pk, 'force': True}, fh)
+        with self.assertRaises(CommandError):
+            self.run_command(checkpoint=self.checkpoint)
+
+    def test_unreadable_image_counts_as_error(self):
+        """Images Pillow cannot decode are reported and skipped."""
+        broken = Photo(listing=self.listing)
+        broken.store_image(b'not an image')
+        broken.save()
+
+        output = self.run_command()
+        self.assertIn('5 thumbnails generated, 1 errors', output)
+        self.assertIn(f'Failed to generate thumbnail for Photo {broken.pk}', output)
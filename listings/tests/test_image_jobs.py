@@ -0,0 +1,162 @@
+"""
+Test cases for the photo processing job queue and run_image_worker.
+"""
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from listings.forms import ListingForm
+from listings.jobs import claim_jobs, enqueue_photo_jobs, retry_jobs, run_job
+from listings.models import ImageJob, Photo, PhotoRendition
+from listings.tests.test_blob_storage import BlobStorageTestMixin
+
+
+def make_upload_jpeg(width=2400, height=1600):
+    """Return high-quality JPEG bytes larger than compress_image's 1920px box."""
+    image = Image.effect_noise((width, height), 40).convert('RGB')
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=98)
+    return output.getvalue()
+
+
+class ImageJobQueueTests(BlobStorageTestMixin, TestCase):
+    """Test cases for enqueueing, claiming, retrying and dead-lettering jobs."""
+
+    def setUp(self):
+        super().setUp()
+        self.listing = self.create_listing()
+        self.upload = make_upload_jpeg()
+        self.photo = Photo(listing=self.listing, photo_display_order=1, is_processed=False)
+        self.photo.store_image(self.upload)
+        self.photo.save()
+        enqueue_photo_jobs(self.photo)
+
+    def run_worker(self):
+        out = StringIO()
+        call_command('run_image_worker', once=True, stdout=out)
+        return out.getvalue()
+
+    def test_worker_compresses_and_thumbnails(self):
+        """Both jobs run and the photo is marked processed."""
+        output = self.run_worker()
+        self.assertIn('2 done, 0 retrying, 0 dead', output)
+
+        photo = Photo.objects.get(pk=self.photo.pk)
+        self.assertTrue(photo.is_processed)
+        self.assertLess(photo.image_size, len(self.upload))
+        self.assertEqual(Image.open(BytesIO(photo.read_image())).size, (1920, 1280))
+        self.assertIsNotNone(photo.thumbnail_digest)
+        self.assertFalse(ImageJob.objects.exclude(status=ImageJob.STATUS_DONE).exists())
+
+    @override_settings(PHOTO_RENDITION_WIDTHS=[320, 640], PHOTO_NEGOTIATED_FORMATS=['WEBP'])
+    def test_compress_job_stores_renditions_and_variants(self):
+        """Widths and WebP variants come from the job, so requests only read them."""
+        self.run_worker()
+        stored = set(PhotoRendition.objects.filter(photo=self.photo).values_list('kind', 'width', 'format'))
+        self.assertEqual(stored, {
+            ('width', 320, 'JPEG'), ('width', 640, 'JPEG'),
+            ('width', 320, 'WEBP'), ('width', 640, 'WEBP'),
+            ('image', 0, 'WEBP'), ('thumbnail', 0, 'WEBP'),
+        })
+        rendition = PhotoRendition.objects.get(photo=self.photo, width=320, format='WEBP')
+        self.assertEqual(Image.open(BytesIO(rendition.read())).size, (320, 213))
+
+        with mock.patch('listings.renditions.generate_rendition') as generate:
+            response = self.client.get(
+                reverse('listing_photo_rendition', args=[self.photo.pk, 640]), HTTP_ACCEPT='image/webp'
+            )
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        generate.assert_not_called()
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        """A second worker skips jobs under an unexpired lease, then reclaims them."""
+        first = claim_jobs('worker-a')
+        self.assertEqual(len(first), 2)
+        self.assertEqual(claim_jobs('worker-b'), [])
+
+        ImageJob.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = claim_jobs('worker-b')
+        self.assertEqual([job.locked_by for job in reclaimed], ['worker-b', 'worker-b'])
+        self.assertEqual([job.attempts for job in reclaimed], [2, 2])
+
+    def test_failures_retry_with_backoff_then_dead_letter(self):
+        """A failing job is retried with backoff and ends up dead."""
+        with mock.patch('listings.jobs.generate_derivatives', return_value={}), \
+                mock.patch('listings.jobs.generate_thumbnail', return_value=None):
+            for attempt in range(1, 4):
+                ImageJob.objects.filter(status=ImageJob.STATUS_PENDING).update(run_after=timezone.now())
+                for claimed in claim_jobs('worker'):
+                    if claimed.kind == ImageJob.KIND_COMPRESS:
+                        self.assertEqual(run_job(claimed), ImageJob.STATUS_DONE)
+                    else:
+                        job = claimed
+                self.assertEqual(job.attempts, attempt)
+                status = run_job(job)
+                if attempt < 3:
+                    self.assertEqual(status, ImageJob.STATUS_PENDING)
+                    self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=29 * 2 ** (attempt - 1)))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.STATUS_DEAD)
+        self.assertIn('Could not generate a thumbnail', job.last_error)
+
+        # The photo is no longer waiting once every job is done or dead.
+        self.assertTrue(Photo.objects.get(pk=self.photo.pk).is_processed)
+
+        retry_jobs(ImageJob.objects.filter(status=ImageJob.STATUS_DEAD))
+        self.assertFalse(Photo.objects.get(pk=self.photo.pk).is_processed)
+        self.assertIn('1 done', self.run_worker())
+        self.assertTrue(Photo.objects.get(pk=self.photo.pk).is_processed)
+
+    def test_placeholder_until_processed(self):
+        """The grid and thumbnail endpoint show a placeholder while jobs are queued."""
+        self.listing.is_visible = True
+        self.listing.save()
+        thumbnail_url = reverse('listing_photo_thumbnail', args=[self.photo.pk])
+
+        response = self.client.get(reverse('listings'))
+        self.assertContains(response, 'Processing+Photo')
+        self.assertNotContains(response, thumbnail_url)
+
+        response = self.client.get(thumbnail_url)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('Processing+Photo', response['Location'])
+        self.assertIsNone(Photo.objects.get(pk=self.photo.pk).thumbnail_digest)
+
+        self.run_worker()
+        response = self.client.get(reverse('listings'))
+        self.assertContains(response, thumbnail_url)
+        self.assertEqual(self.client.get(thumbnail_url).status_code, 200)
+
+
+class UploadEnqueuesJobsTests(BlobStorageTestMixin, TestCase):
+    """save_photos stores the raw upload and queues the processing."""
+
+    def test_save_photos_enqueues_without_processing(self):
+        """Uploads are stored raw with two queued jobs each and no inline work."""
+        listing = self.create_listing()
+        upload = make_upload_jpeg(400, 300)
+        files = [SimpleUploadedFile(f'p{i}.jpg', upload, content_type='image/jpeg') for i in range(4)]
+        form = ListingForm()
+        form.cleaned_data = {'photos': files}
+
+        with mock.patch('listings.jobs.generate_thumbnail') as generate:
+            form.save_photos(listing)
+        generate.assert_not_called()
+
+        photos = listing.photos.all()
+        self.assertEqual(len(photos), 4)
+        for photo in photos:
+            self.assertFalse(photo.is_processed)
+            self.assertIsNone(photo.thumbnail_digest)
+            self.assertEqual(photo.read_image(), upload)
+        self.assertEqual(
+            sorted(ImageJob.objects.values_list('kind', flat=True)),
+            ['compress'] * 4 + ['thumbnail'] * 4,
+        )
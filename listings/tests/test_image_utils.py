@@ -0,0 +1,74 @@
+"""
+Test cases for the draft-mode decode and resize pipeline in image_utils.
+"""
+from io import BytesIO
+
+from PIL import Image, ImageChops, ImageStat
+from django.test import SimpleTestCase, override_settings
+from listings import image_utils
+from listings.image_utils import (
+    IMAGE_PROFILES, compress_image, generate_rendition, generate_thumbnail, get_profile,
+)
+
+
+def make_photo(width, height, orientation=None):
+    """Return JPEG bytes for a smooth gradient photo, optionally EXIF-rotated."""
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=90, exif=exif)
+    return output.getvalue()
+
+
+def size_of(data):
+    return Image.open(BytesIO(data)).size
+
+
+class ImagePipelineTests(SimpleTestCase):
+    """Test cases for draft decoding, orientation and profiles."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.large = make_photo(4000, 3000)
+
+    def test_draft_decodes_at_reduced_scale(self):
+        """A 4000x3000 JPEG is decoded at 1/4 scale for a 300px thumbnail."""
+        image = image_utils._open(self.large)
+        decoded = image_utils._decode(image, (300, 225), get_profile('balanced'))
+        self.assertEqual(decoded.size, (1000, 750))
+
+        decoded = image_utils._decode(image_utils._open(self.large), (300, 225), get_profile('speed'))
+        self.assertEqual(decoded.size, (500, 375))
+
+    def test_output_sizes(self):
+        """Outputs keep the aspect ratio and exact target sizes."""
+        self.assertEqual(size_of(generate_thumbnail(self.large)), (300, 225))
+        self.assertEqual(size_of(generate_rendition(self.large, 640)), (640, 480))
+        self.assertEqual(size_of(compress_image(self.large)), (1920, 1440))
+
+    def test_draft_output_matches_full_decode(self):
+        """The fast path is visually indistinguishable from a full decode."""
+        reference = Image.open(BytesIO(self.large)).convert('RGB')
+        reference = reference.resize((300, 225), Image.Resampling.LANCZOS)
+        thumbnail = Image.open(BytesIO(generate_thumbnail(self.large, quality=95)))
+        diff = ImageStat.Stat(ImageChops.difference(reference, thumbnail.convert('RGB')))
+        self.assertLess(max(diff.mean), 2.0)
+
+    def test_exif_orientation_is_applied(self):
+        """Photos rotated through EXIF come out upright."""
+        rotated = make_photo(800, 400, orientation=6)
+        self.assertEqual(size_of(generate_thumbnail(rotated)), (150, 300))
+        self.assertEqual(size_of(generate_rendition(rotated, 160)), (160, 320))
+        self.assertEqual(size_of(compress_image(rotated, max_size=(300, 300))), (150, 300))
+        self.assertEqual(size_of(compress_image(rotated)), (400, 800))
+
+    def test_profile_from_settings(self):
+        """The default profile comes from PHOTO_IMAGE_PROFILE."""
+        with override_settings(PHOTO_IMAGE_PROFILE='speed'):
+            self.assertIs(get_profile(), IMAGE_PROFILES['speed'])
+        self.assertIs(get_profile('quality'), IMAGE_PROFILES['quality'])
+        for name in IMAGE_PROFILES:
+            self.assertEqual(size_of(generate_thumbnail(self.large, profile=name)), (300, 225))
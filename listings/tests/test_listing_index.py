@@ -0,0 +1,195 @@
+"""
+Test cases for the in-memory columnar listing index.
+"""
+import unittest
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from listings import listing_index, pagination
+from listings.models import Listing, Neighborhood, Pricebucket, PropertyType, Status
+from listings.tests.support import create_listing, create_user, listing_queries
+
+ENABLED = {'ENABLED': True, 'CACHE': 'default'}
+
+
+class ListingIndexDataMixin:
+    """Listings with repeated prices and dates, so tie-breaks matter."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.neighborhoods = [Neighborhood.objects.create(name=name) for name in ('Benson', 'Downtown')]
+        cls.property_types = [PropertyType.objects.create(name=name) for name in ('Condo', 'House')]
+        cls.status = Status.objects.create(name='Active')
+        cls.bucket = Pricebucket.objects.create(range='$200,000 - $250,000')
+        for i in range(30):
+            create_listing(
+                cls.user,
+                f'{i} Index St',
+                price=190000 + (i % 7) * 10000,
+                neighborhood=cls.neighborhoods[i % 2],
+                property_type=cls.property_types[i % 3 % 2],
+                bedrooms=None if i % 5 == 0 else i % 4 + 1,
+                status_id=cls.status if i % 2 else None,
+                is_visible=i % 6 != 0,
+            )
+
+    def setUp(self):
+        cache.clear()
+        listing_index.clear()
+        self.addCleanup(listing_index.clear)
+
+    def expected_ids(self, price_sort='', **filters):
+        queryset = Listing.objects.filter(is_visible=True, **filters)
+        return list(queryset.order_by(*pagination.ordering(price_sort)).values_list('pk', flat=True))
+
+
+class ListingIndexQueryTests(ListingIndexDataMixin, TestCase):
+    """Index queries return the same ids, in the same order, as the ORM."""
+
+    def check_backend(self, use_numpy):
+        index = listing_index.ListingIndex.load(use_numpy=use_numpy)
+        self.assertEqual(len(index), Listing.objects.filter(is_visible=True).count())
+        cases = [
+            ({}, {}),
+            ({'neighborhood': self.neighborhoods[0].pk}, {'neighborhood': self.neighborhoods[0]}),
+            ({'property_type': self.property_types[1].pk}, {'property_type': self.property_types[1]}),
+            ({'pricebucket': self.bucket.pk}, {'pricebucket': self.bucket}),
+            ({'bedrooms': 2}, {'bedrooms': 2}),
+            ({'status': self.status.pk}, {'status_id': self.status}),
+            (
+                {'neighborhood': self.neighborhoods[1].pk, 'property_type': self.property_types[0].pk},
+                {'neighborhood': self.neighborhoods[1], 'property_type': self.property_types[0]},
+            ),
+            ({'neighborhood': 999}, {'neighborhood_id': 999}),
+        ]
+        for price_sort in pagination.SORTS:
+            for index_filters, orm_filters in cases:
+                with self.subTest(price_sort=price_sort, **index_filters):
+                    self.assertEqual(
+                        [int(pk) for pk in index.query(price_sort, **index_filters)],
+                        self.expected_ids(price_sort, **orm_filters),
+                    )
+
+    def test_python_backend(self):
+        self.check_backend(use_numpy=False)
+
+    @unittest.skipIf(listing_index.numpy is None, 'NumPy is not installed')
+    def test_numpy_backend(self):
+        self.check_backend(use_numpy=True)
+
+    def test_replace(self):
+        index = listing_index.ListingIndex.load(use_numpy=False)
+        listing = Listing.objects.filter(is_visible=True).first()
+        listing.price = Decimal('1.00')
+        listing.save()
+        row = next(listing_index._visible_rows(pk=listing.pk))
+
+        updated = index.replace(listing.pk, row)
+        self.assertEqual(int(updated.query('low-high')[0]), listing.pk)
+        self.assertEqual(len(updated), len(index))
+        removed = updated.replace(listing.pk, None)
+        self.assertNotIn(listing.pk, list(removed.query()))
+        self.assertEqual(len(removed), len(index) - 1)
+        # The original snapshot is unchanged.
+        self.assertEqual([int(pk) for pk in index.query()][:3], self.expected_ids()[:3])
+
+    def test_unknown_filter(self):
+        with self.assertRaises(TypeError):
+            listing_index.ListingIndex.load().query(address='1 Index St')
+
+
+@override_settings(LISTING_INDEX=ENABLED)
+class ListingIndexViewTests(ListingIndexDataMixin, TestCase):
+    """all_listings pages through the index and hydrates one page by id."""
+
+    def page_ids(self, **params):
+        response = self.client.get(reverse('listings'), params)
+        page = response.context['listings']
+        return [listing.pk for listing in page], page.paginator.count
+
+    def test_pages_match_database(self):
+        params_list = [
+            {},
+            {'price': 'low-high', 'page': 2},
+            {'price': 'high-low', 'neighborhood': self.neighborhoods[0].pk},
+            {'type': self.property_types[0].pk, 'price_range': self.bucket.pk},
+        ]
+        for params in params_list:
+            with self.subTest(**params):
+                indexed = self.page_ids(**params)
+                with self.settings(LISTING_INDEX={'ENABLED': False}):
+                    self.assertEqual(indexed, self.page_ids(**params))
+
+    def test_warm_request_has_no_count(self):
+        self.client.get(reverse('listings'))
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('listings'), {'price': 'low-high'})
+        queries = listing_queries(ctx)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT', queries[0])
+
+    def test_staff_hidden_view_uses_database(self):
+        self.client.force_login(self.user)
+        _, count = self.page_ids(visibility='hidden')
+        self.assertEqual(count, Listing.objects.filter(is_visible=False).count())
+
+    def test_saves_patch_the_index(self):
+        """A committed save or delete updates the index without a full reload."""
+        index = listing_index.get_index()
+        listing = Listing.objects.filter(is_visible=True).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.is_visible = False
+            listing.save()
+        with CaptureQueriesContext(connection) as ctx:
+            patched = listing_index.get_index()
+        self.assertEqual(listing_queries(ctx), [])
+        self.assertEqual(len(patched), len(index) - 1)
+
+        other = Listing.objects.filter(is_visible=True).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertNotIn(other.pk, list(listing_index.get_index().query()))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.is_visible = True
+            listing.save()
+        self.assertEqual([int(pk) for pk in listing_index.get_index().query()], self.expected_ids())
+
+    def test_other_process_change_rebuilds(self):
+        listing_index.get_index()
+        Listing.objects.filter(pk=self.expected_ids()[0]).update(is_visible=False)
+        listing_index.bump_version()
+        with CaptureQueriesContext(connection) as ctx:
+            rebuilt = listing_index.get_index()
+        self.assertEqual(len(listing_queries(ctx)), 1)
+        self.assertEqual([int(pk) for pk in rebuilt.query()], self.expected_ids())
+
+    def test_save_without_index_only_bumps(self):
+        listing_index.clear()
+        version = listing_index.current_version()
+        listing = Listing.objects.filter(is_visible=True).first()
+        with CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                listing.save()
+        self.assertEqual(listing_queries(ctx), [])
+        self.assertNotEqual(listing_index.current_version(), version)
+
+    @override_settings(LISTING_INDEX={'ENABLED': False, 'CACHE': 'default'})
+    def test_disabled_index_ignores_saves(self):
+        version = listing_index.current_version()
+        listing = Listing.objects.filter(is_visible=True).first()
+        with CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                listing.save()
+        self.assertEqual(listing_queries(ctx), [])
+        self.assertEqual(listing_index.current_version(), version)
+
+    def test_bucket_reassignment_invalidates(self):
+        version = listing_index.current_version()
+        Pricebucket.objects.create(range='$180,000 - $200,000')
+        self.assertNotEqual(listing_index.current_version(), version)
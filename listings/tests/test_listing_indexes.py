@@ -0,0 +1,128 @@
+"""
+Test cases for the Listing indexes, using SQLite's EXPLAIN QUERY PLAN.
+
+Every filter and sort combination the all_listings page can produce is
+requested through the view, the Listing queries it runs are captured, and
+their plans are checked for a full scan of the Listing table.
+"""
+import itertools
+import re
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from listings.models import Listing, Neighborhood, Pricebucket, PropertyType, assign_pricebuckets
+from listings.tests.support import create_user, explain
+
+# "SCAN Listing" without "USING ... INDEX" reads every row.
+FULL_SCAN = re.compile(r'^SCAN "?Listing"?(?: AS \w+)?$')
+LISTING_QUERY = re.compile(r'\bFROM "Listing"')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite-specific')
+class ListingQueryPlanTests(TestCase):
+    """No all_listings filter combination may fall back to a full table scan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.neighborhood = Neighborhood.objects.create(name='Downtown')
+        cls.property_type = PropertyType.objects.create(name='House')
+        cls.bounded = Pricebucket.objects.create(range='$200,000 - $300,000')
+        cls.open_ended = Pricebucket.objects.create(range='$500,000+')
+        Listing.objects.bulk_create([
+            Listing(
+                address=f'{i} Index St', price=100000 + i * 5000, created_by=cls.user,
+                neighborhood=cls.neighborhood, property_type=cls.property_type,
+                is_visible=i % 5 != 0,
+            )
+            for i in range(50)
+        ])
+        # bulk_create skips Listing.save(), which derives pricebucket.
+        assign_pricebuckets()
+
+    def plans_for(self, params):
+        """Request all_listings with ``params`` and return {sql: plan} for Listing queries."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('listings'), params)
+        self.assertEqual(response.status_code, 200)
+        return {
+            query['sql']: explain(query['sql'])
+            for query in ctx.captured_queries
+            if LISTING_QUERY.search(query['sql']) and query['sql'].startswith('SELECT')
+        }
+
+    def assertNoFullScan(self, params):
+        plans = self.plans_for(params)
+        self.assertTrue(plans, f'No Listing query captured for {params}')
+        for sql, plan in plans.items():
+            with self.subTest(params=params, plan=plan):
+                self.assertFalse(
+                    any(FULL_SCAN.match(line) for line in plan),
+                    f'Full scan of Listing for {params}:\n{sql}\n{plan}',
+                )
+
+    def combinations(self, visibilities):
+        filters = {
+            'neighborhood': ['', self.neighborhood.pk],
+            'type': ['', self.property_type.pk],
+            'price_range': ['', self.bounded.pk, self.open_ended.pk],
+            'price': ['', 'low-high', 'high-low'],
+            'visibility': visibilities,
+        }
+        for values in itertools.product(*filters.values()):
+            yield {name: value for name, value in zip(filters, values) if value != ''}
+
+    def test_anonymous_filter_combinations(self):
+        for params in self.combinations(['']):
+            self.assertNoFullScan(params)
+
+    def test_staff_filter_combinations(self):
+        self.client.force_login(self.user)
+        for params in self.combinations(['', 'hidden', 'all']):
+            self.assertNoFullScan(params)
+
+    def test_cursor_pages(self):
+        """Keyset pages seek on the same indexes."""
+        for price_sort in ('', 'low-high', 'high-low'):
+            params = {'ajax': '1', 'cursor': '', 'price': price_sort, 'neighborhood': self.neighborhood.pk}
+            cursor = self.client.get(reverse('listings'), params).json()['next_cursor']
+            self.assertNoFullScan({**params, 'cursor': cursor})
+            del params['neighborhood']
+            self.assertNoFullScan({**params, 'cursor': cursor})
+
+    def test_public_queries_use_visible_indexes(self):
+        """Anonymous filters seek on the partial is_visible composites."""
+        cases = [
+            ({}, 'listing_visible_listed'),
+            ({'price': 'low-high'}, 'listing_visible_price'),
+            ({'neighborhood': self.neighborhood.pk, 'price': 'high-low'}, 'listing_vis_nbhd_price'),
+            ({'type': self.property_type.pk, 'price': 'low-high'}, 'listing_vis_type_price'),
+            ({'price_range': self.bounded.pk, 'price': 'low-high'}, 'listing_vis_bucket_price'),
+            ({'price_range': self.bounded.pk}, 'listing_vis_bucket_listed'),
+        ]
+        for params, index in cases:
+            plans = self.plans_for(params)
+            with self.subTest(params=params):
+                self.assertTrue(
+                    any(index in line for plan in plans.values() for line in plan),
+                    f'{index} not used for {params}: {list(plans.values())}',
+                )
+
+    def test_hidden_view_uses_partial_index(self):
+        """
+        listing_listed can't seek to NOT Is_Visible, so without the partial
+        index the hidden view's COUNT and default-sort page scan the table.
+        """
+        self.client.force_login(self.user)
+        plans = self.plans_for({'visibility': 'hidden'})
+        for marker in ('SELECT COUNT(*)', 'SELECT "Listing"."Listing_ID"'):
+            with self.subTest(query=marker):
+                plan = next(plan for sql, plan in plans.items() if sql.startswith(marker))
+                self.assertIn('SCAN Listing USING INDEX listing_hidden_listed', plan)
+
+    def test_featured_listing_uses_partial_index(self):
+        plan = explain(Listing.objects.filter(is_visible=True, is_featured=True)[:1])
+        self.assertTrue(any('listing_featured' in line for line in plan), plan)
@@ -0,0 +1,209 @@
+"""
+Test cases for FTS5 keyword search over listing addresses and descriptions.
+"""
+import re
+from io import StringIO
+
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from listings import fragment_cache, listing_index, listing_search
+from listings.models import Listing, Neighborhood, Pricebucket, PropertyType
+from listings.tests.support import User, create_listing, create_user
+
+
+class ListingSearchDataMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.benson = Neighborhood.objects.create(name='Benson')
+        cls.dundee = Neighborhood.objects.create(name='Dundee')
+        cls.house = PropertyType.objects.create(name='House')
+        cls.condo = PropertyType.objects.create(name='Condo')
+        cls.bucket = Pricebucket.objects.create(range='$200,000 - $300,000')
+        cls.garden_street = cls.create_listing(
+            '12 Garden St', 'Brick bungalow near the park.', price='250000'
+        )
+        cls.garden_view = cls.create_listing(
+            '48 Maple Ave', 'Sunny kitchen with a garden view and a large garage.', price='210000'
+        )
+        cls.dundee_condo = cls.create_listing(
+            '7 Garden Ct', 'Top floor condo.', price='450000',
+            neighborhood=cls.dundee, property_type=cls.condo,
+        )
+        cls.unrelated = cls.create_listing('300 Elm St', 'Finished basement.', price='260000')
+
+    @classmethod
+    def create_listing(cls, address, description, price, neighborhood=None, property_type=None, **fields):
+        return create_listing(
+            cls.user,
+            address,
+            price=price,
+            description=description,
+            neighborhood=neighborhood or cls.benson,
+            property_type=property_type or cls.house,
+            **fields,
+        )
+
+    def search_ids(self, text, queryset=None):
+        results = listing_search.search(Listing.objects.all() if queryset is None else queryset, text)
+        return set(results.values_list('pk', flat=True))
+
+
+class ListingSearchTests(ListingSearchDataMixin, TestCase):
+    """Matching, ranking and index maintenance."""
+
+    def test_matches_address_and_description(self):
+        self.assertEqual(
+            self.search_ids('garden'),
+            {self.garden_street.pk, self.garden_view.pk, self.dundee_condo.pk},
+        )
+        self.assertEqual(self.search_ids('basement'), {self.unrelated.pk})
+
+    def test_every_word_must_match_as_a_prefix(self):
+        self.assertEqual(self.search_ids('gard kitch'), {self.garden_view.pk})
+        self.assertEqual(self.search_ids('garden basement'), set())
+
+    def test_operators_are_treated_as_words(self):
+        self.assertEqual(listing_search.match_expression('Garden OR "elm" NEAR(x*'), '"garden"* "or"* "elm"* "near"* "x"*')
+        self.assertEqual(self.search_ids('garden OR elm'), set())
+        self.assertEqual(self.search_ids('"garden'), self.search_ids('garden'))
+
+    def test_no_words_matches_everything(self):
+        self.assertEqual(self.search_ids(' -- '), set(Listing.objects.values_list('pk', flat=True)))
+
+    def test_address_hits_rank_first(self):
+        ranked = listing_search.search(Listing.objects.all(), 'garden').order_by('search_rank')
+        self.assertEqual(ranked.last(), self.garden_view)
+
+    def test_triggers_follow_saves_updates_and_deletes(self):
+        self.garden_street.address = '12 Oak St'
+        self.garden_street.save()
+        self.assertNotIn(self.garden_street.pk, self.search_ids('garden'))
+        self.assertEqual(self.search_ids('oak'), {self.garden_street.pk})
+
+        Listing.objects.filter(pk=self.unrelated.pk).update(description='Walk-in pantry.')
+        self.assertEqual(self.search_ids('pantry'), {self.unrelated.pk})
+        self.assertEqual(self.search_ids('basement'), set())
+
+        self.garden_view.delete()
+        self.assertEqual(self.search_ids('kitchen'), set())
+
+        added = self.create_listing('1 Pantry Ln', '', price='200000')
+        self.assertEqual(self.search_ids('pantry'), {self.unrelated.pk, added.pk})
+
+    def test_install_restores_missing_trigger(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER "Listing_FTS_update"')
+        Listing.objects.filter(pk=self.unrelated.pk).update(description='Walk-in pantry.')
+        self.assertEqual(self.search_ids('pantry'), set())
+
+        self.assertEqual(listing_search.install(), ['Listing_FTS_update'])
+        self.assertEqual(self.search_ids('pantry'), {self.unrelated.pk})
+        self.assertEqual(listing_search.install(), [])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'INSERT INTO "{listing_search.TABLE}"("{listing_search.TABLE}") VALUES (\'delete-all\')')
+        self.assertEqual(self.search_ids('garden'), set())
+
+        out = StringIO()
+        call_command('rebuild_listing_search', stdout=out)
+        self.assertIn('4 listings', out.getvalue())
+        self.assertEqual(len(self.search_ids('garden')), 3)
+
+
+class ListingSearchViewTests(ListingSearchDataMixin, TestCase):
+    """The q parameter on all_listings and the admin changelist search."""
+
+    def setUp(self):
+        cache.clear()
+
+    def page_ids(self, **params):
+        response = self.client.get(reverse('listings'), params)
+        self.assertEqual(response.context['selected_query'], params.get('q', ''))
+        return [listing.pk for listing in response.context['listings']]
+
+    def test_search_combines_with_filters(self):
+        self.assertEqual(
+            self.page_ids(q='garden', neighborhood=self.benson.pk),
+            [self.garden_street.pk, self.garden_view.pk],
+        )
+        self.assertEqual(self.page_ids(q='garden', type=self.condo.pk), [self.dundee_condo.pk])
+        self.assertEqual(
+            self.page_ids(q='garden', price_range=self.bucket.pk),
+            [self.garden_street.pk, self.garden_view.pk],
+        )
+
+    def test_price_sort_overrides_relevance(self):
+        self.assertEqual(
+            self.page_ids(q='garden', price='low-high'),
+            [self.garden_view.pk, self.garden_street.pk, self.dundee_condo.pk],
+        )
+
+    def test_relevance_pages_have_no_cursor(self):
+        for i in range(12):
+            self.create_listing(f'{i} Garden Way', '', price='200000')
+        response = self.client.get(reverse('listings'), {'q': 'garden', 'ajax': '1'})
+        payload = response.json()
+        self.assertIsNone(payload['next_cursor'])
+        self.assertIn('q=garden', payload['pagination_html'])
+
+        response = self.client.get(reverse('listings'), {'q': 'garden', 'price': 'high-low', 'ajax': '1'})
+        self.assertIsNotNone(response.json()['next_cursor'])
+
+    def test_relevance_rejects_cursor(self):
+        """A cursor, even an empty one, can't page through relevance order."""
+        for cursor in ('', 'anything'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('listings'), {'q': 'garden', 'ajax': '1', 'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            reverse('listings'), {'q': 'garden', 'price': 'high-low', 'ajax': '1', 'cursor': ''}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_without_fts_table_falls_back(self):
+        """Before migration 0023 has run, searches use icontains and date order."""
+        self.addCleanup(listing_search._available.clear)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE "{listing_search.TABLE}"')
+        listing_search._available.clear()
+        self.assertFalse(listing_search.available())
+        response = self.client.get(reverse('listings'), {'q': 'garden', 'ajax': '1', 'cursor': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(re.findall(r'class="listing-card"', response.json()['listings_html'])), 3)
+
+    def test_fragment_cache_key_includes_words(self):
+        key = fragment_cache.cache_key(False, '', '', '', '', '', 1)
+        self.assertNotEqual(fragment_cache.cache_key(False, '', '', '', '', '', 1, 'garden'), key)
+        self.assertEqual(fragment_cache.cache_key(False, '', '', '', '', '', 1, ' -- '), key)
+        self.assertEqual(
+            fragment_cache.cache_key(False, '', '', '', '', '', 1, 'Garden  view'),
+            fragment_cache.cache_key(False, '', '', '', '', '', 1, 'garden view'),
+        )
+
+    @override_settings(LISTING_INDEX={'ENABLED': True, 'CACHE': 'default'})
+    def test_search_bypasses_listing_index(self):
+        listing_index.clear()
+        self.addCleanup(listing_index.clear)
+        self.assertEqual(self.page_ids(q='basement'), [self.unrelated.pk])
+
+    def test_admin_search_uses_index(self):
+        admin_user = User.objects.create_superuser(email='admin@example.com', password='x')
+        request = RequestFactory().get('/admin/listings/listing/', {'q': 'gard'})
+        request.user = admin_user
+        model_admin = site._registry[Listing]
+        with CaptureQueriesContext(connection) as ctx:
+            results, may_have_duplicates = model_admin.get_search_results(
+                request, Listing.objects.all(), 'gard kitch'
+            )
+            ids = [listing.pk for listing in results]
+        self.assertEqual(ids, [self.garden_view.pk])
+        self.assertFalse(may_have_duplicates)
+        self.assertTrue(any(listing_search.TABLE in query['sql'] for query in ctx.captured_queries))
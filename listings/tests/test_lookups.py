@@ -0,0 +1,129 @@
+"""
+Test cases for the in-process filter lookup caches.
+"""
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from listings import lookups, versioning
+from listings.models import Neighborhood, Pricebucket, PropertyType, SearchLog
+from listings.tests.support import create_listing, create_user
+
+LOOKUP_TABLES = ('FROM "Neighborhood"', 'FROM "Property_Type"', 'FROM "Pricebucket"')
+
+
+class LookupCacheTests(TestCase):
+    """Filter options and SearchLog lookups are served from memory."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.neighborhood = Neighborhood.objects.create(name='Downtown')
+        Neighborhood.objects.create(name='Benson')
+        cls.property_type = PropertyType.objects.create(name='House')
+        cls.pricebucket = Pricebucket.objects.create(range='$200,000 - $300,000')
+        create_listing(create_user(), '1 Lookup St', neighborhood=cls.neighborhood, property_type=cls.property_type)
+
+    def setUp(self):
+        cache.clear()
+        lookups.clear()
+        self.params = {
+            'neighborhood': self.neighborhood.pk,
+            'type': self.property_type.pk,
+            'price_range': self.pricebucket.pk,
+        }
+
+    def lookup_queries(self, ctx):
+        return [q['sql'] for q in ctx.captured_queries if any(t in q['sql'] for t in LOOKUP_TABLES)]
+
+    def test_query_count_drops_when_warm(self):
+        """
+        A warm request runs no lookup queries and still logs the search.
+
+        Before the cache, every filtered request ran six: three for the
+        dropdowns and three to resolve the SearchLog foreign keys.
+        """
+        with CaptureQueriesContext(connection) as cold:
+            self.client.get(reverse('listings'), self.params)
+        with CaptureQueriesContext(connection) as warm:
+            response = self.client.get(reverse('listings'), self.params)
+
+        self.assertEqual(len(self.lookup_queries(cold)), 3)
+        self.assertEqual(self.lookup_queries(warm), [])
+        # The three facet count queries are also cached after the cold request.
+        self.assertEqual(len(warm), len(cold) - 6)
+        # SearchLog write (savepoint, insert, rollup upsert, release), COUNT
+        # and the Listing page, which joins in the primary photo.
+        self.assertEqual(len(warm), 6)
+        self.assertEqual([n.name for n in response.context['neighborhoods']], ['Benson', 'Downtown'])
+
+        log = SearchLog.objects.latest('search_log_id')
+        self.assertEqual(
+            (log.neighborhood, log.property_type, log.pricebucket),
+            (self.neighborhood, self.property_type, self.pricebucket),
+        )
+
+    def test_save_and_delete_invalidate(self):
+        """Saving or deleting a row is visible on the next read."""
+        self.assertEqual(len(lookups.neighborhoods.all()), 2)
+        created = Neighborhood.objects.create(name='Aksarben')
+        self.assertEqual([n.name for n in lookups.neighborhoods.all()], ['Aksarben', 'Benson', 'Downtown'])
+
+        created.name = 'Zorinsky'
+        created.save()
+        self.assertEqual(lookups.neighborhoods.get(created.pk).name, 'Zorinsky')
+
+        created.delete()
+        self.assertIsNone(lookups.neighborhoods.get(created.pk))
+        self.assertEqual(len(lookups.neighborhoods.all()), 2)
+
+    def test_other_process_invalidation(self):
+        """A version bump from another process forces a reload."""
+        lookups.pricebuckets.all()
+        Pricebucket.objects.filter(pk=self.pricebucket.pk).update(range='$500,000+')
+        self.assertEqual(lookups.pricebuckets.get(self.pricebucket.pk).range, '$200,000 - $300,000')
+
+        # What invalidate() in another process leaves behind in the shared cache.
+        lookups.pricebuckets.counter.bump()
+        self.assertEqual(lookups.pricebuckets.get(self.pricebucket.pk).range, '$500,000+')
+
+    def test_reloads_after_max_age(self):
+        """Without a shared cache, a change elsewhere shows up after MAX_AGE."""
+        lookups.pricebuckets.all()
+        Pricebucket.objects.filter(pk=self.pricebucket.pk).update(range='$500,000+')
+        later = versioning.time.monotonic() + 61
+        with mock.patch.object(versioning.time, 'monotonic', return_value=later):
+            self.assertEqual(lookups.pricebuckets.all()[0].range, '$500,000+')
+
+    def test_get_miss_reloads(self):
+        """A row another process added is found, and reloads the dropdown rows."""
+        lookups.neighborhoods.all()
+        # bulk_create() sends no signals, like a save in another process.
+        Neighborhood.objects.bulk_create([Neighborhood(name='Aksarben')])
+        added = Neighborhood.objects.get(name='Aksarben')
+        self.assertEqual(len(lookups.neighborhoods.all()), 2)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(lookups.neighborhoods.get(added.pk), added)
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual([n.name for n in lookups.neighborhoods.all()], ['Aksarben', 'Benson', 'Downtown'])
+
+        # Ids that don't exist cost one query and no reload.
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertIsNone(lookups.neighborhoods.get(added.pk + 100))
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_new_row_is_logged_by_stale_process(self):
+        """The SearchLog row names a neighborhood this process hadn't loaded."""
+        lookups.neighborhoods.all()
+        # bulk_create() sends no signals, like a save in another process.
+        Neighborhood.objects.bulk_create([Neighborhood(name='Aksarben')])
+        added = Neighborhood.objects.get(name='Aksarben')
+        self.client.get(reverse('listings'), {'neighborhood': added.pk})
+        self.assertEqual(SearchLog.objects.latest('search_log_id').neighborhood, added)
+
+    def test_get_ignores_bad_keys(self):
+        self.assertIsNone(lookups.property_types.get('abc'))
+        self.assertIsNone(lookups.property_types.get(None))
+        self.assertEqual(lookups.property_types.get(str(self.property_type.pk)), self.property_type)
@@ -0,0 +1,117 @@
+"""
+Test cases for keyset (cursor) pagination of the listings grid.
+"""
+import re
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from listings import pagination
+from listings.models import Listing, Neighborhood, PropertyType, SearchLog
+from listings.tests.support import create_listing, create_user, listing_queries
+
+
+class KeysetPaginationTests(TestCase):
+    """AJAX clients page through listings with opaque cursors."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = create_user()
+        cls.neighborhood = Neighborhood.objects.create(name='Downtown')
+        property_type = PropertyType.objects.create(name='House')
+        now = timezone.now()
+        # Prices repeat so ties must be broken by listing_id.
+        cls.listings = [
+            create_listing(
+                user, f'{i} Cursor St', price=100000 + (i % 7) * 10000,
+                neighborhood=cls.neighborhood, property_type=property_type,
+            )
+            for i in range(30)
+        ]
+        for i, listing in enumerate(cls.listings):
+            Listing.objects.filter(pk=listing.pk).update(listed_date=now - timedelta(hours=i % 4))
+
+    def fetch(self, **params):
+        params['ajax'] = '1'
+        response = self.client.get(reverse('listings'), params)
+        return response, response.json()
+
+    def walk(self, **params):
+        """Follow next_cursor from the first page and return listing ids in order."""
+        seen = []
+        cursor = ''
+        while cursor is not None:
+            response, data = self.fetch(cursor=cursor, **params)
+            self.assertEqual(response.status_code, 200)
+            seen += [int(pk) for pk in self.card_ids(data['listings_html'])]
+            cursor = data['next_cursor']
+        return seen
+
+    def card_ids(self, html):
+        return list(dict.fromkeys(re.findall(r'/listings/(\d+)/"', html)))
+
+    def test_cursor_walk_matches_full_ordering(self):
+        """Every sort visits every listing exactly once, in query order."""
+        for price_sort in ('', 'low-high', 'high-low'):
+            with self.subTest(price=price_sort):
+                expected = list(
+                    Listing.objects.order_by(*pagination.ordering(price_sort)).values_list('pk', flat=True)
+                )
+                self.assertEqual(self.walk(price=price_sort), expected)
+
+    def test_cursor_pages_skip_count_and_offset(self):
+        """A cursor page runs neither COUNT(*) nor OFFSET."""
+        _, first = self.fetch(cursor='')
+        with CaptureQueriesContext(connection) as ctx:
+            _, data = self.fetch(cursor=first['next_cursor'])
+        listing_sql = listing_queries(ctx)
+        self.assertTrue(listing_sql)
+        for sql in listing_sql:
+            self.assertNotIn('COUNT(', sql)
+            self.assertNotIn('OFFSET', sql)
+        self.assertEqual(data['pagination_html'], '')
+
+    def test_offset_ajax_response_offers_next_cursor(self):
+        """The page-number AJAX response hands over a cursor for the next page."""
+        _, data = self.fetch(page='1')
+        self.assertIn('pagination_html', data)
+        self.assertEqual(data['total_count'], 30)
+        _, second = self.fetch(cursor=data['next_cursor'])
+        _, page_two = self.fetch(page='2')
+        self.assertEqual(self.card_ids(second['listings_html']), self.card_ids(page_two['listings_html']))
+
+    def test_invalid_cursor(self):
+        """Tampered cursors and cursors from another sort are rejected."""
+        _, data = self.fetch(cursor='')
+        response, _ = self.fetch(cursor=data['next_cursor'] + 'x')
+        self.assertEqual(response.status_code, 400)
+        response, _ = self.fetch(cursor=data['next_cursor'], price='low-high')
+        self.assertEqual(response.status_code, 400)
+
+    def test_scrolling_is_not_logged_as_a_search(self):
+        """Only the first page of a filtered search writes a SearchLog row."""
+        _, data = self.fetch(cursor='', neighborhood=self.neighborhood.pk)
+        self.fetch(cursor=data['next_cursor'], neighborhood=self.neighborhood.pk)
+        self.assertEqual(SearchLog.objects.count(), 1)
+
+    def test_non_ajax_keeps_page_links(self):
+        """Regular page loads still render pagination_fragment.html."""
+        response = self.client.get(reverse('listings'), {'page': '2', 'cursor': 'ignored'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Page 2 of 3')
+
+    def test_page_renders_load_more_cursor(self):
+        """The full page hands "Load more" the cursor after its last card."""
+        response = self.client.get(reverse('listings'), {'page': '2'})
+        cursor = response.context['next_cursor']
+        self.assertContains(response, f'data-cursor="{cursor}"')
+        _, more = self.fetch(cursor=cursor)
+        _, page_three = self.fetch(page='3')
+        self.assertEqual(self.card_ids(more['listings_html']), self.card_ids(page_three['listings_html']))
+
+        response = self.client.get(reverse('listings'), {'page': '3'})
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertContains(response, 'id="load-more-container" class="load-more-container" hidden')
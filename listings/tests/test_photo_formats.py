@@ -0,0 +1,132 @@
+"""
+Test cases for WebP / AVIF negotiation on the photo endpoints.
+"""
+from io import BytesIO
+from unittest import mock
+
+from PIL import Image
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from listings.image_utils import format_supported
+from listings.models import Photo, PhotoRendition
+from listings.renditions import preferred_format
+from listings.tests.test_blob_storage import BlobStorageTestMixin
+from listings.tests.test_renditions import make_jpeg
+
+BROWSER_ACCEPT = 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8'
+
+
+@override_settings(PHOTO_NEGOTIATED_FORMATS=['AVIF', 'WEBP'])
+class PreferredFormatTests(SimpleTestCase):
+    """Test cases for Accept header parsing."""
+
+    def test_explicit_types_only(self):
+        """Wildcards alone never select WebP or AVIF."""
+        self.assertIsNone(preferred_format(''))
+        self.assertIsNone(preferred_format('*/*'))
+        self.assertIsNone(preferred_format('image/*,*/*;q=0.8'))
+        self.assertEqual(preferred_format('image/webp,*/*'), 'WEBP')
+
+    def test_quality_and_configured_order(self):
+        """Higher q wins; ties go to the configured order."""
+        expected = 'AVIF' if format_supported('AVIF') else 'WEBP'
+        self.assertEqual(preferred_format(BROWSER_ACCEPT), expected)
+        self.assertEqual(preferred_format('image/avif;q=0.5,image/webp'), 'WEBP')
+        self.assertIsNone(preferred_format('image/webp;q=0'))
+
+    @override_settings(PHOTO_NEGOTIATED_FORMATS=['WEBP'])
+    def test_only_configured_formats(self):
+        """Formats missing from the setting are never offered."""
+        self.assertEqual(preferred_format(BROWSER_ACCEPT), 'WEBP')
+        self.assertIsNone(preferred_format('image/avif'))
+
+    def test_unsupported_encoder_is_skipped(self):
+        """Formats the Pillow build cannot encode are never offered."""
+        with mock.patch('listings.renditions.format_supported', side_effect=lambda f: f != 'AVIF'):
+            self.assertEqual(preferred_format(BROWSER_ACCEPT), 'WEBP')
+
+
+@override_settings(PHOTO_NEGOTIATED_FORMATS=['WEBP'], PHOTO_RENDITION_WIDTHS=[160, 320])
+class PhotoFormatNegotiationTests(BlobStorageTestMixin, TestCase):
+    """Test cases for serving negotiated variants."""
+
+    def setUp(self):
+        super().setUp()
+        self.listing = self.create_listing()
+        self.photo = Photo(listing=self.listing, photo_display_order=1)
+        self.photo.store_image(make_jpeg(800, 400))
+        self.photo.save()
+        self.photo_url = reverse('listing_photo', args=[self.photo.pk])
+        self.thumbnail_url = reverse('listing_photo_thumbnail', args=[self.photo.pk])
+        self.rendition_url = reverse('listing_photo_rendition', args=[self.photo.pk, 320])
+
+    def test_webp_variants_served_with_vary(self):
+        """Every photo endpoint answers image/webp and varies on Accept."""
+        for url, size in ((self.photo_url, (800, 400)),
+                          (self.thumbnail_url, (300, 150)),
+                          (self.rendition_url, (320, 160))):
+            response = self.client.get(url, HTTP_ACCEPT=BROWSER_ACCEPT)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'image/webp')
+            self.assertIn('Accept', response['Vary'])
+            image = Image.open(BytesIO(response.getvalue()))
+            self.assertEqual((image.format, image.size), ('WEBP', size))
+
+        kinds = set(PhotoRendition.objects.filter(format='WEBP').values_list('kind', flat=True))
+        self.assertEqual(kinds, {'image', 'thumbnail', 'width'})
+
+    def test_jpeg_for_clients_without_webp(self):
+        """Clients that do not name WebP keep getting the JPEG original."""
+        response = self.client.get(self.photo_url, HTTP_ACCEPT='image/*,*/*;q=0.8')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('Accept', response['Vary'])
+        self.assertEqual(response['ETag'], f'"{self.photo.image_digest}"')
+        self.assertFalse(PhotoRendition.objects.filter(format='WEBP').exists())
+
+    def test_variant_is_cached_and_revalidates(self):
+        """The variant is generated once, stored, and has its own ETag."""
+        first = self.client.get(self.photo_url, HTTP_ACCEPT='image/webp')
+        variant = PhotoRendition.objects.get(kind='image', format='WEBP')
+        self.assertEqual(first['ETag'], f'"{variant.digest}"')
+        self.assertNotEqual(first['ETag'], f'"{self.photo.image_digest}"')
+        body = first.getvalue()
+        self.assertEqual(variant.read(), body)
+
+        with mock.patch('listings.renditions.convert_image') as convert:
+            second = self.client.get(self.photo_url, HTTP_ACCEPT='image/webp')
+            revalidated = self.client.get(
+                self.photo_url, HTTP_ACCEPT='image/webp', HTTP_IF_NONE_MATCH=first['ETag']
+            )
+        convert.assert_not_called()
+        self.assertEqual(second.getvalue(), body)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertIn('Accept', revalidated['Vary'])
+
+    def test_variant_supports_ranges(self):
+        """Range requests work against the negotiated variant."""
+        full = self.client.get(self.photo_url, HTTP_ACCEPT='image/webp')
+        response = self.client.get(self.photo_url, HTTP_ACCEPT='image/webp', HTTP_RANGE='bytes=0-11')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, full.getvalue()[:12])
+        self.assertEqual(response['Content-Type'], 'image/webp')
+
+    def test_larger_variant_keeps_original(self):
+        """A re-encode that is not smaller than the original is not served."""
+        with mock.patch('listings.renditions.convert_image', return_value=b'RIFF' + b'\0' * 10**6):
+            response = self.client.get(self.photo_url, HTTP_ACCEPT='image/webp')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['ETag'], f'"{self.photo.image_digest}"')
+
+    def test_thumbnail_failure_falls_back_to_jpeg(self):
+        """If the variant cannot be generated the original thumbnail is served."""
+        with mock.patch('listings.renditions.generate_thumbnail', return_value=None):
+            response = self.client.get(self.thumbnail_url, HTTP_ACCEPT='image/webp')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertFalse(PhotoRendition.objects.exists())
+
+    def test_missing_photo_returns_404(self):
+        """Negotiation does not mask unknown photo ids."""
+        response = self.client.get(reverse('listing_photo', args=[99999]), HTTP_ACCEPT='image/webp')
+        self.assertEqual(response.status_code, 404)
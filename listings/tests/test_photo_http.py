@@ -0,0 +1,144 @@
+"""
+Test cases for conditional and Range requests on the photo endpoints.
+"""
+import hashlib
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+from listings.models import Photo
+from listings.tests.test_blob_storage import BlobStorageTestMixin, JPEG_BYTES, THUMB_BYTES
+
+
+class PhotoConditionalRequestTests(BlobStorageTestMixin, TestCase):
+    """ETag / Last-Modified revalidation for photos and thumbnails."""
+
+    def setUp(self):
+        super().setUp()
+        self.listing = self.create_listing()
+        self.photo = Photo(listing=self.listing, photo_display_order=1)
+        self.photo.store_image(JPEG_BYTES)
+        self.photo.store_thumbnail(THUMB_BYTES)
+        self.photo.save()
+        self.photo_url = reverse('listing_photo', args=[self.photo.pk])
+        self.thumbnail_url = reverse('listing_photo_thumbnail', args=[self.photo.pk])
+
+    def test_strong_etag_is_content_digest(self):
+        """The ETag is the quoted SHA-256 of the served bytes."""
+        response = self.client.get(self.photo_url)
+        self.assertEqual(response['ETag'], f'"{hashlib.sha256(JPEG_BYTES).hexdigest()}"')
+        self.assertEqual(response['Last-Modified'], http_date(self.photo.updated_date.timestamp()))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        response = self.client.get(self.thumbnail_url)
+        self.assertEqual(response['ETag'], f'"{hashlib.sha256(THUMB_BYTES).hexdigest()}"')
+
+    def test_if_none_match_returns_304_without_reading_blob(self):
+        """Revalidation is answered from the row, never the blob column or store."""
+        etag = self.client.get(self.photo_url)['ETag']
+
+        for url, digest in ((self.photo_url, self.photo.image_digest),
+                            (self.thumbnail_url, self.photo.thumbnail_digest)):
+            with CaptureQueriesContext(connection) as ctx, \
+                    mock.patch('listings.blob_storage.FileSystemBlobStorage.open') as blob_open:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"{digest}"')
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+            self.assertEqual(response['ETag'], f'"{digest}"')
+            blob_open.assert_not_called()
+            self.assertEqual(len(ctx.captured_queries), 1)
+            self.assertNotIn('Image_Data', ctx.captured_queries[0]['sql'])
+            self.assertNotIn('Thumbnail_Data', ctx.captured_queries[0]['sql'])
+
+        response = self.client.get(self.photo_url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_if_modified_since_returns_304(self):
+        """If-Modified-Since at or after Last-Modified yields 304."""
+        last_modified = self.client.get(self.photo_url)['Last-Modified']
+        response = self.client.get(self.photo_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        earlier = http_date(self.photo.updated_date.timestamp() - 3600)
+        response = self.client.get(self.photo_url, HTTP_IF_MODIFIED_SINCE=earlier)
+        self.assertEqual(response.status_code, 200)
+
+    def test_legacy_row_gets_same_validators(self):
+        """Unmigrated rows advertise the digest their bytes will get."""
+        legacy = Photo.objects.create(listing=self.listing, image_data=JPEG_BYTES)
+        url = reverse('listing_photo', args=[legacy.pk])
+        response = self.client.get(url)
+        self.assertEqual(response['ETag'], f'"{self.photo.image_digest}"')
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class PhotoRangeRequestTests(BlobStorageTestMixin, TestCase):
+    """Byte-range support for the full-size photo endpoint."""
+
+    def setUp(self):
+        super().setUp()
+        self.listing = self.create_listing()
+        self.photo = Photo(listing=self.listing)
+        self.photo.store_image(JPEG_BYTES)
+        self.photo.save()
+        self.legacy = Photo.objects.create(listing=self.listing, image_data=JPEG_BYTES)
+        self.size = len(JPEG_BYTES)
+
+    def urls(self):
+        return [reverse('listing_photo', args=[p.pk]) for p in (self.photo, self.legacy)]
+
+    def test_bounded_range(self):
+        """bytes=10-19 returns exactly those ten bytes."""
+        for url in self.urls():
+            response = self.client.get(url, HTTP_RANGE='bytes=10-19')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response.content, JPEG_BYTES[10:20])
+            self.assertEqual(response['Content-Range'], f'bytes 10-19/{self.size}')
+            self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+    def test_open_and_suffix_ranges(self):
+        """bytes=N- and bytes=-N are both supported."""
+        for url in self.urls():
+            response = self.client.get(url, HTTP_RANGE=f'bytes={self.size - 5}-')
+            self.assertEqual(response.content, JPEG_BYTES[-5:])
+
+            response = self.client.get(url, HTTP_RANGE='bytes=-7')
+            self.assertEqual(response.content, JPEG_BYTES[-7:])
+            self.assertEqual(
+                response['Content-Range'], f'bytes {self.size - 7}-{self.size - 1}/{self.size}'
+            )
+
+    def test_unsatisfiable_range(self):
+        """A range starting past the end returns 416."""
+        for url in self.urls():
+            response = self.client.get(url, HTTP_RANGE=f'bytes={self.size}-')
+            self.assertEqual(response.status_code, 416)
+            self.assertEqual(response['Content-Range'], f'bytes */{self.size}')
+
+    def test_full_blob_response_is_streamed(self):
+        """A full-size photo from the blob store is streamed, not read into memory."""
+        response = self.client.get(reverse('listing_photo', args=[self.photo.pk]))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Length'], str(self.size))
+        self.assertNotIn('Content-Disposition', response)
+        self.assertEqual(response.getvalue(), JPEG_BYTES)
+
+    def test_multiple_or_stale_ranges_return_full_body(self):
+        """Multi-range and mismatched If-Range requests get a normal 200."""
+        url = self.urls()[0]
+        response = self.client.get(url, HTTP_RANGE='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.getvalue(), JPEG_BYTES)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, 200)
+
+        etag = f'"{self.photo.image_digest}"'
+        response = self.client.get(url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
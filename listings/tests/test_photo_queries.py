@@ -0,0 +1,114 @@
+"""
+Test cases for photo loading on pages that only need photo URLs.
+"""
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from listings.models import Photo, PropertyType, Neighborhood, Status
+from listings.tests.support import create_listing, create_user
+
+BLOB_COLUMNS = ('Image_Data', 'Thumbnail_Data')
+
+
+class PhotoMetadataQueryTests(TestCase):
+    """Pages that render <img> URLs must never select the photo blobs."""
+
+    def setUp(self):
+        """Set up a visible listing with a few photos carrying image bytes."""
+        self.user = create_user()
+        self.property_type = PropertyType.objects.create(name='House')
+        self.neighborhood = Neighborhood.objects.create(name='Downtown')
+        self.status_active = Status.objects.create(name='Active')
+
+        self.listing = create_listing(
+            self.user,
+            '100 Blob St, Omaha, NE 68102',
+            neighborhood=self.neighborhood,
+            property_type=self.property_type,
+            status='Available',
+            status_id=self.status_active,
+            is_visible=True,
+            is_featured=True,
+        )
+        self.photos = [
+            Photo.objects.create(
+                listing=self.listing,
+                image_data=b'\xff\xd8\xff' + b'x' * 1024,
+                thumbnail_data=b'\xff\xd8\xff' + b'y' * 256,
+                photo_display_order=order,
+            )
+            for order in (2, 1, 3)
+        ]
+
+    def assertNoBlobColumns(self, queries):
+        """Queries may test the blob columns for NULL but never select them."""
+        for query in queries:
+            selected = query['sql'].split(' FROM ')[0]
+            for column in BLOB_COLUMNS:
+                self.assertNotIn(column, selected)
+
+    def test_metadata_queryset_defers_blobs(self):
+        """metadata() should only load the URL/ordering columns."""
+        photo = Photo.objects.metadata().get(pk=self.photos[0].pk)
+        self.assertEqual(
+            photo.get_deferred_fields(),
+            {'image_data', 'thumbnail_data'}
+        )
+
+    def test_all_listings_does_not_select_blobs(self):
+        """The listings grid renders thumbnail URLs without the blobs."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('listings'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNoBlobColumns(ctx.captured_queries)
+
+        first_photo = self.photos[1]
+        self.assertContains(
+            response,
+            reverse('listing_photo_thumbnail', args=[first_photo.photo_id])
+        )
+
+    def test_all_listings_ajax_does_not_select_blobs(self):
+        """The AJAX grid fragment renders without the blobs."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('listings'), {'ajax': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNoBlobColumns(ctx.captured_queries)
+
+    def test_listing_detail_does_not_select_blobs(self):
+        """The detail gallery keeps display order without loading the blobs."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                reverse('listing_detail', args=[self.listing.pk])
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertNoBlobColumns(ctx.captured_queries)
+
+        gallery_orders = [p.photo_display_order for p in response.context['gallery_photos']]
+        self.assertEqual(gallery_orders, [1, 2, 3])
+
+    def test_home_does_not_select_blobs(self):
+        """The featured listing photo is resolved without the blobs."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNoBlobColumns(ctx.captured_queries)
+        self.assertEqual(response.context['featured_photo'], self.photos[1])
+
+    def test_home_falls_back_to_placeholder_without_image(self):
+        """A featured photo with no stored bytes shows the placeholder."""
+        first_photo = self.photos[1]
+        Photo.objects.filter(pk=first_photo.pk).update(image_data=None)
+        response = self.client.get(reverse('home'))
+        self.assertNotContains(response, reverse('listing_photo', args=[first_photo.photo_id]))
+        self.assertContains(response, 'placehold.co/800x600?text=Featured+Home')
+
+    def test_home_checks_blob_store_photos_by_digest(self):
+        """A photo in the blob store is shown without another query."""
+        first_photo = self.photos[1]
+        Photo.objects.filter(pk=first_photo.pk).update(image_data=None, image_digest='ab' * 32, image_size=1024)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, reverse('listing_photo', args=[first_photo.photo_id]))
+        self.assertFalse([q for q in ctx.captured_queries if 'EXISTS' in q['sql'] or 'SELECT 1' in q['sql']])
@@ -0,0 +1,171 @@
+"""
+Test cases for Pricebucket numeric bounds and the derived Listing.pricebucket.
+"""
+import importlib
+from decimal import Decimal
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from listings.forms import ListingStatusPriceForm
+from listings.models import Listing, Neighborhood, Pricebucket, PropertyType, SearchLog, Status, parse_price_range
+from listings.tests.support import create_listing, create_user
+
+
+class PricebucketBoundsTests(TestCase):
+    """Bounds are parsed once on save and listings follow their price."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.neighborhood = Neighborhood.objects.create(name='Downtown')
+        cls.property_type = PropertyType.objects.create(name='House')
+        cls.status = Status.objects.create(name='Active')
+        cls.low = Pricebucket.objects.create(range='$100,000 - $200,000')
+        cls.high = Pricebucket.objects.create(range='$200,000+')
+
+    def create_listing(self, price):
+        return create_listing(
+            self.user, f'{price} Bucket St', price=price,
+            neighborhood=self.neighborhood, property_type=self.property_type, status_id=self.status,
+        )
+
+    def test_bounds_parsed_on_save(self):
+        self.assertEqual((self.low.min_price, self.low.max_price), (Decimal('100000'), Decimal('200000')))
+        self.assertEqual((self.high.min_price, self.high.max_price), (Decimal('200000'), None))
+        self.assertEqual(parse_price_range('Call for price'), (None, None))
+
+    def test_listing_save_assigns_bucket(self):
+        """Bounds are half-open: a price on the boundary goes to the upper bucket."""
+        self.assertEqual(self.create_listing(150000).pricebucket, self.low)
+        self.assertEqual(self.create_listing(200000).pricebucket, self.high)
+        self.assertIsNone(self.create_listing(50000).pricebucket)
+
+    def test_status_price_form_moves_listing(self):
+        """Changing the price in the management form updates the bucket."""
+        listing = self.create_listing(150000)
+        form = ListingStatusPriceForm({'price': '250000', 'status_id': self.status.pk}, instance=listing)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(Listing.objects.get(pk=listing.pk).pricebucket, self.high)
+
+        listing.price = Decimal('120000')
+        listing.save(update_fields=['price'])
+        self.assertEqual(Listing.objects.get(pk=listing.pk).pricebucket, self.low)
+
+    def test_editing_buckets_reassigns_listings(self):
+        listing = self.create_listing(150000)
+        self.low.range = '$100,000 - $140,000'
+        self.low.save()
+        self.assertIsNone(Listing.objects.get(pk=listing.pk).pricebucket)
+
+        middle = Pricebucket.objects.create(range='$140,000 - $200,000')
+        self.assertEqual(Listing.objects.get(pk=listing.pk).pricebucket, middle)
+
+        middle.delete()
+        self.assertIsNone(Listing.objects.get(pk=listing.pk).pricebucket)
+
+    def test_saves_without_price_skip_bucket_lookup(self):
+        listing = self.create_listing(150000)
+        listing.address = '1 Renamed St'
+        with CaptureQueriesContext(connection) as ctx:
+            listing.save(update_fields=['address'])
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "Pricebucket"' in q['sql']])
+
+    def test_renaming_bucket_keeps_listings(self):
+        self.create_listing(150000)
+        self.low.range = '100000 - 200000'
+        with CaptureQueriesContext(connection) as ctx:
+            self.low.save()
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "Listing"')])
+
+        Pricebucket.objects.create(range='Call for price').delete()
+        self.assertEqual(Listing.objects.get(address='150000 Bucket St').pricebucket, self.low)
+
+    def test_unknown_bucket_is_ignored(self):
+        """An id that names no bucket filters nothing and logs no search."""
+        listing = self.create_listing(150000)
+        unknown = Pricebucket.objects.order_by('-pk').first().pk + 1
+        response = self.client.get(reverse('listings'), {'price_range': unknown})
+        self.assertEqual(list(response.context['listings']), [listing])
+        self.assertIsNone(response.context['selected_price_range'])
+        self.assertEqual(response.context['facets']['total'], 1)
+        self.assertFalse(SearchLog.objects.exists())
+
+        self.client.get(reverse('listings'), {'price_range': self.low.pk})
+        self.assertEqual(SearchLog.objects.get().pricebucket, self.low)
+
+    def test_unparsed_bucket_filters_nothing(self):
+        """A bucket whose range has no bounds is selected and logged but doesn't filter."""
+        listing = self.create_listing(150000)
+        call = Pricebucket.objects.create(range='Call for price')
+        response = self.client.get(reverse('listings'), {'price_range': call.pk})
+        self.assertEqual(list(response.context['listings']), [listing])
+        self.assertEqual(response.context['selected_price_range'], call.pk)
+        self.assertEqual(response.context['facets']['total'], 1)
+        self.assertEqual(SearchLog.objects.get().pricebucket, call)
+
+    def test_filter_is_fk_equality(self):
+        """The price_range filter compares Pricebucket_ID instead of scanning a price range."""
+        inside = self.create_listing(150000)
+        self.create_listing(250000)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('listings'), {'price_range': self.low.pk})
+        self.assertEqual([l.pk for l in response.context['listings']], [inside.pk])
+
+        page_sql = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT "Listing"')]
+        self.assertIn('"Listing"."Pricebucket_ID" = ', page_sql[0])
+        self.assertNotIn('"Listing"."Price" >=', page_sql[0])
+
+    def test_data_migration(self):
+        """0015 fills the bounds from range text and assigns existing listings."""
+        listing = self.create_listing(150000)
+        Pricebucket.objects.update(min_price=None, max_price=None)
+        Listing.objects.update(pricebucket=None)
+
+        migration = importlib.import_module('listings.migrations.0015_populate_pricebucket_bounds')
+        migration.populate_bounds(apps, connection.schema_editor())
+
+        self.low.refresh_from_db()
+        self.assertEqual((self.low.min_price, self.low.max_price), (Decimal('100000'), Decimal('200000')))
+        self.assertEqual(Listing.objects.get(pk=listing.pk).pricebucket, self.low)
+
+
+class FixturePricebucketTests(TestCase):
+    """loaddata skips save(); the shipped fixtures still filter by price range."""
+
+    FIXTURES = ['statuses', 'property_types', 'neighborhoods', 'pricebuckets', 'listings']
+
+    def setUp(self):
+        # listings.json is owned by user 1.
+        create_user()
+
+    def load(self, *fixtures):
+        call_command('loaddata', *fixtures, verbosity=0)
+
+    def assertFilters(self):
+        bucket = Pricebucket.objects.get(range='$200,000 - $250,000')
+        expected = list(
+            Listing.objects.filter(is_visible=True, price__gte=200000, price__lt=250000).values_list('pk', flat=True)
+        )
+        self.assertTrue(expected)
+        response = self.client.get(reverse('listings'), {'price_range': bucket.pk})
+        self.assertEqual([listing.pk for listing in response.context['listings']], expected)
+
+    def test_documented_order(self):
+        self.load(*self.FIXTURES)
+        self.assertFilters()
+
+    def test_listings_before_buckets(self):
+        """``loaddata listings/fixtures/*.json`` loads listings.json first."""
+        self.load(*sorted(self.FIXTURES))
+        self.assertFilters()
+
+    def test_reloading_buckets_reassigns_listings(self):
+        self.load(*self.FIXTURES)
+        Listing.objects.update(pricebucket=None)
+        self.load('pricebuckets')
+        self.assertFilters()
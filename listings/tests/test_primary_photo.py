@@ -0,0 +1,140 @@
+"""
+Test cases for the denormalized Listing.primary_photo pointer.
+"""
+from django.contrib.admin.sites import site
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection, transaction
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from listings.forms import ListingForm
+from listings.models import Listing, Photo, refresh_primary_photos
+from listings.tests.test_blob_storage import BlobStorageTestMixin
+from listings.tests.test_image_jobs import make_upload_jpeg
+
+
+class PrimaryPhotoTests(BlobStorageTestMixin, TestCase):
+    """primary_photo follows the first photo in gallery order."""
+
+    def setUp(self):
+        super().setUp()
+        self.listing = self.create_listing()
+
+    def add_photo(self, order, listing=None):
+        return Photo.objects.create(listing=listing or self.listing, photo_display_order=order)
+
+    def primary(self, listing=None):
+        listing = listing or self.listing
+        return Listing.objects.values_list('primary_photo', flat=True).get(pk=listing.pk)
+
+    def test_added_photos(self):
+        self.assertIsNone(self.primary())
+        second = self.add_photo(2)
+        self.assertEqual(self.primary(), second.pk)
+        first = self.add_photo(1)
+        self.assertEqual(self.primary(), first.pk)
+        self.add_photo(3)
+        self.assertEqual(self.primary(), first.pk)
+
+    def test_save_photos(self):
+        """ListingForm.save_photos leaves the first upload as the primary photo."""
+        upload = make_upload_jpeg(40, 30)
+        form = ListingForm()
+        form.cleaned_data = {
+            'photos': [SimpleUploadedFile(f'p{i}.jpg', upload, content_type='image/jpeg') for i in range(4)]
+        }
+        form.save_photos(self.listing)
+
+        first = self.listing.photos.get(photo_display_order=1)
+        self.assertEqual(self.primary(), first.pk)
+
+    def test_reorder(self):
+        first, second = self.add_photo(1), self.add_photo(2)
+        first.photo_display_order = 3
+        first.save()
+        self.assertEqual(self.primary(), second.pk)
+
+    def test_delete(self):
+        first, second = self.add_photo(1), self.add_photo(2)
+        first.delete()
+        self.assertEqual(self.primary(), second.pk)
+        second.delete()
+        self.assertIsNone(self.primary())
+
+    def test_move_to_another_listing(self):
+        """Changing a photo's listing in the admin updates both listings."""
+        other = Listing.objects.create(
+            address='200 Other St', price=300000, created_by=self.listing.created_by,
+            neighborhood=self.listing.neighborhood, property_type=self.listing.property_type,
+        )
+        first, second = self.add_photo(1), self.add_photo(2)
+        first.listing = other
+        first.save()
+        self.assertEqual(self.primary(), second.pk)
+        self.assertEqual(self.primary(other), first.pk)
+
+    def test_admin_bulk_delete(self):
+        first, second = self.add_photo(1), self.add_photo(2)
+        request = RequestFactory().post('/')
+        site._registry[Photo].delete_queryset(request, Photo.objects.filter(pk=first.pk))
+        self.assertEqual(self.primary(), second.pk)
+
+    def test_job_saves_skip_refresh(self):
+        """Saves that can't change the order don't touch the listing."""
+        photo = self.add_photo(1)
+        photo.store_thumbnail(b'thumb')
+        with CaptureQueriesContext(connection) as ctx:
+            photo.save(update_fields=Photo.THUMBNAIL_FIELDS)
+        self.assertFalse([q for q in ctx.captured_queries if 'UPDATE "Listing"' in q['sql']])
+
+    def test_stale_listing_save(self):
+        """Saving a listing loaded before a photo was added keeps the pointer."""
+        stale = Listing.objects.get(pk=self.listing.pk)
+        photo = self.add_photo(1)
+        stale.address = '101 Blob St'
+        stale.save()
+        self.assertEqual(self.primary(), photo.pk)
+
+    def test_stale_partial_listing_save(self):
+        """Deferred fields stay unloaded, and primary_photo is still left alone."""
+        stale = Listing.objects.only('listing_id', 'address', 'price').get(pk=self.listing.pk)
+        photo = self.add_photo(1)
+        stale.address = '101 Blob St'
+        with CaptureQueriesContext(connection) as ctx:
+            stale.save()
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('SELECT "Listing"')])
+        self.assertEqual(self.primary(), photo.pk)
+        self.assertEqual(Listing.objects.get(pk=self.listing.pk).address, '101 Blob St')
+
+    def test_save_of_deleted_listing_raises(self):
+        """A save of an existing listing is an update; a row deleted meanwhile isn't re-created."""
+        stale = Listing.objects.get(pk=self.listing.pk)
+        Listing.objects.filter(pk=self.listing.pk).delete()
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            stale.save()
+        self.assertFalse(Listing.objects.filter(pk=self.listing.pk).exists())
+
+    def test_delete_listing_with_photos(self):
+        """Photos cascade while their listing points at one of them."""
+        self.add_photo(1)
+        self.add_photo(2)
+        listing = Listing.objects.get(pk=self.listing.pk)
+        self.assertIsNotNone(listing.primary_photo_id)
+        listing.delete()
+        self.assertFalse(Listing.objects.filter(pk=self.listing.pk).exists())
+        self.assertFalse(Photo.objects.filter(listing_id=self.listing.pk).exists())
+
+    def test_refresh_after_queryset_update(self):
+        first, second = self.add_photo(1), self.add_photo(2)
+        Photo.objects.filter(pk=second.pk).update(photo_display_order=0)
+        self.assertEqual(self.primary(), first.pk)
+        refresh_primary_photos()
+        self.assertEqual(self.primary(), second.pk)
+
+    def test_grid_has_no_photo_query(self):
+        """The grid renders from the Listing queries alone."""
+        photo = self.add_photo(1)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('listings'), {'ajax': '1'})
+        self.assertIn(reverse('listing_photo_thumbnail', args=[photo.pk]), response.json()['listings_html'])
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "Photo"' in q['sql']])
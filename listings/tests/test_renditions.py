@@ -0,0 +1,83 @@
+"""
+Test cases for responsive photo renditions.
+"""
+from io import BytesIO
+from unittest import mock
+
+from PIL import Image
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from listings.models import Photo, PhotoRendition
+from listings.tests.test_blob_storage import BlobStorageTestMixin
+
+
+def make_jpeg(width, height, color=(200, 120, 40)):
+    """Return JPEG bytes for a solid-colour image of the given size."""
+    output = BytesIO()
+    Image.new('RGB', (width, height), color).save(output, format='JPEG')
+    return output.getvalue()
+
+
+@override_settings(PHOTO_RENDITION_WIDTHS=[160, 320, 640])
+class PhotoRenditionTests(BlobStorageTestMixin, TestCase):
+    """Test cases for /photo/<id>/<width>/ and srcset rendering."""
+
+    def setUp(self):
+        super().setUp()
+        self.listing = self.create_listing()
+        self.photo = Photo(listing=self.listing, photo_display_order=1)
+        self.photo.store_image(make_jpeg(1000, 500))
+        self.photo.save()
+
+    def rendition_url(self, width):
+        return reverse('listing_photo_rendition', args=[self.photo.pk, width])
+
+    def test_rendition_generated_lazily_and_persisted(self):
+        """The first request generates and stores the rendition."""
+        self.assertFalse(PhotoRendition.objects.exists())
+
+        response = self.client.get(self.rendition_url(320))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(Image.open(BytesIO(response.content)).size, (320, 160))
+
+        rendition = PhotoRendition.objects.get(photo=self.photo, width=320)
+        self.assertEqual(response['ETag'], f'"{rendition.digest}"')
+        self.assertEqual(rendition.size, len(response.content))
+
+    def test_stored_rendition_is_reused(self):
+        """Later requests do not re-encode the image."""
+        first = self.client.get(self.rendition_url(160))
+        with mock.patch('listings.renditions.generate_rendition') as generate:
+            second = self.client.get(self.rendition_url(160))
+        generate.assert_not_called()
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(PhotoRendition.objects.count(), 1)
+
+        response = self.client.get(self.rendition_url(160), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_small_image_is_not_upscaled(self):
+        """Images narrower than the rendition width keep their size."""
+        small = Photo(listing=self.listing)
+        small.store_image(make_jpeg(100, 80))
+        small.save()
+        response = self.client.get(reverse('listing_photo_rendition', args=[small.pk, 640]))
+        self.assertEqual(Image.open(BytesIO(response.content)).size, (100, 80))
+
+    def test_unconfigured_width_returns_404(self):
+        """Only the configured widths can be requested."""
+        response = self.client.get(self.rendition_url(1280))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(PhotoRendition.objects.exists())
+
+    def test_srcset_rendered_in_grid_and_detail(self):
+        """The grid card and detail gallery advertise every width."""
+        expected = ', '.join(f'{self.rendition_url(w)} {w}w' for w in (160, 320, 640))
+
+        response = self.client.get(reverse('listings'))
+        self.assertContains(response, f'srcset="{expected}"')
+
+        response = self.client.get(reverse('listing_detail', args=[self.listing.pk]))
+        self.assertContains(response, f'srcset="{expected}"')
+        self.assertContains(response, f'data-srcset="{expected}"')
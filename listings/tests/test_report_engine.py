@@ -0,0 +1,148 @@
+"""
+Test cases for the single-pass search report engine.
+"""
+import csv
+import random
+from datetime import date
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from listings import lookups, reports
+from listings.models import Neighborhood, Pricebucket, PropertyType, SearchLog
+from listings.search_logging import write_search_logs
+from listings.tests.support import at, create_user
+
+
+class SearchReportEngineTests(TestCase):
+    """Every strategy and source produces the same report in one query."""
+
+    @classmethod
+    def setUpTestData(cls):
+        neighborhoods = [Neighborhood.objects.create(name=name) for name in ('Benson', 'Downtown', 'Dundee')]
+        property_types = [PropertyType.objects.create(name=name) for name in ('Condo', 'House')]
+        buckets = [Pricebucket.objects.create(range=f'${n},000 - ${n + 100},000') for n in (100, 200)]
+        rng = random.Random(8)
+        write_search_logs([
+            SearchLog(
+                neighborhood=rng.choice(neighborhoods + [None]),
+                property_type=rng.choice(property_types + [None]),
+                pricebucket=rng.choice(buckets + [None]),
+                timestamp=at(2026, rng.randint(2, 4), rng.randint(1, 28), rng.randint(0, 23)),
+            )
+            for _ in range(400)
+        ])
+
+    def setUp(self):
+        lookups.clear()
+
+    def test_strategies_and_sources_agree(self):
+        for granularity in (None, 'day', 'week'):
+            with self.subTest(granularity=granularity):
+                results = [
+                    reports.search_report(date(2026, 3, 4), date(2026, 4, 9), granularity, source, strategy)
+                    for source in reports.SOURCES
+                    for strategy in reports.STRATEGIES
+                ]
+                for result in results[1:]:
+                    self.assertEqual(result, results[0])
+
+    def test_totals_match_the_log(self):
+        report = reports.search_report(date(2026, 3, 1), date(2026, 4, 1))
+        logs = SearchLog.objects.filter(timestamp__gte=at(2026, 3, 1), timestamp__lt=at(2026, 4, 1))
+        self.assertEqual(report['search_count'], logs.count())
+        self.assertEqual(
+            {row['neighborhood__name']: row['search_count'] for row in report['neighborhoods']},
+            {n.name: logs.filter(neighborhood=n).count() for n in Neighborhood.objects.all()},
+        )
+        counts = [row['search_count'] for row in report['neighborhoods']]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+    def test_one_query_per_report(self):
+        reports.search_report(date(2026, 3, 1), date(2026, 4, 1), strategy='scan')  # warm the lookup caches
+        for source in reports.SOURCES:
+            for strategy in reports.STRATEGIES:
+                with self.subTest(source=source, strategy=strategy):
+                    with CaptureQueriesContext(connection) as queries:
+                        reports.search_report(date(2026, 3, 1), date(2026, 4, 1), 'week', source, strategy)
+                    self.assertEqual(len(queries), 1)
+
+    def test_scan_names_rows_the_lookup_cache_has_not_seen(self):
+        """A neighborhood added by another process is counted, not dropped."""
+        lookups.neighborhoods.all()
+        # bulk_create() sends no signals, like a save in another process.
+        Neighborhood.objects.bulk_create([Neighborhood(name='Aksarben')])
+        aksarben = Neighborhood.objects.get(name='Aksarben')
+        write_search_logs([SearchLog(neighborhood=aksarben, timestamp=at(2026, 3, 5, 12))])
+        report = reports.search_report(date(2026, 3, 1), date(2026, 4, 1), 'day', strategy='scan')
+        self.assertEqual(report, reports.search_report(date(2026, 3, 1), date(2026, 4, 1), 'day', strategy='union'))
+        self.assertIn({'neighborhood__name': 'Aksarben', 'search_count': 1}, report['neighborhoods'])
+
+    def test_periods(self):
+        report = reports.search_report(date(2026, 3, 4), date(2026, 3, 18), 'week')
+        # 2026-03-04 is a Wednesday; its week is listed under Monday the 2nd.
+        self.assertEqual(
+            [p['start'] for p in report['periods']],
+            [date(2026, 3, 2), date(2026, 3, 9), date(2026, 3, 16)],
+        )
+        self.assertEqual(sum(p['search_count'] for p in report['periods']), report['search_count'])
+
+        days = reports.search_report(date(2026, 5, 1), date(2026, 5, 4), 'day')['periods']
+        self.assertEqual([(p['start'], p['search_count'], p['neighborhoods']) for p in days], [
+            (date(2026, 5, 1), 0, []), (date(2026, 5, 2), 0, []), (date(2026, 5, 3), 0, []),
+        ])
+
+    def test_invalid_arguments(self):
+        for kwargs in ({'granularity': 'hour'}, {'source': 'cache'}, {'strategy': 'cube'}):
+            with self.subTest(**kwargs), self.assertRaises(ValueError):
+                reports.search_report(date(2026, 3, 1), date(2026, 4, 1), **kwargs)
+
+
+class ReportViewPeriodTests(TestCase):
+    """The report views take date ranges and a breakdown granularity."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('staff@example.com', 'Staff')
+        downtown = Neighborhood.objects.create(name='Downtown')
+        write_search_logs([
+            SearchLog(neighborhood=downtown, timestamp=at(2026, 3, 2, 12)),
+            SearchLog(neighborhood=downtown, timestamp=at(2026, 3, 10, 12)),
+            SearchLog(neighborhood=downtown, timestamp=at(2026, 3, 11, 12)),
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_report_by_week(self):
+        response = self.client.get(reverse('generate_report'), {'month': 3, 'year': 2026, 'granularity': 'week'})
+        report = response.context['report_data']
+        self.assertEqual(report['title'], 'March 2026')
+        self.assertEqual([p['search_count'] for p in report['periods']], [0, 1, 2, 0, 0, 0])
+        self.assertContains(response, 'Week Starting')
+
+    def test_report_for_date_range(self):
+        response = self.client.get(reverse('generate_report'), {'start': '2026-03-05', 'end': '2026-03-10'})
+        report = response.context['report_data']
+        self.assertEqual(report['title'], '2026-03-05 to 2026-03-10')
+        self.assertEqual(report['neighborhoods'], [{'neighborhood__name': 'Downtown', 'search_count': 1}])
+
+    def test_reversed_or_long_range_is_rejected(self):
+        for end in ('2026-03-04', '2027-03-06'):
+            with self.subTest(end=end):
+                response = self.client.get(reverse('generate_report'), {'start': '2026-03-05', 'end': end})
+                self.assertIsNone(response.context['report_data'])
+                self.assertContains(response, 'Invalid report period.')
+                response = self.client.get(reverse('export_report_csv'), {'start': '2026-03-05', 'end': end})
+                self.assertRedirects(response, reverse('generate_report'), fetch_redirect_response=False)
+        response = self.client.get(reverse('generate_report'), {'start': '2026-03-05', 'end': '2027-03-05'})
+        self.assertEqual(response.context['report_data']['title'], '2026-03-05 to 2027-03-05')
+
+    def test_csv_breakdown(self):
+        response = self.client.get(reverse('export_report_csv'), {'month': 3, 'year': 2026, 'granularity': 'day'})
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        start = rows.index(['Day Starting', 'Category', 'Name', 'Searches'])
+        self.assertEqual(len([row for row in rows[start + 1:] if row[1] == 'All Searches']), 31)
+        self.assertIn(['2026-03-10', 'Neighborhood', 'Downtown', '1'], rows)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="search_report_March_2026.csv"')
@@ -0,0 +1,105 @@
+"""
+Test cases for the streamed search report CSV exports.
+"""
+import csv
+from datetime import date
+
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from listings import reports
+from listings.models import Neighborhood, Pricebucket, PropertyType, SearchLog
+from listings.search_logging import write_search_logs
+from listings.tests.support import at, create_user
+
+
+class ReportExportTests(TestCase):
+    """Summary and raw exports stream their rows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('staff@example.com', 'Staff')
+        cls.downtown = Neighborhood.objects.create(name='Downtown')
+        cls.house = PropertyType.objects.create(name='House')
+        cls.bucket = Pricebucket.objects.create(range='$200,000 - $300,000')
+        write_search_logs([
+            SearchLog(neighborhood=cls.downtown, property_type=cls.house, timestamp=at(2026, 3, 1, 9)),
+            SearchLog(neighborhood=cls.downtown, pricebucket=cls.bucket, timestamp=at(2026, 3, 31, 23, 30)),
+            SearchLog(property_type=cls.house, timestamp=at(2026, 3, 15, 12)),
+            SearchLog(neighborhood=cls.downtown, timestamp=at(2026, 4, 1, 0, 30)),
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_report_csv'), params)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+
+    def test_summary_reads_rollup_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            rows = self.export(month=3, year=2026)
+        self.assertEqual(rows, [
+            ['Search Report for March 2026'],
+            [],
+            ['Home Type', 'Searches'],
+            ['House', '2'],
+            [],
+            ['Neighborhood', 'Searches'],
+            ['Downtown', '2'],
+            [],
+            ['Price Range', 'Searches'],
+            ['$200,000 - $300,000', '1'],
+        ])
+        rollup_queries = [q for q in queries.captured_queries if 'Search_Log_Daily_Rollup' in q['sql']]
+        self.assertEqual(len(rollup_queries), 1)
+
+    def test_summary_without_data_redirects(self):
+        response = self.client.get(reverse('export_report_csv'), {'month': 5, 'year': 2026})
+        self.assertRedirects(
+            response, f"{reverse('generate_report')}?month=5&year=2026", fetch_redirect_response=False
+        )
+
+    def test_raw_month(self):
+        rows = self.export(mode='raw', month=3, year=2026)
+        self.assertEqual(rows[0], ['Search ID', 'Timestamp', 'Home Type', 'Neighborhood', 'Price Range'])
+        self.assertEqual([row[1:] for row in rows[1:]], [
+            ['2026-03-01T09:00:00+00:00', 'House', 'Downtown', ''],
+            ['2026-03-15T12:00:00+00:00', 'House', '', ''],
+            ['2026-03-31T23:30:00+00:00', '', 'Downtown', '$200,000 - $300,000'],
+        ])
+
+    @override_settings(TIME_ZONE='America/Chicago')
+    def test_raw_date_range_is_local_and_inclusive(self):
+        rows = self.export(mode='raw', start='2026-03-31', end='2026-03-31')
+        # 2026-04-01 00:30 UTC is still March 31 in Chicago.
+        self.assertEqual([row[1] for row in rows[1:]], [
+            '2026-03-31T18:30:00-05:00',
+            '2026-03-31T19:30:00-05:00',
+        ])
+
+    def test_raw_invalid_dates_redirect(self):
+        response = self.client.get(reverse('export_report_csv'), {'mode': 'raw', 'start': '2026-03-01'})
+        self.assertRedirects(response, reverse('generate_report'), fetch_redirect_response=False)
+
+
+class RawExportChunkTests(TestCase):
+    """The raw export reads the log in keyset-paginated chunks."""
+
+    def test_chunks_cover_every_row_across_equal_timestamps(self):
+        same_time = at(2026, 3, 2, 12)
+        write_search_logs([SearchLog(timestamp=same_time) for _ in range(5)])
+        write_search_logs([SearchLog(timestamp=at(2026, 3, 3, h)) for h in range(3)])
+        start, end = reports.datetime_range(date(2026, 3, 1), date(2026, 4, 1))
+
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(reports.iter_search_logs(start, end, chunk_size=2))
+
+        expected = SearchLog.objects.order_by('timestamp', 'pk').values_list('pk', flat=True)
+        self.assertEqual([row[0] for row in rows], list(expected))
+        # Four full chunks of two, then an empty one.
+        self.assertEqual(len(queries), 5)
+        self.assertTrue(all('LIMIT 2' in q['sql'] for q in queries.captured_queries))
@@ -0,0 +1,78 @@
+"""
+Test cases for date-range queries on the raw search log, using SQLite's
+EXPLAIN QUERY PLAN.
+"""
+from datetime import date
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from listings import reports
+from listings.models import Neighborhood, SearchLog
+from listings.tests.support import at, explain
+
+
+class DateRangeTests(TestCase):
+    """Periods are half-open ranges of local midnights."""
+
+    @override_settings(TIME_ZONE='America/Chicago')
+    def test_month_range_in_configured_time_zone(self):
+        start, end = reports.datetime_range(date(2026, 3, 1), date(2026, 4, 1))
+        # CST before the March DST change, CDT after it.
+        self.assertEqual(start, at(2026, 3, 1, 6))
+        self.assertEqual(end, at(2026, 4, 1, 5))
+
+    def test_range_is_half_open(self):
+        start, end = reports.datetime_range(date(2026, 3, 1), date(2026, 4, 1))
+        SearchLog.objects.bulk_create([
+            SearchLog(timestamp=start),
+            SearchLog(timestamp=end),
+            SearchLog(timestamp=at(2026, 2, 28, 23, 59, 59)),
+        ])
+        self.assertEqual(list(reports.search_logs_between(start, end).values_list('timestamp', flat=True)), [start])
+
+    def test_no_per_row_datetime_extract(self):
+        start, end = reports.datetime_range(date(2026, 3, 1), date(2026, 4, 1))
+        sql = str(reports.search_logs_between(start, end).query)
+        self.assertNotIn('django_datetime', sql)
+        self.assertIn('"Search_Log"."Timestamp" >=', sql)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite-specific')
+class SearchLogQueryPlanTests(TestCase):
+    """Range queries seek in the Search_Log indexes instead of scanning."""
+
+    def setUp(self):
+        start, end = reports.datetime_range(date(2026, 3, 1), date(2026, 4, 1))
+        self.logs = reports.search_logs_between(start, end)
+
+    def test_range_uses_timestamp_index(self):
+        self.assertEqual(
+            explain(self.logs),
+            ['SEARCH Search_Log USING INDEX search_log_timestamp (Timestamp>? AND Timestamp<?)'],
+        )
+
+    def test_dimension_and_range_use_composite_index(self):
+        for field, index, column in (
+            ('property_type', 'search_log_type_ts', 'Property_Type_ID'),
+            ('neighborhood', 'search_log_nbhd_ts', 'Neighborhood_ID'),
+            ('pricebucket', 'search_log_bucket_ts', 'Pricebucket_ID'),
+        ):
+            with self.subTest(field=field):
+                plan = explain(self.logs.filter(**{f'{field}_id': 1}))
+                self.assertEqual(
+                    plan,
+                    [f'SEARCH Search_Log USING INDEX {index} ({column}=? AND Timestamp>? AND Timestamp<?)'],
+                )
+
+    def test_dimension_counts_do_not_scan(self):
+        Neighborhood.objects.create(name='Downtown')
+        for field in ('property_type__name', 'neighborhood__name', 'pricebucket__range'):
+            with self.subTest(field=field):
+                plan = explain(
+                    self.logs.filter(**{f"{field.split('__')[0]}__isnull": False})
+                    .values(field).annotate(search_count=Count('search_log_id'))
+                )
+                self.assertTrue(plan[0].startswith('SEARCH Search_Log USING INDEX'), plan)
+                self.assertFalse([line for line in plan if line.startswith('SCAN Search_Log')], plan)
@@ -0,0 +1,133 @@
+"""
+Test cases for buffered SearchLog writes.
+"""
+import os
+import threading
+import time
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from listings.models import Neighborhood, SearchLog
+from listings.search_logging import SearchLogBuffer, get_search_log_buffer, record_search
+
+BUFFERED = {'ENABLED': True, 'MAX_SIZE': 3, 'MAX_AGE_SECONDS': 60}
+
+
+class SearchLogBufferTests(TestCase):
+    """Events are held in memory and written in batches."""
+
+    def setUp(self):
+        self.neighborhood = Neighborhood.objects.create(name='Downtown')
+
+    def test_write_through_when_disabled(self):
+        with override_settings(SEARCH_LOG_BUFFER={'ENABLED': False}):
+            record_search(neighborhood=self.neighborhood)
+            self.assertEqual(SearchLog.objects.count(), 1)
+
+    @override_settings(SEARCH_LOG_BUFFER=BUFFERED)
+    def test_flushes_on_size_with_one_insert(self):
+        """Nothing is written until MAX_SIZE events are queued, then one INSERT."""
+        record_search(neighborhood=self.neighborhood)
+        record_search(neighborhood=self.neighborhood)
+        self.assertEqual(SearchLog.objects.count(), 0)
+        self.assertEqual(get_search_log_buffer().pending(), 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            record_search(neighborhood=self.neighborhood)
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "Search_Log" ')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(SearchLog.objects.count(), 3)
+        self.assertEqual(get_search_log_buffer().pending(), 0)
+
+    @override_settings(SEARCH_LOG_BUFFER=BUFFERED)
+    def test_keeps_search_time(self):
+        searched_at = timezone.now() - timedelta(minutes=5)
+        record_search(neighborhood=self.neighborhood, timestamp=searched_at)
+        get_search_log_buffer().flush()
+        self.assertEqual(SearchLog.objects.get().timestamp, searched_at)
+
+    @override_settings(SEARCH_LOG_BUFFER=BUFFERED)
+    def test_listings_view_buffers(self):
+        self.client.get(reverse('listings'), {'neighborhood': self.neighborhood.pk})
+        self.assertEqual(SearchLog.objects.count(), 0)
+        get_search_log_buffer().flush()
+        self.assertEqual(SearchLog.objects.get().neighborhood, self.neighborhood)
+
+    def test_close_flushes_pending(self):
+        """Graceful shutdown (atexit calls close) writes everything queued."""
+        buffer = SearchLogBuffer(max_size=100, max_age=60)
+        for _ in range(5):
+            buffer.add(SearchLog(neighborhood=self.neighborhood))
+        buffer.close()
+        self.assertEqual(SearchLog.objects.count(), 5)
+        self.assertFalse(buffer._flusher.is_alive())
+
+    def test_add_after_close_writes_through(self):
+        """Nothing flushes a closed buffer, so later events aren't queued."""
+        buffer = SearchLogBuffer(max_size=100, max_age=60)
+        buffer.close()
+        buffer.add(SearchLog(neighborhood=self.neighborhood))
+        self.assertEqual(buffer.pending(), 0)
+        self.assertEqual(SearchLog.objects.count(), 1)
+        self.assertIsNone(buffer._flusher)
+
+    def test_failed_flush_is_retried(self):
+        buffer = SearchLogBuffer(max_size=100, max_age=60)
+        buffer.add(SearchLog(neighborhood=self.neighborhood))
+        with mock.patch('listings.search_logging.write_search_logs', side_effect=RuntimeError('locked')):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(buffer.pending(), 1)
+        buffer.close()
+        self.assertEqual(SearchLog.objects.count(), 1)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs fork()')
+    def test_forked_child_gets_a_fresh_buffer(self):
+        """A worker forked while another thread held the lock can still queue searches."""
+        buffer = SearchLogBuffer(max_size=100, max_age=60)
+        buffer.add(SearchLog(neighborhood=self.neighborhood))
+        held, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            with buffer._lock:
+                held.set()
+                release.wait()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        held.wait()
+        pid = os.fork()
+        if pid == 0:
+            # The child reports through its exit status and never touches the database.
+            code = 1
+            try:
+                if buffer._flusher is None and buffer._lock.acquire(timeout=1):
+                    buffer._lock.release()
+                    code = 0 if buffer.pending() == 0 else 2
+            finally:
+                os._exit(code)
+        release.set()
+        holder.join()
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertEqual(buffer.pending(), 1)
+        buffer.close()
+
+
+class SearchLogFlusherThreadTests(TransactionTestCase):
+    """The background thread flushes on the age threshold."""
+
+    def test_flushes_on_age(self):
+        buffer = SearchLogBuffer(max_size=100, max_age=0.05)
+        buffer.add(SearchLog())
+        buffer.add(SearchLog())
+        deadline = time.monotonic() + 5
+        while SearchLog.objects.count() < 2 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(SearchLog.objects.count(), 2)
+        buffer.close()
@@ -0,0 +1,155 @@
+"""
+Test cases for the daily search rollup behind the search reports.
+"""
+from datetime import date
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from listings.models import Neighborhood, Pricebucket, PropertyType, SearchLog, SearchLogDailyRollup
+from listings.search_logging import rebuild_search_rollups, record_search, write_search_logs
+from listings.tests.support import User, at, create_user
+
+
+class SearchRollupTests(TestCase):
+    """Rollup rows are kept in step with SearchLog as searches are written."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.downtown = Neighborhood.objects.create(name='Downtown')
+        cls.benson = Neighborhood.objects.create(name='Benson')
+        cls.house = PropertyType.objects.create(name='House')
+        cls.bucket = Pricebucket.objects.create(range='$200,000 - $300,000')
+
+    def rollups(self):
+        fields = ('day', 'property_type_id', 'neighborhood_id', 'pricebucket_id', 'search_count')
+        return list(SearchLogDailyRollup.objects.order_by(*fields).values_list(*fields))
+
+    def test_counts_per_day_and_combination(self):
+        record_search(neighborhood=self.downtown, timestamp=at(2026, 3, 2, 10))
+        record_search(neighborhood=self.downtown, timestamp=at(2026, 3, 2, 11))
+        record_search(neighborhood=self.downtown, property_type=self.house, timestamp=at(2026, 3, 2, 12))
+        record_search(neighborhood=self.downtown, timestamp=at(2026, 3, 3, 9))
+
+        self.assertEqual(self.rollups(), [
+            (date(2026, 3, 2), None, self.downtown.pk, None, 2),
+            (date(2026, 3, 2), self.house.pk, self.downtown.pk, None, 1),
+            (date(2026, 3, 3), None, self.downtown.pk, None, 1),
+        ])
+
+    def test_batch_is_one_upsert(self):
+        for _ in range(2):
+            logs = [SearchLog(neighborhood=self.benson, timestamp=at(2026, 3, 2, h)) for h in range(5)]
+            logs.append(SearchLog(pricebucket=self.bucket, timestamp=at(2026, 3, 2, 6)))
+            with CaptureQueriesContext(connection) as queries:
+                write_search_logs(logs)
+            rollup_writes = [q for q in queries.captured_queries if '"Search_Log_Daily_Rollup"' in q['sql']]
+            self.assertEqual(len(rollup_writes), 1)
+        self.assertEqual(self.rollups(), [
+            (date(2026, 3, 2), None, None, self.bucket.pk, 2),
+            (date(2026, 3, 2), None, self.benson.pk, None, 10),
+        ])
+
+    def test_one_row_per_combination(self):
+        """The constraint treats a missing filter as a value of its own."""
+        SearchLogDailyRollup.objects.create(day=date(2026, 3, 2), neighborhood=self.benson, search_count=1)
+        SearchLogDailyRollup.objects.create(day=date(2026, 3, 2), search_count=1)
+        for fields in ({'neighborhood': self.benson}, {}):
+            with self.subTest(**fields), self.assertRaises(IntegrityError), transaction.atomic():
+                SearchLogDailyRollup.objects.create(day=date(2026, 3, 2), search_count=1, **fields)
+
+    def test_deleting_a_lookup_folds_its_rollups(self):
+        record_search(neighborhood=self.downtown, timestamp=at(2026, 3, 2, 10))
+        record_search(neighborhood=self.benson, timestamp=at(2026, 3, 2, 11))
+        record_search(timestamp=at(2026, 3, 2, 12))
+        Neighborhood.objects.filter(pk__in=[self.downtown.pk, self.benson.pk]).delete()
+        self.assertEqual(self.rollups(), [(date(2026, 3, 2), None, None, None, 3)])
+        self.assertEqual(rebuild_search_rollups(), 1)
+        self.assertEqual(self.rollups(), [(date(2026, 3, 2), None, None, None, 3)])
+
+    def test_admin_cannot_change_the_log(self):
+        """Admin edits would bypass the rollup, so SearchLog is read-only there."""
+        log = record_search(neighborhood=self.downtown, timestamp=at(2026, 3, 2, 10))
+        self.client.force_login(User.objects.create_superuser(email='admin@example.com', password='x'))
+        self.assertEqual(self.client.get(reverse('admin:listings_searchlog_changelist')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('admin:listings_searchlog_add')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('admin:listings_searchlog_delete', args=[log.pk])).status_code, 403)
+        response = self.client.post(reverse('admin:listings_searchlog_change', args=[log.pk]), {})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.rollups(), [(date(2026, 3, 2), None, self.downtown.pk, None, 1)])
+
+    @override_settings(TIME_ZONE='America/Chicago')
+    def test_days_are_local(self):
+        record_search(neighborhood=self.downtown, timestamp=at(2026, 3, 1, 3))
+        self.assertEqual(SearchLogDailyRollup.objects.get().day, date(2026, 2, 28))
+
+    def test_rebuild_matches_incremental(self):
+        for day in (1, 1, 2, 31):
+            record_search(neighborhood=self.downtown, pricebucket=self.bucket, timestamp=at(2026, 3, day, 12))
+        record_search(property_type=self.house, timestamp=at(2026, 3, 2, 12))
+        incremental = self.rollups()
+
+        self.assertEqual(rebuild_search_rollups(), 4)
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_rebuild_since_leaves_earlier_days(self):
+        record_search(neighborhood=self.downtown, timestamp=at(2026, 3, 1, 12))
+        record_search(neighborhood=self.downtown, timestamp=at(2026, 3, 5, 12))
+        SearchLogDailyRollup.objects.update(search_count=99)
+
+        call_command('rebuild_search_rollups', since='2026-03-03', stdout=StringIO())
+        self.assertEqual(
+            dict(SearchLogDailyRollup.objects.values_list('day', 'search_count')),
+            {date(2026, 3, 1): 99, date(2026, 3, 5): 1},
+        )
+
+
+class SearchReportRollupTests(TestCase):
+    """The report views read counts from the rollup, not the raw log."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('staff@example.com', 'Staff')
+        downtown = Neighborhood.objects.create(name='Downtown')
+        benson = Neighborhood.objects.create(name='Benson')
+        house = PropertyType.objects.create(name='House')
+        bucket = Pricebucket.objects.create(range='$200,000 - $300,000')
+        SearchLogDailyRollup.objects.bulk_create([
+            SearchLogDailyRollup(day=date(2026, 3, 1), neighborhood=downtown, property_type=house, search_count=4),
+            SearchLogDailyRollup(day=date(2026, 3, 31), neighborhood=downtown, pricebucket=bucket, search_count=3),
+            SearchLogDailyRollup(day=date(2026, 3, 15), neighborhood=benson, search_count=5),
+            # Outside March on both sides.
+            SearchLogDailyRollup(day=date(2026, 2, 28), neighborhood=benson, search_count=100),
+            SearchLogDailyRollup(day=date(2026, 4, 1), neighborhood=benson, search_count=100),
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_report_sums_month_of_rollups(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('generate_report'), {'month': 3, 'year': 2026})
+        report = response.context['report_data']
+
+        self.assertEqual(report['neighborhoods'], [
+            {'neighborhood__name': 'Downtown', 'search_count': 7},
+            {'neighborhood__name': 'Benson', 'search_count': 5},
+        ])
+        self.assertEqual(report['property_types'], [{'property_type__name': 'House', 'search_count': 4}])
+        self.assertEqual(report['price_ranges'], [{'pricebucket__range': '$200,000 - $300,000', 'search_count': 3}])
+        self.assertFalse([q for q in queries.captured_queries if 'FROM "Search_Log"' in q['sql']])
+
+    def test_csv_export_uses_rollups(self):
+        response = self.client.get(reverse('export_report_csv'), {'month': 3, 'year': 2026})
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('Downtown,7', content)
+        self.assertIn('Benson,5', content)
+
+    def test_invalid_month(self):
+        response = self.client.get(reverse('generate_report'), {'month': 13, 'year': 2026})
+        self.assertIsNone(response.context['report_data'])
+        response = self.client.get(reverse('export_report_csv'), {'month': 13, 'year': 2026})
+        self.assertRedirects(response, reverse('generate_report'), fetch_redirect_response=False)
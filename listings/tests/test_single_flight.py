@@ -0,0 +1,241 @@
+"""
+Test cases for single-flight thumbnail and rendition generation.
+"""
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from listings.models import GenerationLock, Photo
+from listings.single_flight import (
+    FAILED, GENERATED, SHARED, TIMED_OUT, SingleFlight, rendition_flight, thumbnail_flight,
+)
+from listings.tests.test_blob_storage import BlobStorageTestMixin
+from listings.tests.test_renditions import make_jpeg
+
+
+class SingleFlightConcurrencyTests(TransactionTestCase):
+    """Concurrent callers in one process share a single generation."""
+
+    def test_concurrent_callers_generate_once(self):
+        """Eight simultaneous callers produce one generate() call."""
+        flight = SingleFlight('test-threads', wait_seconds=5)
+        flight.reset_stats()
+        store = {}
+        generate_calls = []
+        outcomes = []
+        start = threading.Barrier(8)
+
+        def generate():
+            generate_calls.append(1)
+            time.sleep(0.2)
+            store['value'] = b'thumb'
+            return store['value']
+
+        def worker():
+            start.wait()
+            try:
+                outcomes.append(flight.run(42, generate, lambda: store.get('value')))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(generate_calls), 1)
+        self.assertEqual(sorted(o for _, o in outcomes), [GENERATED] + [SHARED] * 7)
+        self.assertTrue(all(result == b'thumb' for result, _ in outcomes))
+        self.assertEqual(flight.stats()['duplicates_avoided'], 7)
+        self.assertFalse(GenerationLock.objects.exists())
+
+    def test_waiters_see_leader_failure(self):
+        """When the leader produces nothing, waiters fail too instead of timing out."""
+        flight = SingleFlight('test-threads-failed', wait_seconds=5)
+        flight.reset_stats()
+        outcomes = []
+        start = threading.Barrier(4)
+
+        def generate():
+            time.sleep(0.2)
+            return None
+
+        def worker():
+            start.wait()
+            try:
+                outcomes.append(flight.run(42, generate, lambda: None))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(outcomes, [(None, FAILED)] * 4)
+        stats = flight.stats()
+        self.assertEqual((stats[GENERATED], stats[FAILED], stats['duplicates_avoided']), (0, 4, 0))
+
+
+class SingleFlightLockTableTests(TestCase):
+    """A lock held by another process makes callers wait instead of generating."""
+
+    def setUp(self):
+        self.flight = SingleFlight('test-lock', wait_seconds=0.3, poll_interval=0.01)
+        self.flight.reset_stats()
+        self.generate = mock.Mock(return_value=b'mine')
+
+    def hold_lock(self, expires_in=30):
+        GenerationLock.objects.create(
+            key='test-lock:7', owner='other-host:1',
+            expires_at=timezone.now() + timedelta(seconds=expires_in),
+        )
+
+    def test_waits_for_other_process_result(self):
+        """The result written by the other process is picked up by polling."""
+        self.hold_lock()
+        lookup = mock.Mock(side_effect=[None, None, b'theirs'])
+
+        self.assertEqual(self.flight.run(7, self.generate, lookup), (b'theirs', SHARED))
+        self.generate.assert_not_called()
+
+    def test_times_out_to_placeholder(self):
+        """Without a result before the deadline the caller gets TIMED_OUT."""
+        self.hold_lock()
+        self.assertEqual(self.flight.run(7, self.generate, lambda: None), (None, TIMED_OUT))
+        self.generate.assert_not_called()
+        self.assertEqual(self.flight.stats()[TIMED_OUT], 1)
+
+    def test_other_process_released_without_result(self):
+        """A lock released with nothing stored ends the wait with FAILED."""
+        self.hold_lock()
+
+        def lookup():
+            GenerationLock.objects.all().delete()
+            return None
+
+        self.assertEqual(self.flight.run(7, self.generate, lookup), (None, FAILED))
+        self.generate.assert_not_called()
+        self.assertEqual(self.flight.stats()[TIMED_OUT], 0)
+
+    def test_generation_counted_only_when_it_produces_a_result(self):
+        """Empty and raising generations are recorded as failures."""
+        self.assertEqual(self.flight.run(7, lambda: None, lambda: None), (None, FAILED))
+        with self.assertRaises(RuntimeError):
+            self.flight.run(7, mock.Mock(side_effect=RuntimeError), lambda: None)
+        stats = self.flight.stats()
+        self.assertEqual((stats[GENERATED], stats[FAILED]), (0, 2))
+        self.assertFalse(GenerationLock.objects.exists())
+
+    def test_expired_lock_is_taken_over(self):
+        """A lease left by a crashed process does not block generation."""
+        self.hold_lock(expires_in=-1)
+        self.assertEqual(self.flight.run(7, self.generate, lambda: None), (b'mine', GENERATED))
+        self.assertFalse(GenerationLock.objects.exists())
+
+
+class ThumbnailSingleFlightViewTests(BlobStorageTestMixin, TestCase):
+    """listing_photo_thumbnail generates through thumbnail_flight."""
+
+    def setUp(self):
+        super().setUp()
+        self.listing = self.create_listing()
+        self.photo = Photo(listing=self.listing)
+        self.photo.store_image(make_jpeg(600, 400))
+        self.photo.save()
+        self.url = reverse('listing_photo_thumbnail', args=[self.photo.pk])
+        thumbnail_flight.reset_stats()
+
+    def test_generates_and_releases_lock(self):
+        """The first request generates, stores and unlocks."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(Photo.objects.get(pk=self.photo.pk).thumbnail_digest)
+        self.assertFalse(GenerationLock.objects.exists())
+        self.assertEqual(thumbnail_flight.stats()[GENERATED], 1)
+
+    def test_placeholder_while_another_process_generates(self):
+        """A request that loses the race and times out gets the placeholder."""
+        GenerationLock.objects.create(
+            key=f'thumbnail:{self.photo.pk}', owner='other-host:1',
+            expires_at=timezone.now() + timedelta(seconds=30),
+        )
+        with mock.patch.object(thumbnail_flight, 'wait_seconds', 0.1), \
+                mock.patch('listings.image_utils.generate_thumbnail') as generate:
+            response = self.client.get(self.url)
+
+        generate.assert_not_called()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(thumbnail_flight.stats()['duplicates_avoided'], 1)
+
+    def test_photo_without_image_skips_lock(self):
+        """A photo with nothing to generate from is a 404 without touching the lock table."""
+        empty = Photo.objects.create(listing=self.listing)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('listing_photo_thumbnail', args=[empty.pk]))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse([q for q in ctx.captured_queries if 'Generation_Lock' in q['sql']])
+
+
+@override_settings(PHOTO_RENDITION_WIDTHS=[320], PHOTO_NEGOTIATED_FORMATS=['WEBP'])
+class RenditionSingleFlightViewTests(BlobStorageTestMixin, TestCase):
+    """Renditions and format variants generate through rendition_flight."""
+
+    def setUp(self):
+        super().setUp()
+        self.listing = self.create_listing()
+        self.photo = Photo(listing=self.listing)
+        self.photo.store_image(make_jpeg(600, 400))
+        self.photo.save()
+        self.url = reverse('listing_photo_rendition', args=[self.photo.pk, 320])
+        rendition_flight.reset_stats()
+
+    def hold_lock(self, kind, width, format):
+        GenerationLock.objects.create(
+            key=f'rendition:{self.photo.pk}:{kind}:{width}:{format}', owner='other-host:1',
+            expires_at=timezone.now() + timedelta(seconds=30),
+        )
+
+    def test_rendition_and_variant_generate_once(self):
+        """The first requests generate and unlock; repeats are lookups."""
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        response = self.client.get(reverse('listing_photo', args=[self.photo.pk]), HTTP_ACCEPT='image/webp')
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.client.get(self.url)
+        self.assertFalse(GenerationLock.objects.exists())
+        self.assertEqual(rendition_flight.stats()[GENERATED], 2)
+
+    def test_placeholder_while_another_process_generates(self):
+        """A JPEG rendition request that times out gets the placeholder."""
+        self.hold_lock('width', 320, 'JPEG')
+        with mock.patch.object(rendition_flight, 'wait_seconds', 0.1), \
+                mock.patch('listings.renditions.generate_rendition') as generate:
+            response = self.client.get(self.url)
+        generate.assert_not_called()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(rendition_flight.stats()[TIMED_OUT], 1)
+
+    def test_variant_timeout_serves_original(self):
+        """A variant still being generated elsewhere falls back to the JPEG."""
+        self.hold_lock('image', 0, 'WEBP')
+        with mock.patch.object(rendition_flight, 'wait_seconds', 0.1):
+            response = self.client.get(reverse('listing_photo', args=[self.photo.pk]), HTTP_ACCEPT='image/webp')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+    def test_unprocessed_photo_gets_placeholder(self):
+        """Renditions of a queued upload aren't cut from the raw bytes."""
+        Photo.objects.filter(pk=self.photo.pk).update(is_processed=False)
+        with mock.patch('listings.renditions.generate_rendition') as generate:
+            response = self.client.get(self.url)
+        generate.assert_not_called()
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('Processing+Photo', response['Location'])
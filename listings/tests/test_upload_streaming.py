@@ -0,0 +1,120 @@
+"""
+Test cases for streaming photo uploads into the blob store and the worker.
+"""
+import tracemalloc
+from io import BytesIO
+from unittest import mock
+
+from PIL import Image
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.test import TestCase
+from listings import image_utils
+from listings.blob_storage import get_blob_storage
+from listings.forms import ListingForm
+from listings.image_utils import generate_derivatives
+from listings.jobs import JOB_HANDLERS
+from listings.models import ImageJob, Photo
+from listings.tests.test_blob_storage import BlobStorageTestMixin
+from listings.tests.test_image_jobs import make_upload_jpeg
+
+
+def temporary_upload(data, name='photo.jpg'):
+    """Return a TemporaryUploadedFile (disk-backed, like a real large upload)."""
+    upload = TemporaryUploadedFile(name, 'image/jpeg', len(data), None)
+    upload.write(data)
+    upload.seek(0)
+    return upload
+
+
+def peak_allocation(func, *args):
+    """Run ``func`` and return the peak Python heap growth in bytes."""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+class StreamingUploadTests(BlobStorageTestMixin, TestCase):
+    """Uploads are hashed and stored without being read into memory whole."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.upload_bytes = make_upload_jpeg(3000, 2000)
+
+    def setUp(self):
+        super().setUp()
+        self.listing = self.create_listing()
+
+    def test_blob_save_streams_file(self):
+        """Streaming a file gives the same digest as saving its bytes."""
+        storage = get_blob_storage()
+        streamed = storage.save(BytesIO(self.upload_bytes))
+        self.assertEqual(streamed, storage.save(self.upload_bytes))
+        self.assertEqual(storage.read(streamed[0]), self.upload_bytes)
+        # The temporary file was renamed away or removed.
+        self.assertEqual([p.name for p in storage.location.glob('.tmp-*')], [])
+
+    def test_save_photos_peak_allocation(self):
+        """Four uploads are stored with a small fraction of one upload in memory."""
+        files = [temporary_upload(self.upload_bytes, f'p{i}.jpg') for i in range(4)]
+        form = ListingForm()
+        form.cleaned_data = {'photos': files}
+
+        peak = peak_allocation(form.save_photos, self.listing)
+
+        self.assertEqual(self.listing.photos.count(), 4)
+        self.assertLess(peak, len(self.upload_bytes) / 4)
+        for photo in self.listing.photos.all():
+            self.assertEqual(photo.image_size, len(self.upload_bytes))
+            self.assertEqual(photo.read_image(), self.upload_bytes)
+
+    def test_worker_decodes_once_for_all_outputs(self):
+        """The compress job streams the upload to Pillow and makes the thumbnail too."""
+        photo = Photo(listing=self.listing, is_processed=False)
+        photo.store_image(temporary_upload(self.upload_bytes))
+        photo.save()
+
+        # Pillow's pixel buffers live outside the Python heap, so count the
+        # opens and decodes instead of measuring memory.
+        with mock.patch.object(image_utils, '_open', wraps=image_utils._open) as opened, \
+                mock.patch.object(image_utils, '_decode', wraps=image_utils._decode) as decoded:
+            JOB_HANDLERS[ImageJob.KIND_COMPRESS](photo.pk)
+
+        self.assertEqual((opened.call_count, decoded.call_count), (1, 1))
+        # Pillow was handed the blob file, not the upload's bytes.
+        self.assertNotIsInstance(opened.call_args.args[0], (bytes, BytesIO))
+        photo.refresh_from_db()
+        self.assertEqual(Image.open(BytesIO(photo.read_image())).size, (1920, 1280))
+        self.assertEqual(Image.open(BytesIO(photo.read_thumbnail())).size, (300, 200))
+
+    def test_worker_compresses_legacy_image_data(self):
+        """Rows that only carry image_data (no blob, no image_size) are processed."""
+        photo = Photo.objects.create(listing=self.listing, image_data=self.upload_bytes, is_processed=False)
+        self.assertIsNone(photo.image_size)
+
+        JOB_HANDLERS[ImageJob.KIND_COMPRESS](photo.pk)
+
+        photo.refresh_from_db()
+        self.assertLess(photo.image_size, len(self.upload_bytes))
+        self.assertEqual(Image.open(BytesIO(photo.read_image())).size, (1920, 1280))
+        self.assertEqual(Image.open(BytesIO(photo.read_thumbnail())).size, (300, 200))
+
+    def test_generate_derivatives(self):
+        """Each output is fitted to its box; unreadable data gives no outputs."""
+        outputs = generate_derivatives(BytesIO(self.upload_bytes), {'small': (100, 100), 'large': (600, 600)})
+        self.assertEqual(Image.open(BytesIO(outputs['small'])).size, (100, 67))
+        self.assertEqual(Image.open(BytesIO(outputs['large'])).size, (600, 400))
+        with self.assertLogs('listings.image_utils', 'ERROR'):
+            self.assertEqual(generate_derivatives(b'not an image', {'small': (100, 100)}), {})
+
+    def test_generate_derivatives_in_extra_formats(self):
+        """Extra formats are keyed (name, format); a None side is unbounded."""
+        outputs = generate_derivatives(BytesIO(self.upload_bytes), {'w': (320, None)}, formats=['WEBP'])
+        self.assertEqual(Image.open(BytesIO(outputs['w'])).format, 'JPEG')
+        webp = Image.open(BytesIO(outputs['w', 'WEBP']))
+        self.assertEqual((webp.format, webp.size), ('WEBP', (320, 213)))
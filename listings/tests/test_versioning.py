@@ -0,0 +1,91 @@
+"""
+Test cases for the shared version counters and process snapshots.
+"""
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from listings import versioning
+
+
+class SnapshotTests(SimpleTestCase):
+    """ProcessSnapshot rebuilds, background refreshes and patches."""
+
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+        self.counter = versioning.VersionCounter('tests:snapshot:version')
+        self.snapshot = versioning.ProcessSnapshot(self.counter, self.build)
+
+    def build(self):
+        self.builds += 1
+        return self.builds
+
+    def test_rebuilds_when_the_counter_moves(self):
+        self.assertEqual(self.snapshot.get(), 1)
+        self.assertEqual(self.snapshot.get(), 1)
+        self.counter.bump()
+        self.assertEqual(self.snapshot.get(), 2)
+        self.assertEqual(self.snapshot.version, self.counter.current())
+        self.snapshot.clear()
+        self.assertEqual(self.snapshot.get(), 3)
+
+    def test_max_age(self):
+        self.snapshot.get()
+        later = versioning.time.monotonic() + 11
+        with mock.patch.object(versioning.time, 'monotonic', return_value=later):
+            self.assertEqual(self.snapshot.get(max_age=60), 1)
+            self.assertEqual(self.snapshot.get(max_age=10), 2)
+
+    def test_old_copy_is_refreshed_in_the_background(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_build():
+            if self.builds:
+                started.set()
+                release.wait(5)
+            return self.build()
+
+        snapshot = versioning.ProcessSnapshot(self.counter, slow_build, refresh_in_background=True)
+        snapshot.get()
+        later = versioning.time.monotonic() + 11
+        with mock.patch.object(versioning.time, 'monotonic', return_value=later):
+            # Neither the request that starts the refresh nor the next one waits for it.
+            self.assertEqual(snapshot.get(max_age=10), 1)
+            self.assertTrue(started.wait(5))
+            self.assertEqual(snapshot.get(max_age=10), 1)
+        release.set()
+        with snapshot._building:
+            pass
+        self.assertEqual(snapshot.get(max_age=10), 2)
+        self.assertEqual(self.builds, 2)
+
+    def test_stale_copy_is_served_while_another_thread_rebuilds(self):
+        self.snapshot.get()
+        self.counter.bump()
+        with self.snapshot._building:
+            self.assertEqual(self.snapshot.get(), 1)
+        self.assertEqual(self.snapshot.get(), 2)
+
+    def test_apply_change(self):
+        load = mock.Mock(return_value=10)
+
+        def change(value, loaded):
+            return value + loaded
+
+        # Nothing built: only the counter moves.
+        version = self.counter.current()
+        self.snapshot.apply_change(load, change)
+        load.assert_not_called()
+        self.assertNotEqual(self.counter.current(), version)
+
+        self.assertEqual(self.snapshot.get(), 1)
+        self.snapshot.apply_change(load, change)
+        self.assertEqual(self.snapshot.get(), 11)
+        self.assertEqual(self.builds, 1)
+
+        # Another process bumped first: rebuild instead of patching.
+        self.counter.bump()
+        self.snapshot.apply_change(load, change)
+        self.assertEqual(self.snapshot.get(), 2)
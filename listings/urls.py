@@ -9,12 +9,14 @@ urlpatterns = [
     path('about/', views.about, name='about'),
     path('featured/update/', views.update_featured_listing, name='featured_listing_update'),
     path('listings/', views.all_listings, name='listings'),
+    path('listings/autocomplete/', views.listing_autocomplete, name='listing_autocomplete'),
     path('listings/<int:listing_id>/', views.ListingDetailView.as_view(), name='listing_detail'),
     path('add-listing/', views.add_listing, name='add_listing'),
     path('listings/<int:listing_id>/edit/', views.edit_listing, name='edit_listing'),
     path('listings/<int:listing_id>/toggle-visibility/', views.toggle_listing_visibility, name='toggle_visibility'),
     path('photo/<int:photo_id>/', views.listing_photo, name='listing_photo'),
     path('photo/<int:photo_id>/thumbnail/', views.listing_photo_thumbnail, name='listing_photo_thumbnail'),
+    path('photo/<int:photo_id>/<int:width>/', views.listing_photo_rendition, name='listing_photo_rendition'),
 
     path(
         'login/',
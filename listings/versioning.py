@@ -0,0 +1,204 @@
+"""
+Version counters that tell every process when cached listing data is stale.
+
+The fragment cache, the facet counts, the listing index, the address
+autocomplete index and the filter lookups all keep something derived from
+the database. Each has a ``VersionCounter``: an integer in a Django cache
+that is bumped when the rows behind it change. Shared caches put the
+counter in their keys, so old entries are never read again; process-local
+copies (``ProcessSnapshot``) remember the version they were built at and
+rebuild when it moves.
+
+Saves and deletes bump the counter through signals. Code that changes the
+rows with ``QuerySet.update()``, which sends no signals, must call
+``bump()`` itself.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+
+logger = logging.getLogger(__name__)
+
+
+class VersionCounter:
+    """
+    A version number kept under ``key`` in the cache that ``get_cache()``
+    returns. ``get_cache`` is called on every use, so settings overridden
+    at run time (and in tests) take effect.
+
+    A bump only reaches other processes if that cache is shared by every
+    process that serves requests or changes the rows, image workers
+    included: Redis, Memcached or a DatabaseCache. With a per-process
+    backend such as the default LocMemCache, each process only sees its own
+    bumps. Everything built on a counter therefore also bounds its age:
+    cached entries expire after their ``TIMEOUT`` and process copies are
+    rebuilt after their ``MAX_AGE``, and until then other processes may
+    serve data from before the change.
+    """
+
+    def __init__(self, key, get_cache=None):
+        self.key = key
+        self.get_cache = get_cache or (lambda: caches['default'])
+
+    def current(self):
+        """Return the current version."""
+        cache = self.get_cache()
+        version = cache.get(self.key)
+        if version is None:
+            # Start from the clock rather than 0, so a counter that was
+            # evicted never comes back with a value already seen.
+            cache.add(self.key, time.time_ns(), timeout=None)
+            version = cache.get(self.key)
+        return version
+
+    def bump(self):
+        """Move to a new version; return it, or None if it couldn't be read back."""
+        cache = self.get_cache()
+        cache.add(self.key, time.time_ns(), timeout=None)
+        try:
+            return cache.incr(self.key)
+        except ValueError:
+            # Evicted between add() and incr(); the next read starts afresh.
+            return None
+
+    def _bump_now_and_on_commit(self, sender, **kwargs):
+        self.bump()
+        # Again on commit: a request that ran between the bump and the
+        # commit may have cached the old rows under the new version.
+        transaction.on_commit(self.bump)
+
+    def bump_on_change(self, models, dispatch_uid):
+        """Bump whenever a row of one of ``models`` is saved or deleted."""
+        for model in models:
+            receiver = self._bump_now_and_on_commit
+            post_save.connect(receiver, sender=model, dispatch_uid=f'{dispatch_uid}-save-{model}')
+            post_delete.connect(receiver, sender=model, dispatch_uid=f'{dispatch_uid}-delete-{model}')
+
+
+_State = namedtuple('_State', 'value version built')
+
+
+class ProcessSnapshot:
+    """
+    One process's copy of something built from the database, such as an
+    index, kept at the version of a ``VersionCounter``.
+
+    ``get()`` rebuilds the copy when the counter has moved or, given
+    ``max_age``, when the copy is older than that many seconds. Builds run
+    outside ``lock``, one at a time; while one is running, other threads
+    keep being served the copy they would have replaced. With
+    ``refresh_in_background`` a copy that is merely too old is rebuilt by a
+    background thread, so no request waits for it.
+
+    ``lock`` is held while the copy is swapped or patched. Readers of a copy
+    that ``apply_change()`` modifies in place must hold it too.
+    """
+
+    def __init__(self, counter, build, refresh_in_background=False):
+        self.counter = counter
+        self.build = build
+        self.refresh_in_background = refresh_in_background
+        self.lock = threading.Lock()
+        self._building = threading.Lock()
+        self._state = None
+
+    @property
+    def version(self):
+        """The version this process's copy was built at, or None."""
+        state = self._state
+        return state.version if state is not None else None
+
+    def get(self, max_age=None):
+        """Return this process's copy, rebuilt first if it is stale."""
+        version = self.counter.current()
+        state = self._state
+        if state is not None and state.version == version:
+            if max_age is None or time.monotonic() - state.built <= max_age:
+                return state.value
+            if self.refresh_in_background:
+                self._refresh_later()
+                return state.value
+        if state is not None and self._building.locked():
+            # Another thread is already rebuilding.
+            return state.value
+        with self._building:
+            state = self._state
+            if state is not None and state.version == version and (
+                max_age is None or time.monotonic() - state.built <= max_age
+            ):
+                return state.value
+            return self._rebuild(version)
+
+    def set(self, value, version):
+        """Install ``value`` as this process's copy at ``version``."""
+        with self.lock:
+            self._state = _State(value, version, time.monotonic())
+
+    def clear(self):
+        """Drop this process's copy; the next ``get()`` rebuilds it."""
+        with self.lock:
+            self._state = None
+
+    def _rebuild(self, version):
+        # The version is read before building, so a change committed while
+        # the build runs leaves the copy behind and the next get() rebuilds.
+        value = self.build()
+        self.set(value, version)
+        return value
+
+    def _refresh_later(self):
+        if self._building.acquire(blocking=False):
+            threading.Thread(target=self._refresh, daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self._rebuild(self.counter.current())
+        except Exception:
+            logger.exception('Rebuilding %r in the background failed', self.build)
+        finally:
+            self._building.release()
+            connection.close()
+
+    def apply_change(self, load, change):
+        """
+        Bring this process's copy up to date after the caller changed the
+        rows behind it, and bump the counter so other processes rebuild.
+
+        ``load()`` reads what changed from the database and
+        ``change(value, loaded)`` returns the patched copy. Both only run if
+        this process has a copy; it is patched only if no other process
+        bumped the counter since it was built, otherwise the next ``get()``
+        rebuilds it.
+        """
+        if self._state is None:
+            # Nothing built here; just tell the other processes.
+            self.counter.bump()
+            return
+        loaded = load()
+        version = self.counter.bump()
+        with self.lock:
+            state = self._state
+            if state is not None and version is not None and state.version == version - 1:
+                self._state = state._replace(value=change(state.value, loaded), version=version)
+
+    def patch_on_change(self, model, load, change, dispatch_uid, enabled=None):
+        """
+        Call ``apply_change()`` after each committed save or delete of a
+        ``model`` row, with ``load(pk)`` and ``change(value, pk, loaded)``.
+        ``enabled()``, if given, is checked first.
+        """
+        def changed(sender, instance, **kwargs):
+            if enabled is not None and not enabled():
+                return
+            pk = instance.pk
+            transaction.on_commit(lambda: self.apply_change(
+                lambda: load(pk), lambda value, loaded: change(value, pk, loaded)
+            ))
+
+        post_save.connect(changed, sender=model, weak=False, dispatch_uid=f'{dispatch_uid}-save')
+        post_delete.connect(changed, sender=model, weak=False, dispatch_uid=f'{dispatch_uid}-delete')
@@ -2,14 +2,17 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import logout
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
 from django.template.loader import render_to_string
+from django.views.decorators.vary import vary_on_headers
 from django.views.generic import DetailView
 from django.views.generic.edit import FormMixin
 from django.db.models import Q
-from decimal import Decimal
+import hashlib
 import logging
 import re
 from .forms import ContactForm
@@ -21,10 +24,15 @@ from .forms import ListingForm
 from .models import Listing
 
 from .models import (
-    Listing, Photo, Neighborhood, PropertyType,
-    Status, Pricebucket, SearchLog, OmahaLocation
+    Listing, Photo, Status, OmahaLocation, PhotoRendition,
+    photo_metadata_prefetch,
 )
 from .forms import ListingForm, OmahaLocationForm, ListingStatusPriceForm
+from .blob_storage import BlobNotFound, get_blob_storage
+from .renditions import PROCESSING_PLACEHOLDER_URL
+from .single_flight import TIMED_OUT, thumbnail_flight
+from .search_logging import record_search
+from . import autocomplete, facets, fragment_cache, listing_index, listing_search, lookups, pagination, reports
 
 logger = logging.getLogger(__name__)
 
@@ -46,11 +54,13 @@ def _is_listing_sold(listing):
 def home(request):
     """Public homepage showing featured listing and welcome message."""
     featured_listing = Listing.objects.filter(is_visible=True, is_featured=True).first()
+    featured_photo = featured_listing.photos.metadata().first() if featured_listing else None
     featured_status_text = _listing_status_text(featured_listing)
     is_featured_sold = request.user.is_authenticated and _is_listing_sold(featured_listing)
 
     context = {
         'featured_listing': featured_listing,
+        'featured_photo': featured_photo,
         'is_featured_sold': is_featured_sold,
         'featured_status_text': featured_status_text,
     }
@@ -125,16 +135,23 @@ def all_listings(request):
         if not is_ajax and 'HTTP_X_REQUESTED_WITH' in request.META:
             is_ajax = request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest'
 
-    listings = Listing.objects.prefetch_related('photos').select_related('status_id', 'neighborhood', 'property_type')
+    # Cards only show the primary photo, joined in without its blobs.
+    listings = Listing.objects.select_related(
+        'status_id', 'neighborhood', 'property_type', 'primary_photo'
+    ).defer('primary_photo__image_data', 'primary_photo__thumbnail_data')
 
     neighborhood_id = request.GET.get('neighborhood', '').strip()
     property_type_id = request.GET.get('type', '').strip()
     price_sort = request.GET.get('price', '').strip()
     price_range_id = request.GET.get('price_range', '').strip()
     visibility = request.GET.get('visibility', '').strip()
+    search_text = request.GET.get('q', '').strip()[:listing_search.MAX_LENGTH]
 
     should_log_search = False
     search_log_pricebucket = None
+    # Bucket the listings are filtered on; a bucket whose range doesn't
+    # parse is still selected and logged, but filters nothing.
+    price_range_filter = None
     search_log_neighborhood = None
     search_log_property_type = None
 
@@ -142,7 +159,7 @@ def all_listings(request):
         try:
             neighborhood_id_int = int(neighborhood_id)
             listings = listings.filter(neighborhood_id=neighborhood_id_int)
-            search_log_neighborhood = Neighborhood.objects.filter(pk=neighborhood_id_int).first()
+            search_log_neighborhood = lookups.neighborhoods.get(neighborhood_id_int)
             should_log_search = True
         except (ValueError, TypeError):
             pass
@@ -151,7 +168,7 @@ def all_listings(request):
         try:
             property_type_id_int = int(property_type_id)
             listings = listings.filter(property_type_id=property_type_id_int)
-            search_log_property_type = PropertyType.objects.filter(pk=property_type_id_int).first()
+            search_log_property_type = lookups.property_types.get(property_type_id_int)
             should_log_search = True
         except (ValueError, TypeError):
             pass
@@ -159,28 +176,30 @@ def all_listings(request):
     if price_range_id:
         try:
             price_range_id_int = int(price_range_id)
-            pricebucket = Pricebucket.objects.filter(pk=price_range_id_int).first()
-            if pricebucket:
-                range_str = pricebucket.range
-                min_price, max_price = parse_price_range(range_str)
-
-                if min_price is not None:
-                    if max_price is not None:
-                        listings = listings.filter(price__gte=min_price, price__lt=max_price)
-                    else:
-                        listings = listings.filter(price__gte=min_price)
-
+            # An id that names no bucket is ignored, and not logged.
+            pricebucket = lookups.pricebuckets.get(price_range_id_int)
+            if pricebucket is not None:
+                if pricebucket.min_price is not None:
+                    # Listing.save() and assign_pricebuckets() keep
+                    # pricebucket in step with price.
+                    price_range_filter = pricebucket.pk
+                    listings = listings.filter(pricebucket_id=price_range_filter)
                 search_log_pricebucket = pricebucket
                 should_log_search = True
         except (ValueError, TypeError):
             pass
 
-    if price_sort == 'low-high':
-        listings = listings.order_by('price')
-    elif price_sort == 'high-low':
-        listings = listings.order_by('-price')
-    else:
-        listings = listings.order_by('-listed_date')
+    # listing_id breaks ties, so offset and cursor pages agree on row order.
+    listings = listings.order_by(*pagination.ordering(price_sort))
+
+    # Keyword search combines with the filters above. Without a price sort
+    # the best matches come first; that order has no keyset cursors.
+    rank_by_relevance = False
+    if listing_search.terms(search_text):
+        listings = listing_search.search(listings, search_text)
+        if not price_sort and listing_search.available(listings.db):
+            listings = listings.order_by('search_rank', *pagination.ordering(price_sort))
+            rank_by_relevance = True
 
     # visibility filter for authenticated users (optional)
     # visibility filter
@@ -194,27 +213,25 @@ def all_listings(request):
     else:
         listings = listings.filter(is_visible=True)
 
-    if should_log_search:
-        SearchLog.objects.create(
+    # AJAX clients that send ``cursor`` (empty for the first page) get keyset
+    # pages: no COUNT and no OFFSET, however far they have scrolled.
+    cursor = request.GET.get('cursor') if is_ajax else None
+    if cursor is not None and rank_by_relevance:
+        # Relevance order has no keyset; next_cursor is null for it.
+        return JsonResponse({'error': 'Results ranked by relevance are paged by page number.'}, status=400)
+
+    # Loading the next cursor page is not a new search.
+    if should_log_search and not cursor:
+        # Buffered and written in batches when SEARCH_LOG_BUFFER is enabled.
+        record_search(
             pricebucket=search_log_pricebucket,
             neighborhood=search_log_neighborhood,
             property_type=search_log_property_type,
             timestamp=timezone.now()
         )
 
-    paginator = Paginator(listings, 12)
-    page = request.GET.get('page')
-
-    try:
-        paginated_listings = paginator.page(page)
-    except PageNotAnInteger:
-        paginated_listings = paginator.page(1)
-    except EmptyPage:
-        paginated_listings = paginator.page(paginator.num_pages)
-
-    neighborhoods = Neighborhood.objects.all().order_by('name')
-    property_types = PropertyType.objects.all().order_by('name')
-    pricebuckets = Pricebucket.objects.all().order_by('pricebucket_id')
+    if cursor is not None:
+        return _keyset_listings_response(request, listings, price_sort, cursor)
 
     try:
         selected_neighborhood = int(neighborhood_id) if neighborhood_id else None
@@ -226,10 +243,79 @@ def all_listings(request):
     except (ValueError, TypeError):
         selected_type = None
 
+    selected_price_range = search_log_pricebucket.pk if search_log_pricebucket else None
+
+    page = request.GET.get('page')
+
+    # Repeat AJAX pages are served from the rendered-fragment cache. Unknown
+    # sort names are rendered into the pagination links, so they aren't cached.
+    fragment_key = None
+    if is_ajax and fragment_cache.enabled() and price_sort in pagination.SORTS:
+        try:
+            page_number = int(page)
+        except (ValueError, TypeError):
+            page_number = 1
+        fragment_key = fragment_cache.cache_key(
+            fragment_cache.viewer_class(request.user),
+            selected_neighborhood,
+            selected_type,
+            selected_price_range,
+            price_sort,
+            visibility if visibility in ('hidden', 'all') else '',
+            page_number,
+            search_text,
+        )
+        payload = fragment_cache.get_fragments(fragment_key)
+        if payload is not None:
+            return JsonResponse(payload)
+
+    # The in-memory index holds visible listings only and no text, so staff
+    # views of hidden listings and keyword searches go to the database.
+    object_list = listings
+    if (
+        listing_index.enabled()
+        and not search_text
+        and not (request.user.is_authenticated and visibility in ('hidden', 'all'))
+    ):
+        object_list = listing_index.IndexedListings(
+            listing_index.get_index().query(
+                price_sort,
+                neighborhood=selected_neighborhood,
+                property_type=selected_type,
+                pricebucket=price_range_filter,
+            ),
+            listings,
+        )
+
+    paginator = Paginator(object_list, 12)
+
     try:
-        selected_price_range = int(price_range_id) if price_range_id else None
-    except (ValueError, TypeError):
-        selected_price_range = None
+        paginated_listings = paginator.page(page)
+    except PageNotAnInteger:
+        paginated_listings = paginator.page(1)
+    except EmptyPage:
+        paginated_listings = paginator.page(paginator.num_pages)
+
+    neighborhoods = lookups.neighborhoods.all()
+    property_types = lookups.property_types.all()
+    pricebuckets = lookups.pricebuckets.all()
+
+    # How many listings each dropdown option would return.
+    if request.user.is_authenticated and visibility in ('hidden', 'all'):
+        facet_visibility = visibility
+    else:
+        facet_visibility = 'visible'
+    facet_counts = facets.get_counts(facet_visibility, {
+        'neighborhood': selected_neighborhood,
+        'type': selected_type,
+        'price_range': price_range_filter,
+    }, search_text)
+
+    # Lets "Load more" continue from this page with keyset pages.
+    next_cursor = (
+        pagination.encode_cursor(paginated_listings[-1], price_sort)
+        if paginated_listings.has_next() and not rank_by_relevance else None
+    )
 
     context = {
         'listings': paginated_listings,
@@ -241,6 +327,9 @@ def all_listings(request):
         'selected_price': price_sort or '',
         'selected_price_range': selected_price_range,
         'selected_visibility': visibility or '',
+        'selected_query': search_text,
+        'facets': facet_counts,
+        'next_cursor': next_cursor,
     }
 
     if is_ajax:
@@ -253,16 +342,22 @@ def all_listings(request):
                 'selected_neighborhood': selected_neighborhood,
                 'selected_type': selected_type,
                 'selected_visibility': visibility or '',
+                'selected_query': search_text,
             }, request=request)
 
-            response = JsonResponse({
+            payload = {
                 'listings_html': listings_html,
                 'pagination_html': pagination_html,
                 'has_listings': paginated_listings.paginator.count > 0,
                 'total_count': paginated_listings.paginator.count,
                 'current_page': paginated_listings.number,
                 'total_pages': paginated_listings.paginator.num_pages,
-            })
+                'facets': facet_counts,
+                'next_cursor': next_cursor,
+            }
+            if fragment_key is not None:
+                fragment_cache.set_fragments(fragment_key, payload)
+            response = JsonResponse(payload)
             response['Content-Type'] = 'application/json'
             return response
         except Exception as e:
@@ -279,27 +374,41 @@ def all_listings(request):
     return render(request, 'listings/all_listings.html', context)
 
 
-def parse_price_range(range_str):
-    """
-    Parse a price range string and return (min_price, max_price) tuple.
-    """
+def listing_autocomplete(request):
+    """JSON address suggestions for the listings search box."""
+    text = request.GET.get('q', '').strip()[:autocomplete.MAX_QUERY_LENGTH]
     try:
-        range_str = range_str.replace('$', '').replace(',', '').strip()
-
-        if '+' in range_str:
-            min_price = Decimal(range_str.replace('+', '').strip())
-            return (min_price, None)
+        limit = min(max(int(request.GET.get('limit', '')), 1), autocomplete.MAX_LIMIT)
+    except ValueError:
+        limit = None
+    suggestions = autocomplete.complete(text, limit) if text else []
+    return JsonResponse({
+        'query': text,
+        'results': [
+            {
+                'id': listing_id,
+                'address': address,
+                'url': reverse('listing_detail', args=[listing_id]),
+            }
+            for listing_id, address in suggestions
+        ],
+    })
 
-        if ' - ' in range_str:
-            parts = range_str.split(' - ')
-            if len(parts) == 2:
-                min_price = Decimal(parts[0].strip())
-                max_price = Decimal(parts[1].strip())
-                return (min_price, max_price)
 
-        return (None, None)
-    except (ValueError, TypeError):
-        return (None, None)
+def _keyset_listings_response(request, listings, price_sort, cursor):
+    """JSON for one keyset page of the listings grid."""
+    try:
+        page, next_cursor = pagination.keyset_page(listings, price_sort, cursor)
+    except pagination.InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+
+    listings_html = render_to_string('listings/listing_fragment.html', {'listings': page}, request=request)
+    return JsonResponse({
+        'listings_html': listings_html,
+        'pagination_html': '',
+        'has_listings': bool(page),
+        'next_cursor': next_cursor,
+    })
 
 
 @login_required
@@ -419,58 +528,357 @@ def custom_logout(request):
     return render(request, 'accounts/logout.html')
 
 
+def _image_content_type(image_data):
+    """Sniff the image content type from the leading magic bytes."""
+    image_header = image_data[:8]
+    if image_header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if image_header.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if image_header.startswith(b'GIF'):
+        return 'image/gif'
+    if image_header.startswith(b'RIFF') and image_data[8:12] == b'WEBP':
+        return 'image/webp'
+    if image_data[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'image/avif'
+    return 'image/png'
+
+
+class _RangeNotSatisfiable(Exception):
+    """Raised when a Range header cannot be satisfied for the resource size."""
+
+
+_BYTE_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _photo_validators(digest, modified):
+    """Return the (etag, last_modified) validators for a stored photo blob."""
+    etag = f'"{digest}"' if digest else None
+    last_modified = int(modified.timestamp()) if modified else None
+    return etag, last_modified
+
+
+def _photo_not_modified(request, etag, last_modified):
+    """Return a 304/412 response if the request's preconditions allow it, else None."""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        _set_photo_cache_headers(response, etag, last_modified)
+    return response
+
+
+def _set_photo_cache_headers(response, etag, last_modified):
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'public, max-age=31536000'
+
+
+def _requested_byte_range(request, size, etag, last_modified):
+    """
+    Return the inclusive (start, end) byte range requested by a single-range
+    ``Range`` header, or None when the full body should be sent.
+    """
+    header = request.headers.get('Range', '').strip()
+    if not header or request.method not in ('GET', 'HEAD'):
+        return None
+
+    # A stale If-Range validator means the client wants the whole new body.
+    if_range = request.headers.get('If-Range', '').strip()
+    if if_range:
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            if if_range != etag:
+                return None
+        elif parse_http_date_safe(if_range) != last_modified:
+            return None
+
+    match = _BYTE_RANGE_RE.match(header)
+    if not match or not any(match.groups()):
+        # Multiple or malformed ranges: fall back to a normal 200 response.
+        return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        suffix_length = int(last)
+        if suffix_length == 0:
+            raise _RangeNotSatisfiable()
+        start, end = max(0, size - suffix_length), size - 1
+
+    if start >= size:
+        raise _RangeNotSatisfiable()
+    return start, end
+
+
+@vary_on_headers('Accept')
 def listing_photo(request, photo_id):
-    """View to serve listing photos from binary data."""
-    photo = get_object_or_404(Photo, pk=photo_id)
-    if photo.image_data:
-        image_header = photo.image_data[:8]
-        if image_header.startswith(b'\x89PNG\r\n\x1a\n'):
-            content_type = 'image/png'
-        elif image_header.startswith(b'\xff\xd8\xff'):
-            content_type = 'image/jpeg'
-        elif image_header.startswith(b'GIF'):
-            content_type = 'image/gif'
-        else:
-            content_type = 'image/png'
+    """
+    Serve a full-size listing photo.
 
-        response = HttpResponse(photo.image_data, content_type=content_type)
-        response['Cache-Control'] = 'public, max-age=31536000'
-        return response
-    return HttpResponse(status=404)
+    Answers If-None-Match / If-Modified-Since revalidation from the photo row
+    alone and supports single byte-range requests. Clients that accept WebP
+    or AVIF get a stored variant in that format.
+    """
+    variant = _negotiated_variant(request, photo_id, PhotoRendition.KIND_IMAGE)
+    if variant is not None:
+        etag, last_modified = _photo_validators(variant.digest, variant.created_date)
+        not_modified = _photo_not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        try:
+            return _blob_photo_response(request, variant.digest, variant.size, etag, last_modified)
+        except BlobNotFound:
+            logger.warning("Blob missing for %s; serving the original", variant)
 
+    photo = get_object_or_404(Photo.objects.metadata(), pk=photo_id)
 
+    if photo.image_digest and photo.image_size is not None:
+        etag, last_modified = _photo_validators(photo.image_digest, photo.updated_date)
+        not_modified = _photo_not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        try:
+            return _blob_photo_response(request, photo.image_digest, photo.image_size, etag, last_modified)
+        except BlobNotFound:
+            logger.warning("Blob missing for photo id %s; falling back to stored bytes", photo_id)
+
+    # Rows not yet moved to the blob store: validators come from the bytes.
+    image_data = photo.read_image()
+    if not image_data:
+        return HttpResponse(status=404)
+    etag, last_modified = _photo_validators(hashlib.sha256(image_data).hexdigest(), photo.updated_date)
+    not_modified = _photo_not_modified(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    content_type = _image_content_type(image_data)
+    try:
+        byte_range = _requested_byte_range(request, len(image_data), etag, last_modified)
+    except _RangeNotSatisfiable:
+        return _range_not_satisfiable(len(image_data))
+    if byte_range:
+        start, end = byte_range
+        return _partial_photo_response(
+            image_data[start:end + 1], content_type, start, end, len(image_data), etag, last_modified
+        )
+    response = HttpResponse(image_data, content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    _set_photo_cache_headers(response, etag, last_modified)
+    return response
+
+
+def _blob_photo_response(request, digest, size, etag, last_modified):
+    """Build a full or partial response for an image held in the blob store."""
+    try:
+        byte_range = _requested_byte_range(request, size, etag, last_modified)
+    except _RangeNotSatisfiable:
+        return _range_not_satisfiable(size)
+
+    fh = get_blob_storage().open(digest)
+    content_type = _image_content_type(fh.read(12))
+    if byte_range:
+        with fh:
+            start, end = byte_range
+            fh.seek(start)
+            return _partial_photo_response(
+                fh.read(end - start + 1), content_type, start, end, size, etag, last_modified
+            )
+
+    # Stream the whole blob; FileResponse closes the file when it is done.
+    fh.seek(0)
+    response = FileResponse(fh, content_type=content_type)
+    # The blob's file name is its digest, which is no use to the client.
+    del response['Content-Disposition']
+    response['Accept-Ranges'] = 'bytes'
+    _set_photo_cache_headers(response, etag, last_modified)
+    return response
+
+
+def _partial_photo_response(body, content_type, start, end, size, etag, last_modified):
+    response = HttpResponse(body, status=206, content_type=content_type)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    _set_photo_cache_headers(response, etag, last_modified)
+    return response
+
+
+def _range_not_satisfiable(size):
+    response = HttpResponse(status=416)
+    response['Content-Range'] = f'bytes */{size}'
+    return response
+
+
+def _negotiated_variant(request, photo_id, kind, width=0):
+    """
+    Return the PhotoRendition to serve for the request's ``Accept`` header,
+    generating it on first use, or None if the original should be served.
+    """
+    from .renditions import get_or_create_rendition, get_or_create_variant, preferred_format
+
+    format = preferred_format(request.headers.get('Accept', ''))
+    if format is None:
+        return None
+
+    rendition = PhotoRendition.objects.filter(
+        photo_id=photo_id, kind=kind, width=width, format=format
+    ).first()
+    if rendition is not None:
+        return rendition
+
+    photo = Photo.objects.metadata().filter(pk=photo_id).first()
+    if photo is None or not photo.is_processed:
+        # Variants of a queued upload would be cut from the uncompressed bytes.
+        return None
+    try:
+        if kind == PhotoRendition.KIND_WIDTH:
+            rendition, _ = get_or_create_rendition(photo, width, format=format)
+        else:
+            rendition, _ = get_or_create_variant(photo, kind, format)
+    except Exception:
+        logger.exception("Error generating %s %s variant for photo id %s", format, kind, photo_id)
+        return None
+    # None if generation failed or is still running in another request;
+    # the original is served instead.
+    return rendition
+
+
+def _rendition_response(request, rendition):
+    etag, last_modified = _photo_validators(rendition.digest, rendition.created_date)
+    not_modified = _photo_not_modified(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    data = rendition.read()
+    response = HttpResponse(data, content_type=_image_content_type(data))
+    _set_photo_cache_headers(response, etag, last_modified)
+    return response
+
+
+@vary_on_headers('Accept')
 def listing_photo_thumbnail(request, photo_id):
-    """View to serve listing photo thumbnails from binary data."""
+    """
+    Serve a listing photo thumbnail, generating it on first request.
+
+    Stored thumbnails answer revalidation from the photo row alone. Clients
+    that accept WebP or AVIF get a stored variant in that format.
+    """
     from .image_utils import generate_thumbnail
 
-    photo = get_object_or_404(Photo, pk=photo_id)
+    variant = _negotiated_variant(request, photo_id, PhotoRendition.KIND_THUMBNAIL)
+    if variant is not None:
+        try:
+            return _rendition_response(request, variant)
+        except BlobNotFound:
+            logger.warning("Blob missing for %s; serving the original", variant)
+
+    photo = get_object_or_404(Photo.objects.metadata(), pk=photo_id)
+
+    if photo.thumbnail_digest:
+        etag, last_modified = _photo_validators(photo.thumbnail_digest, photo.updated_date)
+        not_modified = _photo_not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
 
     # Serve existing thumbnail if present
-    if getattr(photo, 'thumbnail_data', None):
-        response = HttpResponse(photo.thumbnail_data, content_type='image/jpeg')
-        response['Cache-Control'] = 'public, max-age=31536000'
-        return response
+    thumbnail = photo.read_thumbnail()
+    if thumbnail:
+        return _thumbnail_response(request, thumbnail, photo)
+
+    # Uploads waiting for run_image_worker get a placeholder, not an inline render.
+    if not photo.is_processed:
+        return _processing_placeholder()
+
+    # Nothing to generate from: answer without taking the generation lock.
+    if not photo.has_image():
+        return HttpResponse(status=404)
+
+    # If no thumbnail exists, generate it from the full-size image. Only one
+    # request per photo does the work; concurrent ones wait for its result.
+    def generate():
+        thumbnail = generate_thumbnail(photo.read_image())
+        if thumbnail:
+            # save thumbnail for future requests (best-effort)
+            try:
+                photo.store_thumbnail(thumbnail)
+                photo.save(update_fields=Photo.THUMBNAIL_FIELDS)
+            except Exception:
+                # Do not fail the request if saving fails; log and continue
+                logger.exception("Failed to save generated thumbnail for photo id %s", photo_id)
+        return thumbnail
+
+    def lookup():
+        stored = Photo.objects.metadata().filter(pk=photo_id).first()
+        return stored.read_thumbnail() if stored else None
+
+    try:
+        thumbnail, outcome = thumbnail_flight.run(photo_id, generate, lookup)
+    except Exception:
+        logger.exception("Error generating thumbnail for photo id %s", photo_id)
+        return HttpResponse(status=404)
+
+    if thumbnail:
+        return _thumbnail_response(request, thumbnail, photo)
+    if outcome == TIMED_OUT:
+        return _processing_placeholder()
+    return HttpResponse(status=404)
+
+
+def _processing_placeholder():
+    response = redirect(PROCESSING_PLACEHOLDER_URL)
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _thumbnail_response(request, thumbnail, photo):
+    digest = photo.thumbnail_digest or hashlib.sha256(thumbnail).hexdigest()
+    etag, last_modified = _photo_validators(digest, photo.updated_date)
+    not_modified = _photo_not_modified(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    response = HttpResponse(thumbnail, content_type='image/jpeg')
+    _set_photo_cache_headers(response, etag, last_modified)
+    return response
+
 
-    # If no thumbnail exists, try to generate from image_data
-    if getattr(photo, 'image_data', None):
+@vary_on_headers('Accept')
+def listing_photo_rendition(request, photo_id, width):
+    """
+    Serve a photo resized to one of the configured srcset widths.
+
+    The rendition is generated and stored on first request; later requests
+    are served (or revalidated) from the stored rendition. Clients that
+    accept WebP or AVIF get the rendition in that format.
+    """
+    from .renditions import get_or_create_rendition, rendition_widths
+
+    if width not in rendition_widths():
+        raise Http404("Unsupported rendition width.")
+
+    rendition = _negotiated_variant(request, photo_id, PhotoRendition.KIND_WIDTH, width)
+    if rendition is None:
+        rendition = PhotoRendition.objects.filter(
+            photo_id=photo_id, kind=PhotoRendition.KIND_WIDTH, width=width, format='JPEG'
+        ).first()
+    if rendition is None:
+        photo = get_object_or_404(Photo.objects.metadata(), pk=photo_id)
+        # Renditions of a queued upload would be cut from the uncompressed bytes.
+        if not photo.is_processed:
+            return _processing_placeholder()
         try:
-            thumbnail = generate_thumbnail(photo.image_data)
-            if thumbnail:
-                # save thumbnail for future requests (best-effort)
-                try:
-                    photo.thumbnail_data = thumbnail
-                    photo.save(update_fields=['thumbnail_data'])
-                except Exception:
-                    # Do not fail the request if saving fails; log and continue
-                    logger.exception("Failed to save generated thumbnail for photo id %s", photo_id)
-
-                response = HttpResponse(thumbnail, content_type='image/jpeg')
-                response['Cache-Control'] = 'public, max-age=31536000'
-                return response
+            rendition, outcome = get_or_create_rendition(photo, width)
         except Exception:
-            logger.exception("Error generating thumbnail for photo id %s", photo_id)
+            logger.exception("Error generating %spx rendition for photo id %s", width, photo_id)
+            return HttpResponse(status=404)
+        if rendition is None:
+            if outcome == TIMED_OUT:
+                return _processing_placeholder()
+            return HttpResponse(status=404)
 
-    return HttpResponse(status=404)
+    return _rendition_response(request, rendition)
 
 
 def omaha(request):
@@ -555,63 +963,61 @@ def delete_omaha_location(request, location_id):
 
 
 
+def _report_period(request):
+    """
+    Return ``(start_day, end_day, title)`` for a report request, with
+    ``end_day`` exclusive, or None if it names no period. ``start`` and
+    ``end`` (inclusive YYYY-MM-DD dates) take precedence over ``month`` and
+    ``year``. Raises ValueError or TypeError for invalid values, including
+    an ``end`` before ``start`` or a range longer than
+    ``reports.MAX_RANGE_DAYS``.
+    """
+    from datetime import date, timedelta
+
+    if 'start' in request.GET:
+        start_day = date.fromisoformat(request.GET.get('start'))
+        last_day = date.fromisoformat(request.GET.get('end', ''))
+        end_day = last_day + timedelta(days=1)
+        if end_day <= start_day:
+            raise ValueError("The report end date is before its start date.")
+        if (end_day - start_day).days > reports.MAX_RANGE_DAYS:
+            raise ValueError(f"Report ranges are limited to {reports.MAX_RANGE_DAYS} days.")
+        return start_day, end_day, f"{start_day} to {last_day}"
+    if 'month' in request.GET and 'year' in request.GET:
+        start_day, end_day = reports.month_bounds(int(request.GET.get('year')), int(request.GET.get('month')))
+        return start_day, end_day, f"{start_day:%B} {start_day.year}"
+    return None
+
+
 @login_required
 def generate_report(request):
-    """View for generating monthly search reports."""
-    from django.db.models import Count
-    from datetime import datetime
-
+    """
+    View for generating search reports for a month (``month``/``year``) or a
+    date range (``start``/``end``), optionally broken down by ``granularity``
+    'week' or 'day'.
+    """
     report_data = None
     selected_month = None
     selected_year = None
+    selected_granularity = request.GET.get('granularity') or None
 
-    if request.method == 'GET' and 'month' in request.GET and 'year' in request.GET:
-        try:
+    try:
+        if 'month' in request.GET and 'year' in request.GET:
             selected_month = int(request.GET.get('month'))
             selected_year = int(request.GET.get('year'))
-
-            # Filter search logs for the selected month/year
-            search_logs = SearchLog.objects.filter(
-                timestamp__month=selected_month,
-                timestamp__year=selected_year
-            )
-
-            # Aggregate by property type
-            property_type_counts = search_logs.filter(
-                property_type__isnull=False
-            ).values(
-                'property_type__name'
-            ).annotate(
-                search_count=Count('search_log_id')
-            ).order_by('-search_count')
-
-            # Aggregate by neighborhood
-            neighborhood_counts = search_logs.filter(
-                neighborhood__isnull=False
-            ).values(
-                'neighborhood__name'
-            ).annotate(
-                search_count=Count('search_log_id')
-            ).order_by('-search_count')
-
-            # Aggregate by price range
-            price_range_counts = search_logs.filter(
-                pricebucket__isnull=False
-            ).values(
-                'pricebucket__range'
-            ).annotate(
-                search_count=Count('search_log_id')
-            ).order_by('-search_count')
-
+        period = _report_period(request)
+    except (ValueError, TypeError, OverflowError):
+        messages.error(request, "Invalid report period.")
+        period = None
+    if period is not None:
+        start_day, end_day, title = period
+        try:
             report_data = {
-                'property_types': list(property_type_counts),
-                'neighborhoods': list(neighborhood_counts),
-                'price_ranges': list(price_range_counts),
-                'month': datetime(selected_year, selected_month, 1).strftime('%B'),
-                'year': selected_year,
+                **reports.search_report(start_day, end_day, selected_granularity),
+                'title': title,
             }
-        except (ValueError, TypeError):
-            pass
+        except ValueError:
+            messages.error(request, "Invalid report granularity.")
 
     # Generate month and year options
     current_year = timezone.now().year
@@ -626,8 +1032,10 @@ def generate_report(request):
         'report_data': report_data,
         'months': months,
         'years': years,
+        'granularities': [('', 'None'), ('week', 'By week'), ('day', 'By day')],
         'selected_month': selected_month,
         'selected_year': selected_year,
+        'selected_granularity': selected_granularity or '',
     }
 
     return render(request, 'listings/generate_report.html', context)
@@ -635,82 +1043,65 @@ def generate_report(request):
 
 @login_required
 def export_report_csv(request):
-    """Export the search report as CSV."""
-    import csv
-    from django.db.models import Count
-    from datetime import datetime
+    """
+    Export the search report as a streamed CSV, for the same period
+    parameters as generate_report.
+
+    By default this is the summary, with a per-period breakdown when
+    ``granularity`` is given. With ``mode=raw`` it is every search in the
+    period, one row each with the filter names.
+    """
     from django.contrib import messages
 
-    if 'month' not in request.GET or 'year' not in request.GET:
+    try:
+        period = _report_period(request)
+    except (ValueError, TypeError, OverflowError):
+        messages.error(request, "Invalid report period.")
+        return redirect('generate_report')
+    if period is None:
         messages.error(request, "Missing month or year parameter.")
         return redirect('generate_report')
+    start_day, end_day, title = period
+
+    if request.GET.get('mode') == 'raw':
+        return _raw_report_response(start_day, end_day)
 
     try:
-        selected_month = int(request.GET.get('month'))
-        selected_year = int(request.GET.get('year'))
-    except (ValueError, TypeError):
-        messages.error(request, "Invalid month or year parameter.")
+        report = reports.search_report(start_day, end_day, request.GET.get('granularity') or None)
+    except ValueError:
+        messages.error(request, "Invalid report granularity.")
         return redirect('generate_report')
 
-    # Filter search logs for the selected month/year
-    search_logs = SearchLog.objects.filter(
-        timestamp__month=selected_month,
-        timestamp__year=selected_year
-    )
+    # Check if there's any data to export
+    if not any(report[section] for section in reports.DIMENSIONS):
+        messages.warning(request, f"No search data available for {title} to create a report.")
+        return redirect(f"{reverse('generate_report')}?{request.GET.urlencode()}")
 
-    # Aggregate data
-    property_type_counts = search_logs.filter(
-        property_type__isnull=False
-    ).values('property_type__name').annotate(
-        search_count=Count('search_log_id')
-    ).order_by('-search_count')
-
-    neighborhood_counts = search_logs.filter(
-        neighborhood__isnull=False
-    ).values('neighborhood__name').annotate(
-        search_count=Count('search_log_id')
-    ).order_by('-search_count')
-
-    price_range_counts = search_logs.filter(
-        pricebucket__isnull=False
-    ).values('pricebucket__range').annotate(
-        search_count=Count('search_log_id')
-    ).order_by('-search_count')
+    rows = reports.summary_csv_rows(f'Search Report for {title}', report)
+    response = StreamingHttpResponse(reports.stream_csv(rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="search_report_{_report_slug(start_day, end_day)}.csv"'
+    return response
 
-    # Check if there's any data to export
-    if not property_type_counts and not neighborhood_counts and not price_range_counts:
-        month_name = datetime(selected_year, selected_month, 1).strftime('%B')
-        messages.warning(request, f"No search data available for {month_name} {selected_year} to create a report.")
-        return redirect(f"{reverse('generate_report')}?month={selected_month}&year={selected_year}")
-
-    # Create CSV response
-    month_name = datetime(selected_year, selected_month, 1).strftime('%B')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="search_report_{month_name}_{selected_year}.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow([f'Search Report for {month_name} {selected_year}'])
-    writer.writerow([])
-
-    # Write property type data
-    writer.writerow(['Home Type', 'Searches'])
-    for item in property_type_counts:
-        writer.writerow([item['property_type__name'], item['search_count']])
-    writer.writerow([])
-
-    # Write neighborhood data
-    writer.writerow(['Neighborhood', 'Searches'])
-    for item in neighborhood_counts:
-        writer.writerow([item['neighborhood__name'], item['search_count']])
-    writer.writerow([])
-
-    # Write price range data
-    writer.writerow(['Price Range', 'Searches'])
-    for item in price_range_counts:
-        writer.writerow([item['pricebucket__range'], item['search_count']])
 
+def _report_slug(start_day, end_day):
+    """File name part for a report period: 'March_2026' for a month, else the dates."""
+    from datetime import timedelta
+
+    if start_day.day == 1 and (start_day, end_day) == reports.month_bounds(start_day.year, start_day.month):
+        return f"{start_day:%B}_{start_day.year}"
+    return f"{start_day}_{end_day - timedelta(days=1)}"
+
+
+def _raw_report_response(start_day, end_day):
+    """Stream every SearchLog row for the local days ``[start_day, end_day)``."""
+    start, end = reports.datetime_range(start_day, end_day)
+    response = StreamingHttpResponse(
+        reports.stream_csv(reports.raw_csv_rows(start, end)), content_type='text/csv'
+    )
+    response['Content-Disposition'] = f'attachment; filename="search_log_{_report_slug(start_day, end_day)}.csv"'
     return response
 
+
 def about(request):
     if request.method == 'POST':
         form = ContactForm(request.POST)
@@ -748,7 +1139,7 @@ class ListingDetailView(FormMixin, DetailView):
 
     def get_queryset(self):
         queryset = (
-            Listing.objects.prefetch_related('photos')
+            Listing.objects.prefetch_related(photo_metadata_prefetch())
                    .select_related('status_id', 'neighborhood', 'property_type')
         )
         if self.request.user.is_authenticated and self.request.user.is_staff:
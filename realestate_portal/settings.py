@@ -140,6 +140,83 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Content-addressed storage for listing photo bytes (see listings/blob_storage.py)
+PHOTO_BLOB_STORAGE = {
+    'BACKEND': 'listings.blob_storage.FileSystemBlobStorage',
+    'OPTIONS': {
+        'location': BASE_DIR / 'media' / 'photo_blobs',
+    },
+}
+
+# Widths (px) generated on demand for responsive <img srcset> photo delivery
+PHOTO_RENDITION_WIDTHS = [160, 320, 640, 1280]
+
+# Formats offered to browsers that list them in Accept, most preferred
+# first. Formats this Pillow build cannot encode are skipped.
+PHOTO_NEGOTIATED_FORMATS = ['AVIF', 'WEBP']
+
+# Speed/quality trade-off for photo decoding and resizing: 'quality',
+# 'balanced' or 'speed' (see listings.image_utils.IMAGE_PROFILES)
+PHOTO_IMAGE_PROFILE = 'balanced'
+
+# Batch SearchLog inserts instead of writing one row per filtered request
+# (see listings.search_logging). Off by default: buffered events live in
+# worker memory until a background thread or atexit writes them. Under
+# uWSGI (PythonAnywhere) that needs enable-threads and lazy-apps, and a
+# recycled worker can still lose its last MAX_AGE_SECONDS of searches.
+SEARCH_LOG_BUFFER = {
+    'ENABLED': False,
+    'MAX_SIZE': 100,
+    'MAX_AGE_SECONDS': 5.0,
+}
+
+# Rendered AJAX listing pages, cached per filter/page/viewer class and
+# invalidated when listings or photos change (see listings.fragment_cache).
+# Only enable it once CACHE names a backend every process shares (see
+# listings.versioning.VersionCounter).
+LISTING_FRAGMENT_CACHE = {
+    'ENABLED': False,
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+}
+
+# In-process copies of the Neighborhood, PropertyType and Pricebucket tables
+# behind the listing filters (see listings.lookups). MAX_AGE bounds how stale
+# a copy can get (see listings.versioning.VersionCounter).
+LISTING_LOOKUPS = {
+    'MAX_AGE': 60,
+}
+
+# Result counts next to each listings filter option, cached per filter set
+# and invalidated when listings change (see listings.facets). TIMEOUT bounds
+# how stale the counts can get (see listings.versioning.VersionCounter).
+LISTING_FACETS = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+}
+
+# In-process columnar index of visible listings for the public grid (see
+# listings.listing_index). Uses NumPy when installed. CACHE holds the version
+# counter that tells other processes to rebuild, and should be shared (see
+# listings.versioning.VersionCounter).
+LISTING_INDEX = {
+    'ENABLED': False,
+    'CACHE': 'default',
+}
+
+# In-process prefix/trigram index of visible listing addresses behind
+# /listings/autocomplete/ (see listings.autocomplete). MAX_LISTINGS bounds
+# its memory; CACHE holds the version counter that tells other processes to
+# rebuild, and MAX_AGE bounds how stale an index can get (see
+# listings.versioning.VersionCounter).
+LISTING_AUTOCOMPLETE = {
+    'CACHE': 'default',
+    'MAX_LISTINGS': 100000,
+    'MAX_AGE': 300,
+    'LIMIT': 8,
+}
+
 # This line is for development only - switch to SMTP in production
 #EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend' 
 